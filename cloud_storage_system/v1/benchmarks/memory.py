@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Bytes per file held by each StorageSystem implementation, measured with tracemalloc: the
+file table alone, the prefix index alone, and the whole system. Both implementations share
+the same prefix index, so the last column subtracts it to show the layout a full-scan
+get_n_largest would need, for comparison with the file table's savings.
+
+Run from cloud_storage_system/v1: python -m benchmarks.memory
+"""
+
+import argparse
+import tracemalloc
+
+from prefix_index import PrefixIndex
+from storage_system_impl import File, StorageSystemAdvancedImpl, StorageSystemCompactImpl
+
+
+def file_names(files: int, users: int) -> list[str]:
+    return [f"/tenant{i % users}/dir{i % 97}/file{i}" for i in range(files)]
+
+
+def measure_records(storage_class, files: int, users: int) -> int:
+    """Bytes held by the file table alone, leaving out the prefix index and user sets."""
+    names = file_names(files, users)
+    owners = [f"user{u}" for u in range(users)]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    table = storage_class().files
+    for i, name in enumerate(names):
+        table[name] = File(name=name, size=1000 + i, owner_id=owners[i % users])
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del table
+    return used
+
+
+def measure_index(files: int, users: int) -> int:
+    """Bytes held by a prefix index over the same files."""
+    names = file_names(files, users)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    index = PrefixIndex()
+    for i, name in enumerate(names):
+        index.add(name, 1000 + i)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del index
+    return used
+
+
+def measure(storage_class, files: int, users: int) -> int:
+    # Names are built up front so both implementations are charged only for their own state
+    names = file_names(files, users)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    storage = storage_class()
+    for u in range(users):
+        storage.add_user(f"user{u}", 10**15)
+    for i, name in enumerate(names):
+        storage.add_file_by(f"user{i % users}", name, 1000 + i)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del storage
+    return used
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=100)
+    args = parser.parse_args()
+    index = measure_index(args.files, args.users) / args.files
+    print(f"{'bytes/file':28} {'records':>8} {'index':>8} {'total':>8} {'no index':>8}")
+    for storage_class in (StorageSystemAdvancedImpl, StorageSystemCompactImpl):
+        records = measure_records(storage_class, args.files, args.users) / args.files
+        total = measure(storage_class, args.files, args.users) / args.files
+        print(f"{storage_class.__name__:28} {records:8.1f} {index:8.1f} {total:8.1f} {total - index:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Startup time of StorageSystemDurableImpl, replaying the write-ahead log alone and loading a
+snapshot. Also reports write throughput for the chosen fsync batch size.
+
+Run from cloud_storage_system/v1: python -m benchmarks.recovery [--files 10000000]
+"""
+
+import argparse
+import tempfile
+import time
+
+from storage_system_durable_impl import StorageSystemDurableImpl
+
+
+def timed(action):
+    start = time.perf_counter()
+    result = action()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--sync-every", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        storage = StorageSystemDurableImpl(directory, sync_every=args.sync_every, snapshot_every=None)
+
+        def write():
+            for u in range(args.users):
+                storage.add_user(f"user{u}", 10**15)
+            for i in range(args.files):
+                u = i % args.users
+                storage.add_file_by(f"user{u}", f"/tenant{u}/dir{i % 97}/file{i}", i)
+            storage.sync()
+
+        _, elapsed = timed(write)
+        print(f"write: {args.files:,} files in {elapsed:.1f} s ({args.files / elapsed:,.0f} ops/s)")
+        storage.close()
+        del storage
+
+        recovered, elapsed = timed(lambda: StorageSystemDurableImpl(directory, snapshot_every=None, background=False))
+        print(f"recover from log:      {len(recovered.files):,} files in {elapsed:.1f} s")
+
+        _, elapsed = timed(recovered.snapshot)
+        print(f"snapshot:              {elapsed:.1f} s")
+        recovered.close()
+        del recovered
+
+        recovered, elapsed = timed(lambda: StorageSystemDurableImpl(directory, snapshot_every=None))
+        print(f"recover from snapshot: {len(recovered.files):,} files in {elapsed:.1f} s")
+        recovered.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Restores a user owning 100k files while 1,000 other users share the storage.
+
+Run from cloud_storage_system/v1: python -m benchmarks.restore_user
+"""
+
+import argparse
+import time
+
+from storage_system_impl import StorageSystemAdvancedImpl
+
+
+def run(files: int, other_users: int, files_per_other_user: int) -> None:
+    storage = StorageSystemAdvancedImpl()
+    for u in range(other_users):
+        user_id = f"user{u}"
+        storage.add_user(user_id, 10**12)
+        for i in range(files_per_other_user):
+            storage.add_file_by(user_id, f"/{user_id}/file{i}", i)
+
+    storage.add_user("tenant", 10**12)
+    for i in range(files):
+        storage.add_file_by("tenant", f"/tenant/file{i}", i)
+
+    start = time.perf_counter()
+    backed_up = storage.backup_user("tenant")
+    backup_time = time.perf_counter() - start
+
+    # Half of the files go away, and some of those names are claimed by other users
+    for i in range(0, files, 2):
+        storage.delete_file(f"/tenant/file{i}")
+    for i in range(0, files, 20):
+        storage.add_file_by(f"user{i % other_users}", f"/tenant/file{i}", 1)
+
+    start = time.perf_counter()
+    restored = storage.restore_user("tenant")
+    restore_time = time.perf_counter() - start
+
+    print(f"backup_user:  {backed_up} files in {backup_time * 1000:.1f} ms")
+    print(f"restore_user: {restored} files in {restore_time * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--other-users", type=int, default=1_000)
+    parser.add_argument("--files-per-other-user", type=int, default=10)
+    args = parser.parse_args()
+    run(args.files, args.other_users, args.files_per_other_user)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Multi-threaded throughput of the sharded storage system for several shard counts, next to
+StorageSystemAdvancedImpl behind a single global lock.
+
+Each thread mixes add_file_by, get_file_size, delete_file and get_n_largest on its own user.
+Under a GIL build threads still take turns in the interpreter, so shards mostly remove lock
+convoys; on a free-threaded build they also let threads run in parallel.
+
+Run from cloud_storage_system/v1: python -m benchmarks.threads
+"""
+
+import argparse
+import sys
+import threading
+import time
+
+from storage_system_impl import StorageSystemAdvancedImpl, StorageSystemShardedImpl
+
+
+class GlobalLockStorage:
+    """The wrapper the sharded implementation replaces: every call takes the same lock."""
+
+    def __init__(self):
+        self.storage = StorageSystemAdvancedImpl()
+        self.lock = threading.Lock()
+
+    def __getattr__(self, method: str):
+        call = getattr(self.storage, method)
+
+        def locked(*args):
+            with self.lock:
+                return call(*args)
+
+        return locked
+
+
+def run(storage, threads: int, ops: int) -> float:
+    for t in range(threads):
+        storage.add_user(f"user{t}", 10**12)
+    barrier = threading.Barrier(threads + 1)
+
+    def work(t: int):
+        user_id = f"user{t}"
+        barrier.wait()
+        for i in range(ops):
+            name = f"/{user_id}/file{i}"
+            storage.add_file_by(user_id, name, i)
+            storage.get_file_size(name)
+            if i % 4 == 0:
+                storage.delete_file(name)
+            if i % 100 == 0:
+                storage.get_n_largest(f"/{user_id}/", 10)
+
+    workers = [threading.Thread(target=work, args=(t,)) for t in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    # add + get on every iteration, plus the periodic deletes and top-N queries
+    return threads * ops * (2 + 1 / 4 + 1 / 100) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=20_000, help="iterations per thread")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"{args.threads} threads, GIL {'enabled' if gil else 'disabled'}")
+    print(f"{'global lock':>14} {run(GlobalLockStorage(), args.threads, args.ops):12,.0f} ops/s")
+    for shards in args.shards:
+        throughput = run(StorageSystemShardedImpl(shard_count=shards), args.threads, args.ops)
+        print(f"{shards:>7} shards {throughput:12,.0f} ops/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Reproducible load generator for the storage system implementations.
+
+Builds a seeded workload over many users, each owning one tenant prefix picked with a
+Zipfian distribution, preloads the files, then replays a mix of adds, deletes, size
+lookups, top-N queries, backups and restores against each implementation. Reports
+throughput, p50/p99 latency per operation and peak traced memory, and writes the results
+as JSON for regression tracking.
+
+StorageSystemBasicImpl has no users, so it adds files with add_file and skips backups and
+restores.
+
+Run from cloud_storage_system/v1:
+    python -m benchmarks.workload --ops 200000 --output bench.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from itertools import accumulate
+
+from storage_system_impl import (
+    StorageSystemAdvancedImpl,
+    StorageSystemBasicImpl,
+    StorageSystemCompactImpl,
+    StorageSystemShardedImpl,
+)
+
+IMPLEMENTATIONS = {
+    "basic": StorageSystemBasicImpl,
+    "advanced": StorageSystemAdvancedImpl,
+    "compact": StorageSystemCompactImpl,
+    "sharded": StorageSystemShardedImpl,
+}
+
+DEFAULT_MIX = "add=40,delete=15,size=30,top=10,backup=3,restore=2"
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    ratios = {}
+    for part in mix.split(","):
+        op, weight = part.split("=")
+        ratios[op.strip()] = float(weight)
+    unknown = set(ratios) - {"add", "delete", "size", "top", "backup", "restore"}
+    if unknown:
+        raise ValueError(f"unknown operations in mix: {', '.join(sorted(unknown))}")
+    return ratios
+
+
+def generate(args) -> tuple[list[tuple], list[tuple]]:
+    """Returns the preload operations and the measured operations, as (op, user, ...) tuples."""
+    rng = random.Random(args.seed)
+    # Tenant k is picked with weight 1 / k^s
+    tenant_weights = list(accumulate(1 / (k**args.zipf) for k in range(1, args.users + 1)))
+    live: list[list[str]] = [[] for _ in range(args.users)]
+    counter = 0
+
+    def new_file(user: int) -> tuple:
+        nonlocal counter
+        counter += 1
+        name = f"/tenant{user}/dir{rng.randrange(args.dirs)}/file{counter}"
+        live[user].append(name)
+        # Mostly small files with a long tail of large ones
+        return "add", user, name, int(rng.paretovariate(1.2) * 1024)
+
+    def existing_file(user: int, remove: bool) -> str:
+        files = live[user]
+        if not files:
+            return f"/tenant{user}/missing"
+        i = rng.randrange(len(files))
+        name = files[i]
+        if remove:
+            files[i] = files[-1]
+            files.pop()
+        return name
+
+    def pick_user() -> int:
+        return rng.choices(range(args.users), cum_weights=tenant_weights)[0]
+
+    preload = [new_file(pick_user()) for _ in range(args.initial_files)]
+
+    mix = parse_mix(args.mix)
+    names, weights = list(mix), list(accumulate(mix.values()))
+    ops = []
+    for _ in range(args.ops):
+        op = rng.choices(names, cum_weights=weights)[0]
+        user = pick_user()
+        if op == "add":
+            ops.append(new_file(user))
+        elif op == "delete":
+            ops.append(("delete", user, existing_file(user, remove=True)))
+        elif op == "size":
+            ops.append(("size", user, existing_file(user, remove=False)))
+        elif op == "top":
+            # Mix tenant-wide, directory and global prefixes
+            prefix = rng.choice([f"/tenant{user}/", f"/tenant{user}/dir{rng.randrange(args.dirs)}/", "/"])
+            ops.append(("top", user, prefix, args.top_n))
+        else:
+            ops.append((op, user))
+    return preload, ops
+
+
+def bind(storage, has_users: bool) -> dict:
+    """Maps each workload operation to a call on the storage system."""
+    if not has_users:
+        return {
+            "add": lambda user, name, size: storage.add_file(name, size),
+            "delete": lambda user, name: storage.delete_file(name),
+            "size": lambda user, name: storage.get_file_size(name),
+            "top": lambda user, prefix, n: storage.get_n_largest(prefix, n),
+        }
+    return {
+        "add": lambda user, name, size: storage.add_file_by(f"user{user}", name, size),
+        "delete": lambda user, name: storage.delete_file(name),
+        "size": lambda user, name: storage.get_file_size(name),
+        "top": lambda user, prefix, n: storage.get_n_largest(prefix, n),
+        "backup": lambda user: storage.backup_user(f"user{user}"),
+        "restore": lambda user: storage.restore_user(f"user{user}"),
+    }
+
+
+def setup(storage_class, args, preload: list[tuple]):
+    storage = storage_class()
+    has_users = hasattr(storage, "users")
+    if has_users:
+        for user in range(args.users):
+            storage.add_user(f"user{user}", 10**18)
+    calls = bind(storage, has_users)
+    for op, *params in preload:
+        calls[op](*params)
+    return storage, calls
+
+
+def percentile(sorted_values: list[int], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))] / 1000
+
+
+def run(name: str, args, preload: list[tuple], ops: list[tuple]) -> dict:
+    storage_class = IMPLEMENTATIONS[name]
+
+    storage, calls = setup(storage_class, args, preload)
+    latencies: dict[str, list[int]] = {}
+    clock = time.perf_counter_ns
+    start = clock()
+    for op, *params in ops:
+        call = calls.get(op)
+        if call is None:
+            continue
+        before = clock()
+        call(*params)
+        latencies.setdefault(op, []).append(clock() - before)
+    elapsed = (clock() - start) / 1e9
+    del storage, calls
+
+    # Memory is measured on a second, identical run so tracing does not skew the timings
+    tracemalloc.start()
+    storage, calls = setup(storage_class, args, preload)
+    for op, *params in ops:
+        if op in calls:
+            calls[op](*params)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del storage, calls
+
+    executed = sum(len(values) for values in latencies.values())
+    result = {
+        "implementation": storage_class.__name__,
+        "ops": executed,
+        "seconds": elapsed,
+        "ops_per_sec": executed / elapsed if elapsed else 0.0,
+        "peak_memory_bytes": peak,
+        "latency_us": {},
+    }
+    for op, values in sorted(latencies.items()):
+        values.sort()
+        result["latency_us"][op] = {
+            "count": len(values),
+            "p50": percentile(values, 0.50),
+            "p99": percentile(values, 0.99),
+        }
+    return result
+
+
+def print_result(result: dict) -> None:
+    print(
+        f"{result['implementation']}: {result['ops_per_sec']:,.0f} ops/s, "
+        f"peak memory {result['peak_memory_bytes'] / 2**20:,.1f} MiB"
+    )
+    for op, stats in result["latency_us"].items():
+        print(f"  {op:8} {stats['count']:>9,}  p50 {stats['p50']:9.1f} us  p99 {stats['p99']:9.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--impl", nargs="+", choices=sorted(IMPLEMENTATIONS), default=["basic", "advanced"])
+    parser.add_argument("--ops", type=int, default=100_000)
+    parser.add_argument("--initial-files", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--dirs", type=int, default=20, help="directories per tenant")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent for tenant popularity")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="operation weights, e.g. " + DEFAULT_MIX)
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    preload, ops = generate(args)
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "python": sys.version,
+        "platform": platform.platform(),
+        "results": [],
+    }
+    for name in args.impl:
+        result = run(name, args, preload, ops)
+        print_result(result)
+        report["results"].append(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
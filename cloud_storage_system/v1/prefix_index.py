@@ -0,0 +1,346 @@
+from bisect import bisect_left, bisect_right, insort
+from itertools import chain
+
+
+class SortedList:
+    """
+    Sorted list kept as a run of bounded buckets, so an insert or removal only shifts one
+    bucket instead of the whole list.
+    """
+
+    __slots__ = ("buckets", "maxes", "owned", "size")
+
+    LOAD = 256
+
+    def __init__(self):
+        self.buckets: list[list] = []
+        self.maxes: list = []  # last (largest) value of every bucket
+        # Whether each bucket belongs to this list alone; copies share buckets until written
+        self.owned: list[bool] = []
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self):
+        return chain.from_iterable(self.buckets)
+
+    def _own(self, i: int) -> list:
+        """Returns bucket i, first copying it if it is shared with another list."""
+        if not self.owned[i]:
+            self.buckets[i] = list(self.buckets[i])
+            self.owned[i] = True
+        return self.buckets[i]
+
+    def add(self, value) -> None:
+        if not self.buckets:
+            self.buckets.append([value])
+            self.maxes.append(value)
+            self.owned.append(True)
+            self.size = 1
+            return
+        i = bisect_right(self.maxes, value)
+        if i == len(self.maxes):
+            i -= 1
+            bucket = self._own(i)
+            bucket.append(value)
+            self.maxes[i] = value
+        else:
+            bucket = self._own(i)
+            insort(bucket, value)
+        self.size += 1
+        if len(bucket) > 2 * self.LOAD:
+            tail = bucket[self.LOAD :]
+            del bucket[self.LOAD :]
+            self.buckets.insert(i + 1, tail)
+            self.maxes[i] = bucket[-1]
+            self.maxes.insert(i + 1, tail[-1])
+            self.owned.insert(i + 1, True)
+
+    def remove(self, value) -> None:
+        i = bisect_left(self.maxes, value)
+        if i == len(self.maxes):
+            raise ValueError(f"{value!r} not in list")
+        j = bisect_left(self.buckets[i], value)
+        if self.buckets[i][j] != value:
+            raise ValueError(f"{value!r} not in list")
+        bucket = self._own(i)
+        del bucket[j]
+        self.size -= 1
+        if not bucket:
+            del self.buckets[i]
+            del self.maxes[i]
+            del self.owned[i]
+        elif j == len(bucket):
+            self.maxes[i] = bucket[-1]
+
+    def append(self, value) -> None:
+        """Adds a value that is no smaller than any value already in the list."""
+        if not self.buckets or len(self.buckets[-1]) >= self.LOAD:
+            self.buckets.append([value])
+            self.maxes.append(value)
+            self.owned.append(True)
+        else:
+            self._own(-1).append(value)
+            self.maxes[-1] = value
+        self.size += 1
+
+    def head(self, n: int) -> list:
+        return self.after(None, n)
+
+    def after(self, value, n: int) -> list:
+        """Returns up to n values greater than value, or the first n if value is None."""
+        if value is None:
+            i = j = 0
+        else:
+            i = bisect_right(self.maxes, value)
+            if i == len(self.maxes):
+                return []
+            j = bisect_right(self.buckets[i], value)
+        result = []
+        while i < len(self.buckets) and len(result) < n:
+            result.extend(self.buckets[i][j : j + n - len(result)])
+            i += 1
+            j = 0
+        return result
+
+    def copy(self) -> "SortedList":
+        """Returns a copy in O(len / LOAD); buckets are shared until either list changes them."""
+        other = SortedList()
+        other.buckets = list(self.buckets)
+        other.maxes = list(self.maxes)
+        other.owned = [False] * len(self.buckets)
+        self.owned = [False] * len(self.buckets)
+        other.size = self.size
+        return other
+
+
+class PrefixNode:
+    __slots__ = ("label", "children", "file", "entries", "total_size")
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.children: dict[str, "PrefixNode"] | None = None  # {first char of child label: child}
+        self.file: tuple[int, str] | None = None  # (-size, name) of the file whose name ends here
+        # Every file in this subtree as (-size, name), i.e. already in top-N order, and their
+        # total size. Only nodes with two or more children keep them; the rest derive them
+        # from the single-child chain below (see _chain), which only ends in a leaf or at a
+        # node that keeps them
+        self.entries: SortedList | None = None
+        self.total_size = 0
+
+    def _chain(self) -> tuple[list[tuple[int, str]], "PrefixNode | None"]:
+        """Returns the files ending down the single-child chain from here and the node with entries that ends it, if any."""
+        files = []
+        node = self
+        while node.entries is None:
+            if node.file is not None:
+                files.append(node.file)
+            if not node.children:
+                return files, None
+            (node,) = node.children.values()
+        return files, node
+
+    def _aggregate(self) -> None:
+        """Builds the entries of a node with one child, before it gets a second one."""
+        (child,) = self.children.values()
+        files, branch = child._chain()
+        if self.file is not None:
+            files.append(self.file)
+        self.entries = branch.entries.copy() if branch else SortedList()
+        self.total_size = branch.total_size if branch else 0
+        for key in files:
+            self.entries.add(key)
+            self.total_size -= key[0]
+
+    def stats(self) -> tuple[int, int]:
+        """Returns the number and total size of the files in this subtree."""
+        files, branch = self._chain()
+        count = len(files) + (len(branch.entries) if branch else 0)
+        return count, (branch.total_size if branch else 0) - sum(key[0] for key in files)
+
+    def after(self, value, n: int) -> list[tuple[int, str]]:
+        """Returns up to n (-size, name) entries of this subtree after value, or the first n if value is None."""
+        files, branch = self._chain()
+        result = branch.entries.after(value, n) if branch else []
+        if files:
+            result = sorted(result + [key for key in files if value is None or key > value])[:n]
+        return result
+
+
+class PrefixIndex:
+    """
+    Radix trie over file names where every branching node keeps the files of its subtree
+    sorted by (size desc, name asc), so the top n files under a prefix are a walk plus a
+    slice. Leaves and single-child nodes keep only the file ending at them, if any.
+    """
+
+    def __init__(self):
+        self.root = PrefixNode()
+
+    def __len__(self) -> int:
+        return self.root.stats()[0]
+
+    @classmethod
+    def from_items(cls, items) -> "PrefixIndex":
+        """Builds an index from (name, size) pairs faster than adding them one at a time."""
+        index = cls()
+        keys = sorted((-size, name) for name, size in items)
+        # Shape the trie first, so entries are only built on the nodes that end up branching
+        for key in keys:
+            index._path(key[1], aggregate=False)[-1].file = key
+        # In (size desc, name asc) order every key lands at the end of each list on its path
+        for key in keys:
+            for node in index._walk(key[1]):
+                if node.children and len(node.children) > 1:
+                    if node.entries is None:
+                        node.entries = SortedList()
+                    node.entries.append(key)
+                    node.total_size -= key[0]
+        return index
+
+    def add(self, name: str, size: int) -> None:
+        key = (-size, name)
+        path = self._path(name)
+        path[-1].file = key
+        for node in path:
+            if node.entries is not None:
+                node.entries.add(key)
+                node.total_size += size
+
+    def add_many(self, items) -> None:
+        """Adds (name, size) pairs, rebuilding in bulk when they outnumber the indexed files."""
+        items = list(items)
+        if len(items) < len(self):
+            for name, size in items:
+                self.add(name, size)
+            return
+        existing = [(name, -negative_size) for negative_size, name in self.root.after(None, len(self))]
+        self.root = PrefixIndex.from_items(existing + items).root
+
+    def _path(self, name: str, aggregate: bool = True) -> list[PrefixNode]:
+        """
+        Returns the nodes from the root to the one where name ends, creating them as needed.
+        Nodes that gain a second child get their entries unless aggregate is false.
+        """
+        node = self.root
+        path = [node]
+        i = 0
+        while i < len(name):
+            child = node.children.get(name[i]) if node.children else None
+            if child is None:
+                if node.children is None:
+                    node.children = {}
+                elif aggregate and len(node.children) == 1:
+                    node._aggregate()
+                leaf = PrefixNode(name[i:])
+                node.children[name[i]] = leaf
+                path.append(leaf)
+                break
+            label = child.label
+            if name.startswith(label, i):
+                common = len(label)
+            else:
+                common = 1
+                limit = min(len(label), len(name) - i)
+                while common < limit and label[common] == name[i + common]:
+                    common += 1
+                # Split the edge so the new name can branch off (or end) in the middle of it;
+                # the new node gets entries only if it branches, on the next step
+                middle = PrefixNode(label[:common])
+                child.label = label[common:]
+                middle.children = {child.label[0]: child}
+                node.children[name[i]] = middle
+                child = middle
+            path.append(child)
+            node = child
+            i += common
+        return path
+
+    def _walk(self, name: str) -> list[PrefixNode]:
+        """Returns the nodes from the root to the one where an indexed name ends."""
+        node = self.root
+        path = [node]
+        i = 0
+        while i < len(name):
+            node = node.children[name[i]]
+            path.append(node)
+            i += len(node.label)
+        return path
+
+    def remove(self, name: str, size: int) -> None:
+        key = (-size, name)
+        path = self._walk(name)
+        path[-1].file = None
+        for node in path:
+            if node.entries is not None:
+                node.entries.remove(key)
+                node.total_size -= size
+        # Drop emptied leaves and the entries of nodes left with one child, and fold those no
+        # file ends at back into their child
+        for depth in range(len(path) - 1, 0, -1):
+            node, parent = path[depth], path[depth - 1]
+            if not node.children:
+                if node.file is None:
+                    del parent.children[node.label[0]]
+                    if not parent.children:
+                        parent.children = None
+            elif len(node.children) == 1:
+                node.entries = None
+                if node.file is None:
+                    (child,) = node.children.values()
+                    child.label = node.label + child.label
+                    parent.children[node.label[0]] = child
+        if not self.root.children or len(self.root.children) == 1:
+            self.root.entries = None
+
+    def find(self, prefix: str) -> PrefixNode | None:
+        """Returns the topmost node whose subtree holds exactly the names starting with prefix."""
+        node = self.root
+        i = 0
+        while i < len(prefix):
+            child = node.children.get(prefix[i]) if node.children else None
+            if child is None:
+                return None
+            if prefix.startswith(child.label, i):
+                i += len(child.label)
+            elif child.label.startswith(prefix[i:]):
+                return child
+            else:
+                return None
+            node = child
+        return node
+
+    def stats(self, prefix: str) -> tuple[int, int]:
+        """Returns the number and total size of the files under prefix."""
+        node = self.find(prefix)
+        if node is None:
+            return 0, 0
+        return node.stats()
+
+    def top(self, prefix: str, n: int) -> list[tuple[int, str]]:
+        """Returns the first n (-size, name) entries under prefix."""
+        return self.page(prefix, None, n)
+
+    def page(self, prefix: str, after: tuple[int, str] | None, n: int) -> list[tuple[int, str]]:
+        """Returns up to n (-size, name) entries under prefix that come after the given one."""
+        node = self.find(prefix)
+        if node is None or n <= 0:
+            return []
+        return node.after(after, n)
+
+    def iter_entries(self, prefix: str, chunk: int = SortedList.LOAD):
+        """
+        Lazily yields the (-size, name) entries under prefix, a chunk at a time. Each chunk is
+        looked up again from the last entry yielded, so the index may change in between.
+        """
+        after = None
+        while True:
+            entries = self.page(prefix, after, chunk)
+            yield from entries
+            if len(entries) < chunk:
+                return
+            after = entries[-1]
+
+    def n_largest(self, prefix: str, n: int) -> list[str]:
+        return [name for _, name in self.top(prefix, n)]
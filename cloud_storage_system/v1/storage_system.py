@@ -1,4 +1,5 @@
 from abc import ABC
+from collections.abc import Iterable, Iterator
 
 class StorageSystem(ABC):
     
@@ -19,6 +20,18 @@ class StorageSystem(ABC):
         """Returns a list of the names of the top n largest files with names starting with the specified prefix."""
         pass
     
+    def iter_largest(self, prefix: str) -> Iterator[str]:
+        """Lazily yields the names of files starting with the specified prefix, largest first with ties sorted lexicographically."""
+        pass
+
+    def list_files(self, prefix: str, limit: int, token: str | None = None) -> tuple[list[str], str | None]:
+        """Returns one page of up to limit names in iter_largest order, continuing after token, and the token for the next page (None after the last one)."""
+        pass
+
+    def get_prefix_stats(self, prefix: str) -> tuple[int, int]:
+        """Returns the number and total size of the files with names starting with the specified prefix."""
+        pass
+
     def add_user(self, user_id: str, capacity: int) -> bool:
         """Adds a new user with the specified storage capacity."""
         pass
@@ -27,10 +40,34 @@ class StorageSystem(ABC):
         """Adds a file owned by the specified user."""
         pass
     
+    def get_user_stats(self, user_id: str) -> tuple[int, int] | None:
+        """Returns the number and total size of the files owned by the user, or None if the user does not exist."""
+        pass
+
+    def get_top_users(self, n: int) -> list[str]:
+        """Returns the ids of the top n users by used capacity, sorted in descending order with ties sorted lexicographically."""
+        pass
+
     def backup_user(self, user_id: str) -> int | None:
         """Backs up the current state of all files owned by the user."""
         pass
 
     def restore_user(self, user_id: str) -> int | None:
         """Restores the user's files to their latest backup."""
-        pass
\ No newline at end of file
+        pass
+
+    def add_files(self, files: Iterable[tuple[str, int]], atomic: bool = False) -> list[bool]:
+        """Adds (name, size) pairs in one pass, with one add_file result per pair. If atomic, nothing is added unless every pair succeeds, and otherwise every result is a failure."""
+        pass
+
+    def delete_files(self, names: Iterable[str], atomic: bool = False) -> list[int | None]:
+        """Deletes the named files in one pass, with one delete_file result per name. If atomic, nothing is deleted unless every name succeeds, and otherwise every result is None."""
+        pass
+
+    def get_file_sizes(self, names: Iterable[str]) -> list[int | None]:
+        """Retrieves the sizes of the named files."""
+        pass
+
+    def add_files_by(self, user_id: str, files: Iterable[tuple[str, int]], atomic: bool = False) -> list[int | None]:
+        """Adds (name, size) pairs owned by the user in one pass, with one add_file_by result per pair. If atomic, nothing is added unless every pair succeeds, and otherwise every result is None."""
+        pass
@@ -0,0 +1,136 @@
+from collections.abc import Iterable
+from durable_log import DurableLog
+from prefix_index import PrefixIndex, SortedList
+from storage_system_impl import File, StorageSystemAdvancedImpl, User
+
+
+class StorageSystemDurableImpl(DurableLog, StorageSystemAdvancedImpl):
+    """
+    StorageSystemAdvancedImpl that survives restarts, logged and snapshotted by DurableLog.
+
+    Every successful mutation is logged as a [method, *args] record. Callers that need a
+    time bound on durability while idle call sync().
+
+    Files in directory:
+        snapshot        flat records of the state as of the end of some log generation
+        wal.<n>         log generation n
+    """
+
+    LOG_PREFIX = "wal"
+
+    def __init__(
+        self,
+        directory: str,
+        sync_every: int = 1000,
+        sync_interval: float = 1.0,
+        snapshot_every: int | None = 1_000_000,
+        background: bool = True,
+    ):
+        super().__init__()
+        self._open_log(directory, sync_every, sync_interval, snapshot_every, background)
+
+    def _dump_state(self) -> dict:
+        # Plain tuples pickle and load far faster than the File/User records and the index
+        return {
+            "files": [(file.name, file.size, file.owner_id) for file in self.files.values()],
+            "users": [(user.user_id, user.capacity, user.changed_names) for user in self.users.values()],
+            "backups": self.backups,
+        }
+
+    def _load_state(self, state: dict) -> None:
+        self.users = {
+            user_id: User(user_id=user_id, capacity=capacity, changed_names=changed_names)
+            for user_id, capacity, changed_names in state["users"]
+        }
+        self.files = {}
+        for name, size, owner_id in state["files"]:
+            self.files[name] = File(name=name, size=size, owner_id=owner_id)
+            user = self.users.get(owner_id)
+            if user:
+                user.file_names.add(name)
+                user.used_capacity += size
+        self.backups = state["backups"]
+        self.index = PrefixIndex.from_items((name, size) for name, size, _ in state["files"])
+        self.user_ranking = SortedList()
+        for key in sorted((-user.used_capacity, user.user_id) for user in self.users.values()):
+            self.user_ranking.append(key)
+
+    def _record_applier(self):
+        replay = {
+            "add_file": super().add_file,
+            "delete_file": super().delete_file,
+            "add_user": super().add_user,
+            "add_file_by": super().add_file_by,
+            "backup_user": super().backup_user,
+            "restore_user": super().restore_user,
+            "add_files": super().add_files,
+            "delete_files": super().delete_files,
+            "add_files_by": super().add_files_by,
+        }
+
+        def apply(record: list) -> None:
+            method, *args = record
+            replay[method](*args)
+
+        return apply
+
+    def add_file(self, name: str, size: int) -> bool:
+        added = super().add_file(name, size)
+        if added:
+            self._append("add_file", name, size)
+        return added
+
+    def delete_file(self, name: str) -> int | None:
+        size = super().delete_file(name)
+        if size is not None:
+            self._append("delete_file", name)
+        return size
+
+    def add_user(self, user_id: str, capacity: int) -> bool:
+        added = super().add_user(user_id, capacity)
+        if added:
+            self._append("add_user", user_id, capacity)
+        return added
+
+    def add_file_by(self, user_id: str, name: str, size: int) -> int | None:
+        remaining = super().add_file_by(user_id, name, size)
+        if remaining is not None:
+            self._append("add_file_by", user_id, name, size)
+        return remaining
+
+    def backup_user(self, user_id: str) -> int | None:
+        count = super().backup_user(user_id)
+        if count is not None:
+            self._append("backup_user", user_id)
+        return count
+
+    def restore_user(self, user_id: str) -> int | None:
+        count = super().restore_user(user_id)
+        if count is not None:
+            self._append("restore_user", user_id)
+        return count
+
+    # A batch is logged as one record holding only the items that were applied
+    def add_files(self, files: Iterable[tuple[str, int]], atomic: bool = False) -> list[bool]:
+        files = list(files)
+        results = super().add_files(files, atomic)
+        applied = [file for file, added in zip(files, results) if added]
+        if applied and (not atomic or len(applied) == len(files)):
+            self._append("add_files", applied)
+        return results
+
+    def delete_files(self, names: Iterable[str], atomic: bool = False) -> list[int | None]:
+        names = list(names)
+        results = super().delete_files(names, atomic)
+        applied = [name for name, size in zip(names, results) if size is not None]
+        if applied and (not atomic or len(applied) == len(names)):
+            self._append("delete_files", applied)
+        return results
+
+    def add_files_by(self, user_id: str, files: Iterable[tuple[str, int]], atomic: bool = False) -> list[int | None]:
+        files = list(files)
+        results = super().add_files_by(user_id, files, atomic)
+        applied = [file for file, remaining in zip(files, results) if remaining is not None]
+        if applied and (not atomic or len(applied) == len(files)):
+            self._append("add_files_by", user_id, applied)
+        return results
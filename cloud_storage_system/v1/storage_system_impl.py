@@ -1,14 +1,35 @@
+import heapq
+from array import array
+from collections.abc import Iterable, Iterator
+from contextlib import ExitStack, nullcontext
+from itertools import islice
+from threading import Lock
 from storage_system import StorageSystem
+from prefix_index import PrefixIndex, SortedList
 from dataclasses import dataclass, field
 
+def encode_token(entry: tuple[int, str]) -> str:
+    negative_size, name = entry
+    return f"{-negative_size}:{name}"
+
+
+def decode_token(token: str | None) -> tuple[int, str] | None:
+    if token is None:
+        return None
+    size, name = token.split(":", 1)
+    return -int(size), name
+
+
 class StorageSystemBasicImpl(StorageSystem):
     def __init__(self):
         self.files: dict[str, int] = {}
+        self.index = PrefixIndex()
 
     def add_file(self, name: str, size: int) -> bool:
         if name in self.files:
             return False
         self.files[name] = size
+        self.index.add(name, size)
         return True
 
     def get_file_size(self, name: str) -> int | None:
@@ -18,28 +39,78 @@ class StorageSystemBasicImpl(StorageSystem):
         if name in self.files:
             size = self.files[name]
             del self.files[name]
+            self.index.remove(name, size)
             return size
         return None
 
     def get_n_largest(self, prefix: str, n: int) -> list[str]:
-        matching_files = [
-            (name, size) for name, size in self.files.items() if name.startswith(prefix)
-        ]
-        matching_files.sort(key=lambda x: (-x[1], x[0]))
-        return [name for name, _ in matching_files[:n]]
+        return self.index.n_largest(prefix, n)
+
+    def get_prefix_stats(self, prefix: str) -> tuple[int, int]:
+        return self.index.stats(prefix)
+
+    def iter_largest(self, prefix: str) -> Iterator[str]:
+        return (name for _, name in self.index.iter_entries(prefix))
 
-@dataclass
+    def list_files(self, prefix: str, limit: int, token: str | None = None) -> tuple[list[str], str | None]:
+        if limit <= 0:
+            return [], token
+        # One extra entry tells whether another page follows
+        entries = self.index.page(prefix, decode_token(token), limit + 1)
+        next_token = encode_token(entries[limit - 1]) if len(entries) > limit else None
+        return [name for _, name in entries[:limit]], next_token
+
+    # Batches are validated in one pass against the state plus the batch's own earlier
+    # items, so results match calling the single-item method in order; atomic batches are
+    # applied only if every result is a success, and otherwise report every item as failed.
+    def add_files(self, files: Iterable[tuple[str, int]], atomic: bool = False) -> list[bool]:
+        results = []
+        added: dict[str, int] = {}
+        for name, size in files:
+            if name in self.files or name in added:
+                results.append(False)
+            else:
+                added[name] = size
+                results.append(True)
+        if atomic and not all(results):
+            return [False] * len(results)
+        self.files.update(added)
+        self.index.add_many(added.items())
+        return results
+
+    def delete_files(self, names: Iterable[str], atomic: bool = False) -> list[int | None]:
+        results = []
+        deleted: dict[str, int] = {}
+        for name in names:
+            if name in self.files and name not in deleted:
+                deleted[name] = self.files[name]
+                results.append(deleted[name])
+            else:
+                results.append(None)
+        if atomic and None in results:
+            return [None] * len(results)
+        for name, size in deleted.items():
+            del self.files[name]
+            self.index.remove(name, size)
+        return results
+
+    def get_file_sizes(self, names: Iterable[str]) -> list[int | None]:
+        return [self.files.get(name) for name in names]
+
+@dataclass(slots=True)
 class File:
     name: str
     size: int
     owner_id: str = "admin"
 
-@dataclass
+@dataclass(slots=True)
 class User:
     user_id: str
     capacity: int
     used_capacity: int = 0
-    file_names: list[str] = field(default_factory=list)
+    file_names: set[str] = field(default_factory=set)
+    # Names whose state may differ from the last backup (or from nothing, before the first one)
+    changed_names: set[str] = field(default_factory=set)
 
     @property
     def remaining_capacity(self) -> int:
@@ -50,11 +121,52 @@ class StorageSystemAdvancedImpl(StorageSystem):
         self.files: dict[str, File] = {}
         self.users: dict[str, User] = {}
         self.backups: dict[str, dict[str, int]] = {}
+        self.index = PrefixIndex()
+        self.user_ranking = SortedList()  # (-used_capacity, user_id) for every user
+
+    def _charge(self, user: User, size: int) -> None:
+        self.user_ranking.remove((-user.used_capacity, user.user_id))
+        user.used_capacity += size
+        self.user_ranking.add((-user.used_capacity, user.user_id))
+
+    # self.files doubles as the ownership index (name -> File.owner_id); these two helpers
+    # keep it, the prefix index and the owner's bookkeeping in sync.
+    def _put_file(self, file: File) -> None:
+        self.files[file.name] = file
+        self.index.add(file.name, file.size)
+        user = self.users.get(file.owner_id)
+        if user:
+            user.file_names.add(file.name)
+            user.changed_names.add(file.name)
+            self._charge(user, file.size)
+
+    def _pop_file(self, name: str) -> File:
+        file = self.files.pop(name)
+        self.index.remove(name, file.size)
+        user = self.users.get(file.owner_id)
+        if user:
+            user.file_names.discard(name)
+            user.changed_names.add(name)
+            self._charge(user, -file.size)
+        return file
+
+    def _put_files(self, files: list[File]) -> None:
+        charges: dict[str, int] = {}
+        for file in files:
+            self.files[file.name] = file
+            user = self.users.get(file.owner_id)
+            if user:
+                user.file_names.add(file.name)
+                user.changed_names.add(file.name)
+                charges[user.user_id] = charges.get(user.user_id, 0) + file.size
+        for user_id, size in charges.items():
+            self._charge(self.users[user_id], size)
+        self.index.add_many((file.name, file.size) for file in files)
 
     def add_file(self, name: str, size: int) -> bool:
         if name in self.files:
             return False
-        self.files[name] = File(name=name, size=size)
+        self._put_file(File(name=name, size=size))
         return True
 
     def get_file_size(self, name: str) -> int | None:
@@ -64,28 +176,72 @@ class StorageSystemAdvancedImpl(StorageSystem):
     def delete_file(self, name: str) -> int | None:
         if name not in self.files:
             return None
-        file = self.files[name]
-        size = file.size
-        if file.owner_id and file.owner_id in self.users:
-            user = self.users[file.owner_id]
-            user.file_names.remove(name)
-            user.used_capacity -= size
-        del self.files[name]
-        return size
+        return self._pop_file(name).size
 
     def get_n_largest(self, prefix: str, n: int) -> list[str]:
-        matching_files = [
-            file for file in self.files.values() if file.name.startswith(prefix)
-        ]
-        matching_files.sort(key=lambda x: (-x.size, x.name))
-        return [file.name for file in matching_files[:n]]
+        return self.index.n_largest(prefix, n)
+
+    def get_prefix_stats(self, prefix: str) -> tuple[int, int]:
+        return self.index.stats(prefix)
+
+    def iter_largest(self, prefix: str) -> Iterator[str]:
+        return (name for _, name in self.index.iter_entries(prefix))
+
+    def list_files(self, prefix: str, limit: int, token: str | None = None) -> tuple[list[str], str | None]:
+        if limit <= 0:
+            return [], token
+        # One extra entry tells whether another page follows
+        entries = self.index.page(prefix, decode_token(token), limit + 1)
+        next_token = encode_token(entries[limit - 1]) if len(entries) > limit else None
+        return [name for _, name in entries[:limit]], next_token
+
+    # Batches follow the same rules as in StorageSystemBasicImpl
+    def add_files(self, files: Iterable[tuple[str, int]], atomic: bool = False) -> list[bool]:
+        results = []
+        added: dict[str, int] = {}
+        for name, size in files:
+            if name in self.files or name in added:
+                results.append(False)
+            else:
+                added[name] = size
+                results.append(True)
+        if atomic and not all(results):
+            return [False] * len(results)
+        self._put_files([File(name=name, size=size) for name, size in added.items()])
+        return results
+
+    def delete_files(self, names: Iterable[str], atomic: bool = False) -> list[int | None]:
+        results = []
+        deleted: set[str] = set()
+        for name in names:
+            if name in self.files and name not in deleted:
+                deleted.add(name)
+                results.append(self.files[name].size)
+            else:
+                results.append(None)
+        if atomic and None in results:
+            return [None] * len(results)
+        for name in deleted:
+            self._pop_file(name)
+        return results
+
+    def get_file_sizes(self, names: Iterable[str]) -> list[int | None]:
+        return [self.get_file_size(name) for name in names]
 
     def add_user(self, user_id: str, capacity: int) -> bool:
         if user_id in self.users:
             return False
         self.users[user_id] = User(user_id=user_id, capacity=capacity)
+        self.user_ranking.add((0, user_id))
         return True
 
+    def get_user_stats(self, user_id: str) -> tuple[int, int] | None:
+        user = self.users.get(user_id)
+        return (len(user.file_names), user.used_capacity) if user else None
+
+    def get_top_users(self, n: int) -> list[str]:
+        return [user_id for _, user_id in self.user_ranking.head(max(n, 0))]
+
     def add_file_by(self, user_id: str, name: str, size: int) -> int | None:
         if user_id not in self.users:
             return None
@@ -94,45 +250,413 @@ class StorageSystemAdvancedImpl(StorageSystem):
         user = self.users[user_id]
         if size > user.remaining_capacity:
             return None
-        self.files[name] = File(name=name, size=size, owner_id=user_id)
-        user.file_names.append(name)
-        user.used_capacity += size
+        self._put_file(File(name=name, size=size, owner_id=user_id))
         return user.remaining_capacity
 
+    def add_files_by(self, user_id: str, files: Iterable[tuple[str, int]], atomic: bool = False) -> list[int | None]:
+        files = list(files)
+        if user_id not in self.users:
+            return [None] * len(files)
+        # Capacity is read once and then tracked across the batch
+        remaining = self.users[user_id].remaining_capacity
+        results = []
+        added: dict[str, int] = {}
+        for name, size in files:
+            if name in self.files or name in added or size > remaining:
+                results.append(None)
+            else:
+                added[name] = size
+                remaining -= size
+                results.append(remaining)
+        if atomic and None in results:
+            return [None] * len(results)
+        self._put_files([File(name=name, size=size, owner_id=user_id) for name, size in added.items()])
+        return results
+
     def backup_user(self, user_id: str) -> int | None:
         if user_id not in self.users:
             return None
         user = self.users[user_id]
-        backup_files = {}
-        for file_name in user.file_names:
-            if file_name in self.files:
+        # Backups are only ever read by restore_user, so the previous one is brought up to
+        # date in place from the names changed since, instead of copying every file
+        backup_files = self.backups.setdefault(user_id, {})
+        for file_name in user.changed_names:
+            if file_name in user.file_names:
                 backup_files[file_name] = self.files[file_name].size
-        self.backups[user_id] = backup_files
+            else:
+                backup_files.pop(file_name, None)
+        user.changed_names.clear()
         return len(backup_files)
 
     def restore_user(self, user_id: str) -> int | None:
         if user_id not in self.users:
             return None
         user = self.users[user_id]
-        for file_name in user.file_names:
-            if file_name in self.files:
-                del self.files[file_name]
-        user.file_names.clear()
-        user.used_capacity = 0
-        if user_id in self.backups:
-            restored_count = 0
-            for file_name, size in self.backups[user_id].items():
-                conflict = False
-                for other_user in self.users.values():
-                    if other_user.user_id != user_id and file_name in other_user.file_names:
-                        conflict = True
-                        break
-                if not conflict:
-                    self.files[file_name] = File(
-                        name=file_name, size=size, owner_id=user_id
-                    )
-                    user.file_names.append(file_name)
-                    user.used_capacity += size
-                    restored_count += 1
-            return restored_count
-        return 0
+        backup_files = self.backups.get(user_id, {})
+        # Files outside changed_names still match the backup, so only changed ones are touched
+        changed_names, user.changed_names = user.changed_names, set()
+        for file_name in changed_names:
+            if file_name in user.file_names and backup_files.get(file_name) != self.files[file_name].size:
+                self._pop_file(file_name)
+        for file_name in changed_names:
+            # Names taken by another owner are conflicts and stay unrestored
+            if file_name in backup_files and file_name not in self.files:
+                self._put_file(File(name=file_name, size=backup_files[file_name], owner_id=user_id))
+        user.changed_names = {
+            file_name
+            for file_name in changed_names
+            if file_name in backup_files and file_name not in user.file_names
+        }
+        return len(backup_files) - len(user.changed_names)
+
+
+class FileTable:
+    """
+    Columnar replacement for the {name: File} dict: every file is a row holding its size in
+    an array('q') and its owner as a small int into a table of interned owner ids. File
+    objects are only built on access.
+    """
+
+    def __init__(self):
+        self.rows: dict[str, int] = {}
+        self.sizes = array("q")
+        self.owners = array("I")
+        self.owner_ids: list[str] = []
+        self.owner_numbers: dict[str, int] = {}
+        self.free_rows: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __getitem__(self, name: str) -> File:
+        row = self.rows[name]
+        return File(name=name, size=self.sizes[row], owner_id=self.owner_ids[self.owners[row]])
+
+    def get(self, name: str) -> File | None:
+        return self[name] if name in self.rows else None
+
+    def __setitem__(self, name: str, file: File) -> None:
+        owner = self.owner_numbers.get(file.owner_id)
+        if owner is None:
+            owner = self.owner_numbers[file.owner_id] = len(self.owner_ids)
+            self.owner_ids.append(file.owner_id)
+        if name in self.rows:
+            row = self.rows[name]
+            self.sizes[row] = file.size
+            self.owners[row] = owner
+        elif self.free_rows:
+            row = self.rows[name] = self.free_rows.pop()
+            self.sizes[row] = file.size
+            self.owners[row] = owner
+        else:
+            self.rows[name] = len(self.sizes)
+            self.sizes.append(file.size)
+            self.owners.append(owner)
+
+    def pop(self, name: str) -> File:
+        file = self[name]
+        self.free_rows.append(self.rows.pop(name))
+        return file
+
+
+class StorageSystemCompactImpl(StorageSystemAdvancedImpl):
+    """
+    StorageSystemAdvancedImpl with file records kept in a columnar FileTable. The prefix
+    index is the same as the advanced implementation's and holds most of the memory;
+    benchmarks/memory.py reports the two separately.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.files = FileTable()
+
+
+class Shard:
+    __slots__ = ("lock", "files", "index")
+
+    def __init__(self):
+        self.lock = Lock()
+        self.files: dict[str, File] = {}
+        self.index = PrefixIndex()
+
+
+class StorageSystemShardedImpl(StorageSystem):
+    """
+    Thread-safe storage system with files hash-partitioned by name across shards, each with
+    its own lock and prefix index. A user's lock is taken before any shard lock, so capacity
+    checks and backups see a consistent view of that user's files while other users proceed.
+    """
+
+    def __init__(self, shard_count: int = 16):
+        self.shards = [Shard() for _ in range(shard_count)]
+        self.users: dict[str, User] = {}
+        self.user_locks: dict[str, Lock] = {}
+        self.users_lock = Lock()
+        self.backups: dict[str, dict[str, int]] = {}
+        self.user_ranking = SortedList()  # (-used_capacity, user_id) for every user
+        self.ranking_lock = Lock()  # taken last, after any user or shard lock
+
+    def _charge(self, user: User, size: int) -> None:
+        with self.ranking_lock:
+            self.user_ranking.remove((-user.used_capacity, user.user_id))
+            user.used_capacity += size
+            self.user_ranking.add((-user.used_capacity, user.user_id))
+
+    def _shard(self, name: str) -> Shard:
+        return self.shards[hash(name) % len(self.shards)]
+
+    def _owner_lock(self, owner_id: str):
+        return self.user_locks.get(owner_id) or nullcontext()
+
+    def _shard_locks(self, names: list[str]) -> ExitStack:
+        # Always in shard order, so two batches can never wait on each other
+        stack = ExitStack()
+        for i in sorted({hash(name) % len(self.shards) for name in names}):
+            stack.enter_context(self.shards[i].lock)
+        return stack
+
+    # Callers hold the shard's lock and, for files owned by a user, that user's lock
+    def _put_file(self, shard: Shard, file: File) -> None:
+        shard.files[file.name] = file
+        shard.index.add(file.name, file.size)
+        user = self.users.get(file.owner_id)
+        if user:
+            user.file_names.add(file.name)
+            user.changed_names.add(file.name)
+            self._charge(user, file.size)
+
+    def _pop_file(self, shard: Shard, name: str) -> File:
+        file = shard.files.pop(name)
+        shard.index.remove(name, file.size)
+        user = self.users.get(file.owner_id)
+        if user:
+            user.file_names.discard(name)
+            user.changed_names.add(name)
+            self._charge(user, -file.size)
+        return file
+
+    def add_file(self, name: str, size: int) -> bool:
+        file = File(name=name, size=size)
+        shard = self._shard(name)
+        with self._owner_lock(file.owner_id), shard.lock:
+            if name in shard.files:
+                return False
+            self._put_file(shard, file)
+            return True
+
+    def get_file_size(self, name: str) -> int | None:
+        shard = self._shard(name)
+        with shard.lock:
+            file = shard.files.get(name)
+            return file.size if file else None
+
+    def delete_file(self, name: str) -> int | None:
+        shard = self._shard(name)
+        while True:
+            with shard.lock:
+                file = shard.files.get(name)
+                if file is None:
+                    return None
+            # Re-check under the owner's lock in case the file changed hands in between
+            with self._owner_lock(file.owner_id), shard.lock:
+                current = shard.files.get(name)
+                if current is None:
+                    return None
+                if current.owner_id == file.owner_id:
+                    return self._pop_file(shard, name).size
+
+    def get_n_largest(self, prefix: str, n: int) -> list[str]:
+        tops = []
+        for shard in self.shards:
+            with shard.lock:
+                tops.append(shard.index.top(prefix, n))
+        return [name for _, name in islice(heapq.merge(*tops), n)]
+
+    def get_prefix_stats(self, prefix: str) -> tuple[int, int]:
+        count = total_size = 0
+        for shard in self.shards:
+            with shard.lock:
+                shard_count, shard_size = shard.index.stats(prefix)
+            count += shard_count
+            total_size += shard_size
+        return count, total_size
+
+    def _iter_shard(self, shard: Shard, prefix: str, after: tuple[int, str] | None, chunk: int):
+        while True:
+            with shard.lock:
+                entries = shard.index.page(prefix, after, chunk)
+            yield from entries
+            if len(entries) < chunk:
+                return
+            after = entries[-1]
+
+    def iter_largest(self, prefix: str) -> Iterator[str]:
+        shards = [self._iter_shard(shard, prefix, None, SortedList.LOAD) for shard in self.shards]
+        return (name for _, name in heapq.merge(*shards))
+
+    def list_files(self, prefix: str, limit: int, token: str | None = None) -> tuple[list[str], str | None]:
+        if limit <= 0:
+            return [], token
+        after = decode_token(token)
+        pages = []
+        for shard in self.shards:
+            with shard.lock:
+                pages.append(shard.index.page(prefix, after, limit + 1))
+        entries = list(islice(heapq.merge(*pages), limit + 1))
+        next_token = encode_token(entries[limit - 1]) if len(entries) > limit else None
+        return [name for _, name in entries[:limit]], next_token
+
+    def add_files(self, files: Iterable[tuple[str, int]], atomic: bool = False) -> list[bool]:
+        files = list(files)
+        with self._owner_lock("admin"), self._shard_locks([name for name, _ in files]):
+            results = []
+            added: dict[str, int] = {}
+            for name, size in files:
+                if name in self._shard(name).files or name in added:
+                    results.append(False)
+                else:
+                    added[name] = size
+                    results.append(True)
+            if atomic and not all(results):
+                return [False] * len(results)
+            for name, size in added.items():
+                self._put_file(self._shard(name), File(name=name, size=size))
+            return results
+
+    def delete_files(self, names: Iterable[str], atomic: bool = False) -> list[int | None]:
+        names = list(names)
+        while True:
+            with self._shard_locks(names):
+                owners = {
+                    self._shard(name).files[name].owner_id for name in names if name in self._shard(name).files
+                }
+            with ExitStack() as stack:
+                for owner_id in sorted(owners):
+                    stack.enter_context(self._owner_lock(owner_id))
+                stack.enter_context(self._shard_locks(names))
+                files = [self._shard(name).files.get(name) for name in names]
+                # Retry if a file changed hands before its owner's lock was taken
+                if any(file and file.owner_id not in owners for file in files):
+                    continue
+                results = []
+                deleted: set[str] = set()
+                for name, file in zip(names, files):
+                    if file and name not in deleted:
+                        deleted.add(name)
+                        results.append(file.size)
+                    else:
+                        results.append(None)
+                if atomic and None in results:
+                    return [None] * len(results)
+                for name in deleted:
+                    self._pop_file(self._shard(name), name)
+                return results
+
+    def get_file_sizes(self, names: Iterable[str]) -> list[int | None]:
+        names = list(names)
+        with self._shard_locks(names):
+            files = [self._shard(name).files.get(name) for name in names]
+        return [file.size if file else None for file in files]
+
+    def add_user(self, user_id: str, capacity: int) -> bool:
+        with self.users_lock:
+            if user_id in self.users:
+                return False
+            self.user_locks[user_id] = Lock()
+            self.users[user_id] = User(user_id=user_id, capacity=capacity)
+            with self.ranking_lock:
+                self.user_ranking.add((0, user_id))
+            return True
+
+    def get_user_stats(self, user_id: str) -> tuple[int, int] | None:
+        if user_id not in self.users:
+            return None
+        user = self.users[user_id]
+        with self.user_locks[user_id]:
+            return len(user.file_names), user.used_capacity
+
+    def get_top_users(self, n: int) -> list[str]:
+        with self.ranking_lock:
+            return [user_id for _, user_id in self.user_ranking.head(max(n, 0))]
+
+    def add_file_by(self, user_id: str, name: str, size: int) -> int | None:
+        if user_id not in self.users:
+            return None
+        user = self.users[user_id]
+        shard = self._shard(name)
+        with self.user_locks[user_id], shard.lock:
+            if name in shard.files or size > user.remaining_capacity:
+                return None
+            self._put_file(shard, File(name=name, size=size, owner_id=user_id))
+            return user.remaining_capacity
+
+    def add_files_by(self, user_id: str, files: Iterable[tuple[str, int]], atomic: bool = False) -> list[int | None]:
+        files = list(files)
+        if user_id not in self.users:
+            return [None] * len(files)
+        user = self.users[user_id]
+        with self.user_locks[user_id], self._shard_locks([name for name, _ in files]):
+            remaining = user.remaining_capacity
+            results = []
+            added: dict[str, int] = {}
+            for name, size in files:
+                if name in self._shard(name).files or name in added or size > remaining:
+                    results.append(None)
+                else:
+                    added[name] = size
+                    remaining -= size
+                    results.append(remaining)
+            if atomic and None in results:
+                return [None] * len(results)
+            for name, size in added.items():
+                self._put_file(self._shard(name), File(name=name, size=size, owner_id=user_id))
+            return results
+
+    def backup_user(self, user_id: str) -> int | None:
+        if user_id not in self.users:
+            return None
+        user = self.users[user_id]
+        with self.user_locks[user_id]:
+            backup_files = self.backups.setdefault(user_id, {})
+            for file_name in user.changed_names:
+                if file_name in user.file_names:
+                    shard = self._shard(file_name)
+                    with shard.lock:
+                        backup_files[file_name] = shard.files[file_name].size
+                else:
+                    backup_files.pop(file_name, None)
+            user.changed_names.clear()
+            return len(backup_files)
+
+    def restore_user(self, user_id: str) -> int | None:
+        if user_id not in self.users:
+            return None
+        user = self.users[user_id]
+        with self.user_locks[user_id]:
+            backup_files = self.backups.get(user_id, {})
+            changed_names, user.changed_names = user.changed_names, set()
+            for file_name in changed_names:
+                shard = self._shard(file_name)
+                with shard.lock:
+                    if file_name in user.file_names and backup_files.get(file_name) != shard.files[file_name].size:
+                        self._pop_file(shard, file_name)
+            for file_name in changed_names:
+                if file_name in backup_files:
+                    shard = self._shard(file_name)
+                    with shard.lock:
+                        if file_name not in shard.files:
+                            self._put_file(
+                                shard, File(name=file_name, size=backup_files[file_name], owner_id=user_id)
+                            )
+            user.changed_names = {
+                file_name
+                for file_name in changed_names
+                if file_name in backup_files and file_name not in user.file_names
+            }
+            return len(backup_files) - len(user.changed_names)
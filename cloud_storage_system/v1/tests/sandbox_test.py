@@ -1,5 +1,16 @@
+import os
+import random
+import tempfile
+import threading
 import unittest
-from storage_system_impl import StorageSystemBasicImpl, StorageSystemAdvancedImpl
+from prefix_index import PrefixIndex, SortedList
+from storage_system_durable_impl import StorageSystemDurableImpl
+from storage_system_impl import (
+    StorageSystemAdvancedImpl,
+    StorageSystemBasicImpl,
+    StorageSystemCompactImpl,
+    StorageSystemShardedImpl,
+)
 
 class SandboxTests(unittest.TestCase):
     """
@@ -151,4 +162,281 @@ class SandboxTests(unittest.TestCase):
         self.assertIsNone(db.get_file_size("/user2/file2.txt"))
     
         # Test restore_user - user doesn't exist
-        self.assertIsNone(db.restore_user("nonexistent_user"))
\ No newline at end of file
+        self.assertIsNone(db.restore_user("nonexistent_user"))
+
+    def test_batch_operations(self):
+        """Test batch adds, deletes and lookups in best-effort and all-or-nothing modes"""
+        sharded = StorageSystemShardedImpl(shard_count=4)
+        for db in (self.basic, self.advanced, StorageSystemCompactImpl(), sharded):
+            self.assertTrue(db.add_file("/a", 1))
+            self.assertEqual(db.add_files([("/a", 2), ("/b", 3), ("/b", 4)], atomic=True), [False, False, False])
+            self.assertIsNone(db.get_file_size("/b"))
+            self.assertEqual(db.add_files([("/a", 2), ("/b", 3), ("/b", 4), ("/c", 5)]), [False, True, False, True])
+            self.assertEqual(db.get_file_sizes(["/a", "/b", "/c", "/d"]), [1, 3, 5, None])
+            self.assertEqual(db.get_n_largest("/", 5), ["/c", "/b", "/a"])
+            self.assertEqual(db.delete_files(["/a", "/d"], atomic=True), [None, None])
+            self.assertEqual(db.get_file_size("/a"), 1)
+            self.assertEqual(db.delete_files(["/a", "/a", "/d"]), [1, None, None])
+            self.assertEqual(db.get_n_largest("/", 5), ["/c", "/b"])
+
+        for db in (self.advanced, sharded):
+            self.assertTrue(db.add_user("user1", 10))
+            self.assertEqual(db.add_files_by("nobody", [("/x", 1)]), [None])
+            self.assertEqual(db.add_files_by("user1", [("/x", 4), ("/y", 7), ("/z", 6)], atomic=True), [None, None, None])
+            self.assertIsNone(db.get_file_size("/x"))
+            self.assertEqual(db.add_files_by("user1", [("/x", 4), ("/c", 1), ("/y", 7), ("/z", 6)]), [6, None, None, 0])
+            self.assertEqual(db.users["user1"].used_capacity, 10)
+            self.assertEqual(db.delete_files(["/x", "/c"]), [4, 5])
+            self.assertEqual(db.users["user1"].remaining_capacity, 4)
+
+    def test_lazy_listing(self):
+        """Test lazy iteration and paginated listing under a prefix"""
+        for db in (self.basic, self.advanced, StorageSystemShardedImpl(shard_count=4)):
+            self.assertTrue(all(db.add_files((f"/dir/file{i}", i % 7) for i in range(1000))))
+            self.assertTrue(db.add_file("/other", 100))
+            expected = sorted((f"/dir/file{i}" for i in range(1000)), key=lambda name: (-db.get_file_size(name), name))
+
+            files = db.iter_largest("/dir")
+            self.assertEqual([next(files) for _ in range(3)], expected[:3])
+            self.assertEqual(list(files), expected[3:])
+            self.assertEqual(list(db.iter_largest("/nothing")), [])
+
+            listed, token, pages = [], None, 0
+            while True:
+                page, token = db.list_files("/dir", 128, token)
+                listed += page
+                pages += 1
+                if token is None:
+                    break
+            self.assertEqual(listed, expected)
+            self.assertEqual(pages, 8)
+            self.assertEqual(db.list_files("/dir", 1000), (expected, None))
+            self.assertEqual(db.list_files("/dir", 0), ([], None))
+
+            # A page picks up where the previous one stopped even if files changed in between
+            page, token = db.list_files("/dir", 2)
+            self.assertIsNotNone(db.delete_file(expected[2]))
+            self.assertEqual(db.list_files("/dir", 2, token)[0], expected[3:5])
+
+    def test_aggregate_stats(self):
+        """Test per-prefix totals, per-user totals and the user ranking"""
+        self.assertTrue(self.basic.add_file("/dir/a", 5))
+        self.assertTrue(self.basic.add_file("/dir/ab", 7))
+        self.assertTrue(self.basic.add_file("/dot", 1))
+        self.assertEqual(self.basic.get_prefix_stats("/d"), (3, 13))
+        self.assertEqual(self.basic.get_prefix_stats("/dir/a"), (2, 12))
+        self.assertEqual(self.basic.delete_file("/dir/ab"), 7)
+        self.assertEqual(self.basic.get_prefix_stats("/dir/a"), (1, 5))
+        self.assertEqual(self.basic.get_prefix_stats("/x"), (0, 0))
+
+        for db in (self.advanced, StorageSystemShardedImpl(shard_count=4)):
+            for user_id in ("carol", "alice", "bob"):
+                self.assertTrue(db.add_user(user_id, 100))
+            self.assertEqual(db.get_top_users(2), ["alice", "bob"])
+            self.assertEqual(db.add_file_by("bob", "/bob/a", 30), 70)
+            self.assertEqual(db.add_files_by("carol", [("/carol/a", 10), ("/carol/b", 20)]), [90, 70])
+            self.assertTrue(db.add_file("/admin/a", 1000))
+            self.assertEqual(db.get_top_users(5), ["bob", "carol", "alice"])
+            self.assertEqual(db.get_user_stats("carol"), (2, 30))
+            self.assertIsNone(db.get_user_stats("dave"))
+            self.assertEqual(db.get_prefix_stats("/"), (4, 1060))
+            self.assertEqual(db.get_prefix_stats("/carol/"), (2, 30))
+            self.assertEqual(db.backup_user("carol"), 2)
+            self.assertEqual(db.delete_file("/carol/b"), 20)
+            self.assertEqual(db.get_top_users(1), ["bob"])
+            self.assertEqual(db.restore_user("carol"), 2)
+            self.assertEqual(db.get_top_users(0), [])
+            self.assertEqual(db.get_top_users(5), ["bob", "carol", "alice"])
+            self.assertEqual(db.get_user_stats("carol"), (2, 30))
+
+    def test_compact_storage(self):
+        """Test that the columnar backend behaves like the advanced one"""
+        db = StorageSystemCompactImpl()
+        self.assertTrue(db.add_user("user1", 100))
+        self.assertEqual(db.add_file_by("user1", "/user1/a.txt", 60), 40)
+        self.assertIsNone(db.add_file_by("user1", "/user1/b.txt", 50))
+        self.assertTrue(db.add_file("/admin.log", 500))
+        self.assertFalse(db.add_file("/admin.log", 5))
+        self.assertEqual(db.get_file_size("/user1/a.txt"), 60)
+        self.assertEqual(db.files["/admin.log"].owner_id, "admin")
+        self.assertEqual(db.backup_user("user1"), 1)
+        self.assertEqual(db.delete_file("/user1/a.txt"), 60)
+        self.assertEqual(db.add_file_by("user1", "/user1/b.txt", 50), 50)
+        self.assertEqual(len(db.files.sizes), 2)  # the deleted row was reused
+        self.assertEqual(db.restore_user("user1"), 1)
+        self.assertEqual(db.get_n_largest("/", 3), ["/admin.log", "/user1/a.txt"])
+        self.assertIsNone(db.get_file_size("/user1/b.txt"))
+        self.assertEqual(db.users["user1"].remaining_capacity, 40)
+
+    def test_sharded_storage(self):
+        """Test the sharded backend, including cross-shard top-N and backups"""
+        db = StorageSystemShardedImpl(shard_count=4)
+        self.assertTrue(db.add_file("/dir/file1.txt", 5))
+        self.assertTrue(db.add_file("/dir/file2.txt", 20))
+        self.assertTrue(db.add_file("/dir/deeper/file3.mov", 9))
+        self.assertFalse(db.add_file("/dir/file1.txt", 10))
+        self.assertTrue(db.add_file("/big_file.mp4", 20))
+        self.assertEqual(db.get_n_largest("/", 2), ["/big_file.mp4", "/dir/file2.txt"])
+        self.assertEqual(db.get_n_largest("/dir", 10), ["/dir/file2.txt", "/dir/deeper/file3.mov", "/dir/file1.txt"])
+
+        self.assertTrue(db.add_user("user1", 100))
+        self.assertEqual(db.add_file_by("user1", "/user1/a.txt", 60), 40)
+        self.assertIsNone(db.add_file_by("user1", "/user1/b.txt", 50))
+        self.assertIsNone(db.add_file_by("user1", "/dir/file1.txt", 1))
+        self.assertEqual(db.backup_user("user1"), 1)
+        self.assertEqual(db.delete_file("/user1/a.txt"), 60)
+        self.assertEqual(db.add_file_by("user1", "/user1/b.txt", 50), 50)
+        self.assertEqual(db.restore_user("user1"), 1)
+        self.assertEqual(db.get_file_size("/user1/a.txt"), 60)
+        self.assertIsNone(db.get_file_size("/user1/b.txt"))
+        self.assertIsNone(db.restore_user("user2"))
+
+    def test_sharded_storage_threads(self):
+        """Test that concurrent writers never exceed a shared user's capacity"""
+        db = StorageSystemShardedImpl(shard_count=8)
+        self.assertTrue(db.add_user("user1", 1000))
+
+        def work(worker: int):
+            for i in range(300):
+                name = f"/w{worker}/file{i}"
+                if db.add_file_by("user1", name, 3) is not None and i % 3 == 0:
+                    db.delete_file(name)
+
+        threads = [threading.Thread(target=work, args=(w,)) for w in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        user = db.users["user1"]
+        stored = sum(db.get_file_size(name) for name in user.file_names)
+        self.assertEqual(user.used_capacity, stored)
+        self.assertLessEqual(user.used_capacity, 1000)
+        self.assertEqual(len(db.get_n_largest("/", 10_000)), len(user.file_names))
+
+    def test_durable_storage(self):
+        """Test recovery from the log alone, from a snapshot plus log, and past a torn record"""
+        with tempfile.TemporaryDirectory() as directory:
+            db = StorageSystemDurableImpl(directory, sync_every=2, snapshot_every=None)
+            self.assertTrue(db.add_user("user1", 100))
+            self.assertEqual(db.add_file_by("user1", "/user1/a.txt", 60), 40)
+            self.assertTrue(db.add_file("/admin.log", 500))
+            self.assertEqual(db.backup_user("user1"), 1)
+            self.assertEqual(db.delete_file("/user1/a.txt"), 60)
+            db.close()
+
+            db = StorageSystemDurableImpl(directory, snapshot_every=None)
+            self.assertIsNone(db.get_file_size("/user1/a.txt"))
+            self.assertEqual(db.restore_user("user1"), 1)
+            db.snapshot()
+            self.assertEqual(db.add_file_by("user1", "/user1/b.txt", 30), 10)
+            db.close()
+            with open(os.path.join(directory, f"wal.{db.generation}"), "a") as f:
+                f.write('["add_file","/torn')
+
+            db = StorageSystemDurableImpl(directory, snapshot_every=None)
+            self.assertEqual(db.get_n_largest("/", 5), ["/admin.log", "/user1/a.txt", "/user1/b.txt"])
+            self.assertEqual(db.users["user1"].remaining_capacity, 10)
+            self.assertTrue(db.add_file("/after_torn.txt", 1))
+            self.assertEqual(db.add_files_by("user1", [("/user1/c.txt", 5), ("/user1/d.txt", 50)]), [5, None])
+            self.assertEqual(db.delete_files(["/user1/b.txt", "/missing"], atomic=True), [None, None])
+            self.assertEqual(db.delete_files(["/user1/b.txt", "/missing"]), [30, None])
+            db.close()
+            db = StorageSystemDurableImpl(directory)
+            self.assertEqual(db.get_file_sizes(["/user1/b.txt", "/user1/c.txt", "/user1/d.txt"]), [None, 5, None])
+            self.assertEqual(db.get_file_size("/after_torn.txt"), 1)
+            db.snapshot()
+            db.close()
+            db = StorageSystemDurableImpl(directory)
+            self.assertEqual(db.get_user_stats("user1"), (2, 65))
+            self.assertEqual(db.get_prefix_stats("/user1/"), (2, 65))
+            self.assertEqual(db.get_top_users(1), ["user1"])
+            db.close()
+
+    def test_incremental_backup(self):
+        """Test that restores only touch changed files and retry earlier conflicts"""
+        db = self.advanced
+        self.assertTrue(db.add_user("user1", 1000))
+        self.assertTrue(db.add_user("user2", 1000))
+        self.assertEqual(db.add_file_by("user1", "/a.txt", 10), 990)
+        self.assertEqual(db.add_file_by("user1", "/b.txt", 20), 970)
+        self.assertEqual(db.backup_user("user1"), 2)
+        untouched = db.files["/a.txt"]
+
+        # Delete and re-add with a different size, then add a file missing from the backup
+        self.assertEqual(db.delete_file("/b.txt"), 20)
+        self.assertEqual(db.add_file_by("user1", "/b.txt", 5), 985)
+        self.assertEqual(db.add_file_by("user1", "/c.txt", 1), 984)
+        self.assertEqual(db.restore_user("user1"), 2)
+        self.assertIs(db.files["/a.txt"], untouched)
+        self.assertEqual(db.get_file_size("/b.txt"), 20)
+        self.assertIsNone(db.get_file_size("/c.txt"))
+        self.assertEqual(db.users["user1"].used_capacity, 30)
+
+        # A conflicting name is skipped, then restored once the other user frees it
+        self.assertEqual(db.delete_file("/b.txt"), 20)
+        self.assertEqual(db.add_file_by("user2", "/b.txt", 7), 993)
+        self.assertEqual(db.restore_user("user1"), 1)
+        self.assertEqual(db.get_file_size("/b.txt"), 7)
+        self.assertEqual(db.delete_file("/b.txt"), 7)
+        self.assertEqual(db.restore_user("user1"), 2)
+        self.assertEqual(db.get_file_size("/b.txt"), 20)
+        self.assertEqual(db.get_n_largest("/", 5), ["/b.txt", "/a.txt"])
+
+        # A new backup only folds in what changed since the previous one
+        self.assertEqual(db.delete_file("/a.txt"), 10)
+        self.assertEqual(db.backup_user("user1"), 1)
+        self.assertEqual(db.backups["user1"], {"/b.txt": 20})
+
+    def test_prefix_index(self):
+        """Test the prefix index against a full scan under random adds and deletes"""
+        rng = random.Random(7)
+        index = PrefixIndex()
+        files = {}
+        names = [f"/{a}/{b}{c}" for a in ("dir", "do", "d") for b in ("f", "file", "fi") for c in range(5)]
+        for _ in range(2000):
+            name = rng.choice(names)
+            if name in files:
+                index.remove(name, files.pop(name))
+            else:
+                files[name] = rng.randint(-5, 20)
+                index.add(name, files[name])
+            prefix = rng.choice(names)[: rng.randint(0, 10)]
+            n = rng.randint(0, 8)
+            matching = [name for name in files if name.startswith(prefix)]
+            expected = sorted(matching, key=lambda x: (-files[x], x))[:n]
+            self.assertEqual(index.n_largest(prefix, n), expected)
+            self.assertEqual(index.stats(prefix), (len(matching), sum(files[name] for name in matching)))
+        self.assertEqual(len(index), len(files))
+        # Only branching nodes keep a sorted list of their subtree
+        nodes = [index.root]
+        while nodes:
+            node = nodes.pop()
+            self.assertEqual(node.entries is not None, len(node.children or ()) > 1)
+            nodes.extend((node.children or {}).values())
+
+    def test_sorted_list(self):
+        """Test the bucketed sorted list across bucket splits and removals"""
+        rng = random.Random(11)
+        values = SortedList()
+        expected = []
+        for _ in range(5000):
+            if expected and rng.random() < 0.4:
+                value = rng.choice(expected)
+                expected.remove(value)
+                values.remove(value)
+            else:
+                value = rng.randint(0, 1000)
+                expected.append(value)
+                values.add(value)
+        self.assertEqual(list(values), sorted(expected))
+        self.assertEqual(values.head(10), sorted(expected)[:10])
+        self.assertGreater(len(values.buckets), 1)
+        with self.assertRaises(ValueError):
+            values.remove(1001)
+        # Copies share buckets until written, without seeing each other's changes
+        copy = values.copy()
+        copy.add(-1)
+        values.remove(expected[0])
+        self.assertEqual(list(copy), sorted(expected + [-1]))
+        expected.remove(expected[0])
+        self.assertEqual(list(values), sorted(expected))
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Loopback throughput of MemoryDatabaseServer over a single connection at several pipeline
+depths.
+
+The server runs in its own process so it does not share a core with the client. For each
+depth the client keeps that many commands in flight per round trip, first writing fields
+with set_at and then reading them back with get_at.
+
+Run from in_memory_database/v1: python -m benchmarks.server_throughput
+"""
+
+import argparse
+import asyncio
+import subprocess
+import sys
+import time
+
+from memory_database_client import MemoryDatabaseClient
+
+
+async def run_phase(client: MemoryDatabaseClient, ops: int, depth: int, issue) -> float:
+    start = time.perf_counter()
+    for batch in range(0, ops, depth):
+        await asyncio.gather(*[issue(i) for i in range(batch, min(batch + depth, ops))])
+    return ops / (time.perf_counter() - start)
+
+
+async def run(port: int, args) -> None:
+    client = await MemoryDatabaseClient.connect(port=port)
+    print(f"{'depth':>8} {'set_at ops/s':>14} {'get_at ops/s':>14}")
+    for round_, depth in enumerate(args.depths):
+        # Each round writes at its own timestamp so it does not read the previous round's values
+        timestamp = round_ + 1
+        written = await run_phase(
+            client, args.ops, depth, lambda i: client.set_at(f"key{i % 1000}", f"field{i}", "value", timestamp)
+        )
+        read = await run_phase(
+            client, args.ops, depth, lambda i: client.get_at(f"key{i % 1000}", f"field{i}", timestamp)
+        )
+        print(f"{depth:>8} {written:>14,.0f} {read:>14,.0f}")
+    await client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", type=int, default=200_000, help="operations per phase")
+    parser.add_argument("--depths", type=int, nargs="+", default=[1, 16, 256, 4096])
+    args = parser.parse_args()
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "memory_database_server", "--port", "0"], stdout=subprocess.PIPE, text=True
+    )
+    try:
+        # The server reports the port it picked as "listening on host:port"
+        port = int(server.stdout.readline().rsplit(":", 1)[1])
+        asyncio.run(run(port, args))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Commit throughput and abort rate of MemoryDatabaseAdvancedImpl transactions under contention.
+
+Each round, a number of simulated clients begin a transaction at the same timestamp, read a
+few fields from a hot set and write them back incremented, then commit in shuffled order.
+The smaller the hot set, the more transactions touch a field an earlier commit of the
+round already wrote, and the more of them abort.
+
+Run from in_memory_database/v1: python -m benchmarks.transactions
+"""
+
+import argparse
+import random
+import time
+
+from memory_database_impl import MemoryDatabaseAdvancedImpl
+
+
+def run(hot: int, args) -> tuple[float, float]:
+    rng = random.Random(args.seed)
+    db = MemoryDatabaseAdvancedImpl()
+    for i in range(hot):
+        db.set_at("hot", f"field{i}", "0", 1)
+    committed = aborted = 0
+    timestamp = 1
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        timestamp += 1
+        transactions = []
+        for _ in range(args.clients):
+            transaction = db.begin(timestamp)
+            for i in rng.sample(range(hot), min(args.fields, hot)):
+                field = f"field{i}"
+                transaction.set("hot", field, str(int(transaction.get("hot", field)) + 1))
+            transactions.append(transaction)
+        rng.shuffle(transactions)
+        timestamp += 1
+        for transaction in transactions:
+            if transaction.commit(timestamp):
+                committed += 1
+            else:
+                aborted += 1
+    elapsed = time.perf_counter() - start
+    return committed / elapsed, aborted / (committed + aborted)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=16, help="concurrent transactions per round")
+    parser.add_argument("--fields", type=int, default=4, help="hot fields read and written per transaction")
+    parser.add_argument("--hot", type=int, nargs="+", default=[4, 16, 64, 256, 4096], help="hot set sizes")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'hot set':>8} {'commits/s':>12} {'abort rate':>11}")
+    for hot in args.hot:
+        commits, abort_rate = run(hot, args)
+        print(f"{hot:>8} {commits:>12,.0f} {abort_rate:>11.1%}")
+
+
+if __name__ == "__main__":
+    main()
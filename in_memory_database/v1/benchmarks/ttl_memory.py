@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Memory over time for a steady-state TTL workload, with and without purging expired versions.
+
+Every tick writes a batch of fields with a fixed TTL, spread over a pool of keys and
+fields, and reads a few back, so the number of live versions stays constant. Memory is
+sampled with tracemalloc as the logical clock advances; with purging it levels off once
+the first TTL has elapsed, without it grows with every write.
+
+Run from in_memory_database/v1: python -m benchmarks.ttl_memory
+"""
+
+import argparse
+import random
+import tracemalloc
+
+from memory_database_impl import MemoryDatabaseAdvancedImpl
+
+
+def run(purge_expired: bool, args) -> list[tuple[int, int]]:
+    rng = random.Random(args.seed)
+    samples = []
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    db = MemoryDatabaseAdvancedImpl(purge_expired=purge_expired, compact_every=64 if purge_expired else None)
+    for tick in range(1, args.ticks + 1):
+        for _ in range(args.writes):
+            key = f"key{rng.randrange(args.keys)}"
+            field = f"field{rng.randrange(args.fields)}"
+            db.set_at_with_ttl(key, field, f"value{tick}", tick, args.ttl)
+        for _ in range(args.writes // 10):
+            db.get_at(f"key{rng.randrange(args.keys)}", f"field{rng.randrange(args.fields)}", tick)
+        if tick % args.sample_every == 0:
+            samples.append((tick, tracemalloc.get_traced_memory()[0] - before))
+    tracemalloc.stop()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ticks", type=int, default=1_000)
+    parser.add_argument("--writes", type=int, default=200, help="TTL writes per tick")
+    parser.add_argument("--ttl", type=int, default=50)
+    parser.add_argument("--keys", type=int, default=10_000)
+    parser.add_argument("--fields", type=int, default=10)
+    parser.add_argument("--sample-every", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    purged = run(True, args)
+    kept = run(False, args)
+    print(f"{'tick':>8} {'purged MiB':>12} {'kept MiB':>12}")
+    for (tick, with_purge), (_, without_purge) in zip(purged, kept):
+        print(f"{tick:>8} {with_purge / 2**20:12.1f} {without_purge / 2**20:12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Bytes per version of MemoryDatabaseAdvancedImpl with the default list-of-tuples version
+chains and with compact_storage, plus the cost of reading them back.
+
+Fields are written over and over with small values drawn from a fixed pool, with names
+built fresh for every call as they would arrive over the wire. Memory is measured with
+tracemalloc and divided by the number of versions kept; compaction and purging are off so
+every version written is kept.
+
+Run from in_memory_database/v1: python -m benchmarks.value_storage
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+from memory_database_impl import MemoryDatabaseAdvancedImpl
+
+
+def run(compact_storage: bool, args) -> tuple[float, float]:
+    rng = random.Random(args.seed)
+    values = [f"value{i}" for i in range(args.values)]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    db = MemoryDatabaseAdvancedImpl(purge_expired=False, compact_every=None, compact_storage=compact_storage)
+    timestamp = 1_000_000
+    for _ in range(args.versions):
+        for i in range(args.keys * args.fields):
+            timestamp += 1
+            key, field = f"key{i % args.keys}", f"field{i // args.keys}"
+            if rng.random() < args.ttl_share:
+                db.set_at_with_ttl(key, field, rng.choice(values), timestamp, 1_000_000)
+            else:
+                db.set_at(key, field, rng.choice(values), timestamp)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    versions = sum(len(versions) for record in db.db.values() for versions in record.values())
+
+    reads = 100_000
+    start = time.perf_counter()
+    for _ in range(reads):
+        i = rng.randrange(args.keys * args.fields)
+        db.get_at(f"key{i % args.keys}", f"field{i // args.keys}", rng.randrange(1_000_000, timestamp))
+    return used / versions, reads / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=1000)
+    parser.add_argument("--fields", type=int, default=100, help="fields per key")
+    parser.add_argument("--versions", type=int, nargs="+", default=[1, 4, 16], help="versions per field")
+    parser.add_argument("--values", type=int, default=1000, help="distinct values")
+    parser.add_argument("--ttl-share", type=float, default=0.5, help="share of writes with a TTL")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'versions':>8} {'storage':>8} {'bytes/version':>14} {'get_at ops/s':>13}")
+    for versions in args.versions:
+        for compact_storage in (False, True):
+            run_args = argparse.Namespace(**{**vars(args), "versions": versions})
+            per_version, reads = run(compact_storage, run_args)
+            name = "compact" if compact_storage else "default"
+            print(f"{versions:>8} {name:>8} {per_version:>14,.0f} {reads:>13,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+from array import array
+
+# Stands in for an expire_at of None, which an int64 column cannot hold
+NO_EXPIRY = -(1 << 63)
+# Stands in for the None value of a deletion marker
+NO_VALUE = -1
+
+_get = array.__getitem__
+_len = array.__len__
+_extend = array.extend
+_setitem = array.__setitem__
+
+
+class ValueTable:
+    """
+    Shared, reference-counted table of the values stored in CompactVersions, so every version
+    holds a small id instead of a pointer to its own string and equal values are stored once.
+    Ids of values no longer referenced are reused.
+    """
+
+    __slots__ = ("ids", "values", "refs", "free")
+
+    def __init__(self):
+        self.ids: dict[str, int] = {}
+        self.values: list[str | None] = []
+        self.refs = array("q")
+        self.free: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def acquire(self, value: str | None) -> int:
+        if value is None:
+            return NO_VALUE
+        i = self.ids.get(value)
+        if i is None:
+            if self.free:
+                i = self.free.pop()
+                self.values[i] = value
+            else:
+                i = len(self.values)
+                self.values.append(value)
+                self.refs.append(0)
+            self.ids[value] = i
+        self.refs[i] += 1
+        return i
+
+    def release(self, i: int) -> None:
+        if i == NO_VALUE:
+            return
+        self.refs[i] -= 1
+        if not self.refs[i]:
+            del self.ids[self.values[i]]
+            self.values[i] = None
+            self.free.append(i)
+
+
+class CompactVersions(array):
+    """
+    Version chain [(timestamp, value, expire_at)] stored as one int64 array of
+    timestamp, value id, expire_at triples, with values kept in a shared ValueTable.
+
+    It reads like the list of tuples it replaces (indexing, slicing, len, iteration, append
+    and insert), so the version helpers of MemoryDatabaseAdvancedImpl work on it unchanged;
+    the tuples are built on access. The three columns share one array rather than one array
+    each, since most chains are short and every array carries its own object header.
+    """
+
+    __slots__ = ("table",)
+
+    def __new__(cls, table: ValueTable, versions=()):
+        chain = super().__new__(cls, "q")
+        chain.table = table
+        for version in versions:
+            chain.append(version)
+        return chain
+
+    def __len__(self) -> int:
+        return _len(self) // 3
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        i *= 3
+        value = _get(self, i + 1)
+        expire_at = _get(self, i + 2)
+        return (
+            _get(self, i),
+            None if value == NO_VALUE else self.table.values[value],
+            None if expire_at == NO_EXPIRY else expire_at,
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def _encode(self, version: tuple) -> list[int]:
+        timestamp, value, expire_at = version
+        return [timestamp, self.table.acquire(value), NO_EXPIRY if expire_at is None else expire_at]
+
+    def append(self, version: tuple) -> None:
+        _extend(self, self._encode(version))
+
+    def insert(self, i: int, version: tuple) -> None:
+        _setitem(self, slice(3 * i, 3 * i), array("q", self._encode(version)))
+
+    def release(self) -> None:
+        """Drops this chain's references to its values once it is no longer stored."""
+        release = self.table.release
+        for i in range(1, _len(self), 3):
+            release(_get(self, i))
+
+    def __reduce_ex__(self, protocol):
+        # The ids are already counted in the table pickled alongside, so they are restored as is
+        return _restore, (self.table, self.tobytes())
+
+
+def _restore(table: ValueTable, data: bytes) -> CompactVersions:
+    chain = CompactVersions(table)
+    chain.frombytes(data)
+    return chain
@@ -0,0 +1 @@
+../../shared/durable_log.py
\ No newline at end of file
@@ -0,0 +1,106 @@
+import asyncio
+from collections import deque
+from resp import ProtocolError, ReplyError, encode_command, parse_reply
+
+
+def _none(_) -> None:
+    return None
+
+
+class MemoryDatabaseClient:
+    """
+    asyncio client for MemoryDatabaseServer with the same methods as MemoryDatabase, each
+    returning a future for the reply.
+
+    Calls are pipelined: a command is buffered and the buffer is sent once the caller yields
+    to the event loop, so issuing many calls before awaiting them (e.g. with asyncio.gather)
+    sends them in one write and reads their replies back in order.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.outgoing = bytearray()
+        # (future, reply converter) per command sent, in order
+        self.waiting: deque[tuple[asyncio.Future, object]] = deque()
+        self.receiver = asyncio.create_task(self._receive())
+
+    @classmethod
+    async def connect(cls, host: str = "127.0.0.1", port: int = 6380) -> "MemoryDatabaseClient":
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def close(self) -> None:
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.receiver.cancel()
+
+    def _send(self, *args, convert=None) -> asyncio.Future:
+        if self.receiver.done():
+            raise ConnectionError("connection closed")
+        if not self.outgoing:
+            asyncio.get_running_loop().call_soon(self._flush)
+        self.outgoing += encode_command(*args)
+        future = asyncio.get_running_loop().create_future()
+        self.waiting.append((future, convert))
+        return future
+
+    def _flush(self) -> None:
+        self.writer.write(self.outgoing)
+        self.outgoing = bytearray()
+
+    async def _receive(self) -> None:
+        buffer = bytearray()
+        error = ConnectionError("connection closed")
+        try:
+            while data := await self.reader.read(1 << 16):
+                buffer += data
+                pos = 0
+                while (parsed := parse_reply(buffer, pos)) is not None:
+                    reply, pos = parsed
+                    if not self.waiting:
+                        raise ProtocolError(f"reply {reply!r} to no command")
+                    future, convert = self.waiting.popleft()
+                    # The caller may have stopped waiting, e.g. cancelled by a timeout
+                    if future.done():
+                        continue
+                    if isinstance(reply, ReplyError):
+                        future.set_exception(reply)
+                    else:
+                        future.set_result(convert(reply) if convert else reply)
+                del buffer[:pos]
+        except ProtocolError as exception:
+            # Replies can no longer be matched to commands, so the connection is given up
+            error = exception
+            self.writer.close()
+        except ConnectionError as exception:
+            error = exception
+        finally:
+            while self.waiting:
+                future, _ = self.waiting.popleft()
+                if not future.done():
+                    future.set_exception(error)
+
+    def set_at(self, key: str, field: str, value: str, timestamp: int) -> asyncio.Future:
+        return self._send("SET_AT", key, field, value, timestamp, convert=_none)
+
+    def set_at_with_ttl(self, key: str, field: str, value: str, timestamp: int, ttl: int) -> asyncio.Future:
+        return self._send("SET_AT_WITH_TTL", key, field, value, timestamp, ttl, convert=_none)
+
+    def delete_at(self, key: str, field: str, timestamp: int) -> asyncio.Future:
+        return self._send("DELETE_AT", key, field, timestamp, convert=bool)
+
+    def get_at(self, key: str, field: str, timestamp: int) -> asyncio.Future:
+        return self._send("GET_AT", key, field, timestamp)
+
+    def scan_at(self, key: str, timestamp: int) -> asyncio.Future:
+        return self._send("SCAN_AT", key, timestamp)
+
+    def scan_by_prefix_at(self, key: str, prefix: str, timestamp: int) -> asyncio.Future:
+        return self._send("SCAN_BY_PREFIX_AT", key, prefix, timestamp)
+
+    def backup(self, timestamp: int) -> asyncio.Future:
+        return self._send("BACKUP", timestamp)
+
+    def restore(self, timestamp: int, timestamp_to_restore: int) -> asyncio.Future:
+        return self._send("RESTORE", timestamp, timestamp_to_restore, convert=_none)
@@ -0,0 +1,153 @@
+from durable_log import DurableLog
+from memory_database_impl import MemoryDatabaseAdvancedImpl, Transaction
+from persistent_map import PersistentMap
+from sorted_fields import SortedFields
+
+
+class MemoryDatabaseDurableImpl(DurableLog, MemoryDatabaseAdvancedImpl):
+    """
+    MemoryDatabaseAdvancedImpl that survives restarts, logged and snapshotted by DurableLog.
+
+    Every mutating call is logged together with the logical clock after the call and the
+    oldest open snapshot, so replay purges, compacts and writes deletion markers exactly as
+    the original run did. Transactions do not survive a restart, but everything they changed
+    does: a commit is logged as one record of its writes, and so is the compaction that runs
+    once the last of them finishes. Remaining keyword arguments configure
+    MemoryDatabaseAdvancedImpl.
+
+    Files in directory:
+        snapshot        state as of the end of some log generation
+        aof.<n>         log generation n
+    """
+
+    LOG_PREFIX = "aof"
+
+    def __init__(
+        self,
+        directory: str,
+        sync_every: int = 1000,
+        sync_interval: float = 1.0,
+        snapshot_every: int | None = 1_000_000,
+        background: bool = True,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        # While replaying, the oldest open snapshot as logged with the record being replayed
+        self.replaying = False
+        self.replayed_snapshot: int | None = None
+        self._open_log(directory, sync_every, sync_interval, snapshot_every, background)
+
+    def _dump_state(self) -> dict:
+        # The sorted field index is derived from db, so it is rebuilt on load instead
+        return {
+            "clock": self.clock,
+            "db": self.db,
+            "values": self.values,
+            "backups": self.backups,
+            "last_backup": self.last_backup,
+            "changed": self.changed,
+            "backup_heap": self.backup_heap,
+            "expiry_heap": self.expiry_heap,
+        }
+
+    def _load_state(self, state: dict) -> None:
+        self.clock = state["clock"]
+        self.db = state["db"]
+        self.values = state["values"]
+        self.fields = {key: SortedFields.from_fields(record) for key, record in self.db.items()}
+        # Maps are pickled as their pairs, so each backup is rebuilt on top of the one before
+        # to share the nodes it shared when it was taken
+        rebuilt = {}
+        previous = PersistentMap()
+        self.backups = []
+        for timestamp, snapshot in state["backups"]:
+            previous = rebuilt[id(snapshot)] = snapshot.rebased(previous)
+            self.backups.append((timestamp, previous))
+        self.last_backup = state["last_backup"]
+        if self.last_backup is not None:
+            timestamp, snapshot = self.last_backup
+            self.last_backup = timestamp, rebuilt.get(id(snapshot), snapshot)
+        self.changed = state["changed"]
+        self.backup_heap = state["backup_heap"]
+        self.expiry_heap = state["expiry_heap"]
+
+    def _recover(self) -> None:
+        self.replaying = True
+        try:
+            super()._recover()
+        finally:
+            self.replaying = False
+
+    def _record_applier(self):
+        replay = {
+            "set_at": super().set_at,
+            "set_at_with_ttl": super().set_at_with_ttl,
+            "delete_at": super().delete_at,
+            "backup": super().backup,
+            "restore": super().restore,
+            "compact": super().compact,
+            "commit": super()._apply_writes,
+            "release": super()._release_snapshots,
+            "advance": lambda: None,
+        }
+
+        def apply(record: list) -> None:
+            method, clock, self.replayed_snapshot, *args = record
+            self._advance(clock)
+            replay[method](*args)
+
+        return apply
+
+    def _append(self, method: str, *args) -> None:
+        super()._append(method, self.clock, self._oldest_snapshot(), *args)
+
+    def set_at(self, key: str, field: str, value: str, timestamp: int) -> None:
+        super().set_at(key, field, value, timestamp)
+        self._append("set_at", key, field, value, timestamp)
+
+    def set_at_with_ttl(self, key: str, field: str, value: str, timestamp: int, ttl: int) -> None:
+        super().set_at_with_ttl(key, field, value, timestamp, ttl)
+        self._append("set_at_with_ttl", key, field, value, timestamp, ttl)
+
+    def delete_at(self, key: str, field: str, timestamp: int) -> bool:
+        deleted = super().delete_at(key, field, timestamp)
+        if deleted:
+            self._append("delete_at", key, field, timestamp)
+        return deleted
+
+    def backup(self, timestamp: int) -> int:
+        count = super().backup(timestamp)
+        self._append("backup", timestamp)
+        return count
+
+    def restore(self, timestamp: int, timestamp_to_restore: int) -> None:
+        super().restore(timestamp, timestamp_to_restore)
+        self._append("restore", timestamp, timestamp_to_restore)
+
+    def compact(self, horizon: int | None = None) -> int:
+        if self.clock is not None:
+            horizon = self._compaction_horizon(horizon)
+        dropped = super().compact(horizon)
+        if dropped:
+            self._append("compact", horizon)
+        return dropped
+
+    def _oldest_snapshot(self) -> int | None:
+        return self.replayed_snapshot if self.replaying else super()._oldest_snapshot()
+
+    def begin(self, timestamp: int) -> Transaction:
+        clock = self.clock
+        transaction = super().begin(timestamp)
+        # Moving the clock may purge, and the transaction itself is not logged
+        if self.clock != clock:
+            self._append("advance")
+        return transaction
+
+    def _release_snapshots(self) -> None:
+        super()._release_snapshots()
+        self._append("release")
+
+    # A committed transaction is logged as one record, so recovery applies all of it or none
+    def _apply_writes(self, writes: list[tuple[str, str, str | None, int | None]], timestamp: int) -> None:
+        super()._apply_writes(writes, timestamp)
+        self._append("commit", writes, timestamp)
@@ -1,14 +1,75 @@
+import heapq
+import sys
+from bisect import bisect_right, insort
+from operator import itemgetter
+from compact_versions import CompactVersions, ValueTable
 from memory_database import MemoryDatabase
+from persistent_map import PersistentMap
+from sorted_fields import SortedFields
+
+_timestamp = itemgetter(0)
+
+
+def _latest_visible(versions: list[tuple], timestamp: int) -> tuple | None:
+    """Returns the latest version at or before timestamp that is not expired, or None."""
+    # Versions are sorted by timestamp, so jump to the last one written at or before timestamp
+    i = bisect_right(versions, timestamp, key=_timestamp)
+    while i:
+        i -= 1
+        version = versions[i]
+        if version[2] is None or version[2] > timestamp:
+            return version
+    return None
+
+
+def _visible_until(versions: list[tuple], timestamp: int) -> float:
+    """Returns the first time after timestamp at which the visible version may change."""
+    i = bisect_right(versions, timestamp, key=_timestamp)
+    # A version written later becomes visible then, and the visible one can expire
+    until = versions[i][0] if i < len(versions) else float("inf")
+    version = _latest_visible(versions, timestamp)
+    if version is not None and version[2] is not None:
+        until = min(until, version[2])
+    return until
+
+
+def _compact_versions(versions: list[tuple], horizon: int) -> list[tuple]:
+    """Drops the versions that no read at or after horizon can see."""
+    split = bisect_right(versions, horizon, key=_timestamp)
+    kept = []
+    # A version written by horizon is visible at some later time only if it outlives the
+    # horizon and every newer version written by horizon
+    outlived = horizon
+    for version in reversed(versions[:split]):
+        expire_at = version[2]
+        if expire_at is None:
+            kept.append(version)
+            break
+        if expire_at > outlived:
+            kept.append(version)
+            outlived = expire_at
+    kept.reverse()
+    kept += versions[split:]
+    # Deletion markers with nothing older left to hide are no longer needed
+    start = 0
+    while start < len(kept) and kept[start][1] is None:
+        start += 1
+    return kept[start:] if start else kept
 
 
 class MemoryDatabaseBasicImpl(MemoryDatabase):
     def __init__(self):
         # Simple structure: {key: {field: value}}
         self.db = {}
+        # {key: field names of the record in scan order}
+        self.fields: dict[str, SortedFields] = {}
 
     def set(self, key: str, field: str, value: str) -> None:
         if key not in self.db:
             self.db[key] = {}
+            self.fields[key] = SortedFields()
+        if field not in self.db[key]:
+            self.fields[key].add(field)
         self.db[key][field] = value
 
     def get(self, key: str, field: str) -> str | None:
@@ -19,140 +80,562 @@ class MemoryDatabaseBasicImpl(MemoryDatabase):
     def delete(self, key: str, field: str) -> bool:
         if key in self.db and field in self.db[key]:
             del self.db[key][field]
+            self.fields[key].remove(field)
             if not self.db[key]:
                 del self.db[key]
+                del self.fields[key]
             return True
         return False
 
     def scan(self, key: str) -> list[str]:
         if key in self.db:
-            result = [f"{field}({value})" for field, value in self.db[key].items()]
-            return sorted(result)
+            record = self.db[key]
+            return [f"{field}({record[field]})" for field in self.fields[key]]
         return []
 
     def scan_by_prefix(self, key: str, prefix: str) -> list[str]:
         if key in self.db:
-            result = [f"{field}({value})" for field, value in self.db[key].items() if field.startswith(prefix)]
-            return sorted(result)
+            record = self.db[key]
+            return [f"{field}({record[field]})" for field in self.fields[key].with_prefix(prefix)]
         return []
 
 
 class MemoryDatabaseAdvancedImpl(MemoryDatabase):
-    def __init__(self):
-        # {key: {field: [(timestamp, value, expire_at)]}}
+    """
+    Versioned database with TTLs.
+
+    The latest timestamp passed to any operation is the logical clock. With purge_expired
+    set, versions whose expire_at the clock has reached are reclaimed as it advances (along
+    with fields and records left empty), so reads at timestamps older than the clock no
+    longer see versions that have expired since. Reads may ask about any timestamp, so this
+    trades history for memory and is off by default.
+
+    Version history is compacted up to a horizon retention timestamps behind the clock:
+    versions no read at or after the horizon can see are dropped, so reads from the horizon
+    on are unaffected. compact() compacts every field, and with compact_every set a field is
+    also compacted every compact_every versions written to it. Reads before the horizon may
+    then return None or a later value, so nothing is compacted unless asked for.
+
+    Backups are persistent maps {key: {field: (timestamp, value, expire_at)}} that share
+    every record and field left unchanged with the previous backup. A backup only resolves
+    the fields written since the previous one plus those whose visible version may have
+    changed with time, found through a heap of the time each resolved field stays valid.
+
+    Backups are kept sorted by timestamp. With keep_backups set, the most recent
+    keep_backups of them are always kept and older ones are thinned to the oldest per
+    power-of-two age bucket (or dropped when thin_backups is off), so a restore may fall back
+    to an older backup than the one originally taken.
+
+    begin() starts a Transaction reading a snapshot at its timestamp. While transactions are
+    open, purging and compaction stop at the oldest snapshot, and delete_at records a
+    deletion marker (a version with value None) instead of dropping versions a snapshot may
+    still read.
+
+    With compact_storage set, key and field names are interned and every version chain is a
+    CompactVersions array with its values in one shared ValueTable, which takes a fraction
+    of the memory of a list of tuples at the cost of building a tuple on every access.
+    Timestamps and expiry times must then fit in 64 bits.
+    """
+
+    def __init__(
+        self,
+        purge_expired: bool = False,
+        retention: int = 0,
+        compact_every: int | None = None,
+        keep_backups: int | None = None,
+        thin_backups: bool = True,
+        compact_storage: bool = False,
+    ):
+        # {key: {field: [(timestamp, value, expire_at)]}}, or CompactVersions in place of the lists
         self.db = {}
-        # List of backups: (timestamp, db_snapshot)
+        self.values: ValueTable | None = ValueTable() if compact_storage else None
+        # {key: field names of the record in scan order}
+        self.fields: dict[str, SortedFields] = {}
+        # Backups sorted by timestamp: (timestamp, PersistentMap {key: PersistentMap {field: version}})
         self.backups = []
+        self.keep_backups = keep_backups
+        self.thin_backups = thin_backups
+        # The backup the next one is built from, the fields written since (tracked only once
+        # there is one) and a min-heap of (time its visible version may change, key, field)
+        self.last_backup: tuple[int, PersistentMap] | None = None
+        self.changed: set[tuple[str, str]] = set()
+        self.backup_heap: list[tuple[int, str, str]] = []
+        self.purge_expired = purge_expired
+        self.clock = None
+        # Min-heap of (expire_at, key, field) for every TTL version written; entries whose
+        # version was deleted or restored away are skipped when they come up
+        self.expiry_heap: list[tuple[int, str, str]] = []
+        self.retention = retention
+        self.compact_every = compact_every
+        # Open transactions, and while there are any, the write sequence number each was
+        # started at and the last sequence number each field and record was written at
+        self.transactions: set[Transaction] = set()
+        self.write_seq = 0
+        self.field_writes: dict[tuple[str, str], int] = {}
+        self.key_writes: dict[str, int] = {}
+        self.restore_seq = 0
+        # Fields holding deletion markers, compacted once the last transaction ends
+        self.marked: set[tuple[str, str]] = set()
 
-    def set_at(self, key: str, field: str, value: str, timestamp: int) -> None:
+    def _oldest_snapshot(self) -> int | None:
+        return min(transaction.timestamp for transaction in self.transactions) if self.transactions else None
+
+    def _horizon(self) -> int:
+        """Returns the oldest timestamp reads must stay exact from."""
+        horizon = self.clock - self.retention
+        oldest = self._oldest_snapshot()
+        return horizon if oldest is None else min(horizon, oldest)
+
+    def _advance(self, timestamp: int) -> None:
+        """Moves the logical clock forward to timestamp and purges what expired by then."""
+        if self.clock is not None and timestamp <= self.clock:
+            return
+        self.clock = timestamp
+        self._purge()
+
+    def _purge(self) -> None:
+        if not self.purge_expired:
+            return
+        # Open snapshots may still read versions that expired after they were taken
+        limit = self.clock
+        oldest = self._oldest_snapshot()
+        if oldest is not None:
+            limit = min(limit, oldest)
+        heap = self.expiry_heap
+        expired = set()
+        while heap and heap[0][0] <= limit:
+            _, key, field = heapq.heappop(heap)
+            expired.add((key, field))
+        # Each field is filtered once however many of its versions expired
+        for key, field in expired:
+            record = self.db.get(key)
+            if record is None or field not in record:
+                continue
+            versions = record[field]
+            live = [version for version in versions if version[2] is None or version[2] > limit]
+            if len(live) < len(versions):
+                self._set_versions(key, field, live)
+
+    def _touch(self, key: str, field: str) -> None:
+        """Records a write for the conflict checks of open transactions."""
+        if self.transactions:
+            self.write_seq += 1
+            self.field_writes[(key, field)] = self.write_seq
+            self.key_writes[key] = self.write_seq
+
+    def _set_versions(self, key: str, field: str, versions: list[tuple]) -> None:
+        """Replaces the versions of an existing field, dropping the field and record when empty."""
+        if self.last_backup is not None:
+            self.changed.add((key, field))
+        if self.values is not None:
+            # Take the new references first so values the chains share keep their ids
+            old = self.db[key][field]
+            if versions:
+                versions = CompactVersions(self.values, versions)
+            old.release()
+        if versions:
+            self.db[key][field] = versions
+            return
+        del self.db[key][field]
+        self.fields[key].remove(field)
+        if not self.db[key]:
+            del self.db[key]
+            del self.fields[key]
+
+    def _add_version(self, key: str, field: str, version: tuple) -> None:
         if key not in self.db:
+            if self.values is not None:
+                key = sys.intern(key)
             self.db[key] = {}
+            self.fields[key] = SortedFields()
         if field not in self.db[key]:
-            self.db[key][field] = []
-        self.db[key][field].append((timestamp, value, None))
+            if self.values is None:
+                self.db[key][field] = []
+            else:
+                field = sys.intern(field)
+                self.db[key][field] = CompactVersions(self.values)
+            self.fields[key].add(field)
+        versions = self.db[key][field]
+        if self.last_backup is not None:
+            self.changed.add((key, field))
+        # Writes usually arrive in timestamp order; out-of-order ones are inserted after any
+        # version with the same timestamp so the last write still wins
+        if not versions or versions[-1][0] <= version[0]:
+            versions.append(version)
+        else:
+            insort(versions, version, key=_timestamp)
+        if self.compact_every and len(versions) % self.compact_every == 0:
+            self._set_versions(key, field, _compact_versions(versions, self._horizon()))
+
+    def _compaction_horizon(self, horizon: int | None) -> int:
+        if horizon is None:
+            return self._horizon()
+        oldest = self._oldest_snapshot()
+        return horizon if oldest is None else min(horizon, oldest)
+
+    def compact(self, horizon: int | None = None) -> int:
+        """
+        Drops the versions no read at or after horizon (by default retention behind the
+        clock, and never past an open snapshot) can see. Returns the number of versions dropped.
+        """
+        if self.clock is None:
+            return 0
+        horizon = self._compaction_horizon(horizon)
+        dropped = 0
+        for key in list(self.db):
+            for field, versions in list(self.db[key].items()):
+                kept = _compact_versions(versions, horizon)
+                if len(kept) < len(versions):
+                    dropped += len(versions) - len(kept)
+                    self._set_versions(key, field, kept)
+        return dropped
+
+    def set_at(self, key: str, field: str, value: str, timestamp: int) -> None:
+        self._advance(timestamp)
+        self._touch(key, field)
+        self._add_version(key, field, (timestamp, value, None))
 
     def set_at_with_ttl(self, key: str, field: str, value: str, timestamp: int, ttl: int) -> None:
+        self._advance(timestamp)
+        self._touch(key, field)
         expired_at = timestamp + ttl
-        if key not in self.db:
-            self.db[key] = {}
-        if field not in self.db[key]:
-            self.db[key][field] = []
-        self.db[key][field].append((timestamp, value, expired_at))
+        self._add_version(key, field, (timestamp, value, expired_at))
+        if self.purge_expired:
+            heapq.heappush(self.expiry_heap, (expired_at, key, field))
 
     def delete_at(self, key: str, field: str, timestamp: int) -> bool:
+        self._advance(timestamp)
         if key in self.db and field in self.db[key]:
-            deleted = False
-            later_versions = []
-            # Remove all versions up to timestamp that are not expired
-            for t, v, e in self.db[key][field]:
-                if t <= timestamp and (e is None or e > timestamp):
-                    deleted = True
-                else:
-                    later_versions.append((t, v, e))
-            if deleted:
-                if later_versions:
-                    self.db[key][field] = later_versions
-                else:
-                    del self.db[key][field]
-                    if not self.db[key]:
-                        del self.db[key]
+            versions = self.db[key][field]
+            version = _latest_visible(versions, timestamp)
+            if version is None or version[1] is None:
+                return False
+            self._touch(key, field)
+            oldest = self._oldest_snapshot()
+            if oldest is not None and oldest <= timestamp:
+                self._add_version(key, field, (timestamp, None, None))
+                self.marked.add((key, field))
                 return True
+            split = bisect_right(versions, timestamp, key=_timestamp)
+            # Remove all versions up to timestamp that are not expired
+            later_versions = [(t, v, e) for t, v, e in versions[:split] if e is not None and e <= timestamp]
+            later_versions += versions[split:]
+            self._set_versions(key, field, later_versions)
+            return True
         return False
 
     def get_at(self, key: str, field: str, timestamp: int) -> str | None:
+        self._advance(timestamp)
         if key in self.db and field in self.db[key]:
-            # Find the latest version at or before timestamp that is not expired
-            for t, v, e in reversed(self.db[key][field]):
-                if t <= timestamp and (e is None or e > timestamp):
-                    return v
+            version = _latest_visible(self.db[key][field], timestamp)
+            if version is not None:
+                return version[1]
         return None
 
     def scan_at(self, key: str, timestamp: int) -> list[str]:
+        self._advance(timestamp)
         if key not in self.db:
             return []
+        record = self.db[key]
         result = []
-        for field in self.db[key]:
-            # Find the latest version at or before timestamp that is not expired
-            for t, v, e in reversed(self.db[key][field]):
-                if t <= timestamp and (e is None or e > timestamp):
-                    result.append(f"{field}({v})")
-                    break
-        return sorted(result)
+        for field in self.fields[key]:
+            version = _latest_visible(record[field], timestamp)
+            if version is not None and version[1] is not None:
+                result.append(f"{field}({version[1]})")
+        return result
 
     def scan_by_prefix_at(self, key: str, prefix: str, timestamp: int) -> list[str]:
+        self._advance(timestamp)
         if key not in self.db:
             return []
+        record = self.db[key]
         result = []
-        for field in self.db[key]:
-            if field.startswith(prefix):
-                # Find the latest version at or before timestamp that is not expired
-                for t, v, e in reversed(self.db[key][field]):
-                    if t <= timestamp and (e is None or e > timestamp):
-                        result.append(f"{field}({v})")
-                        break
-        return sorted(result)
+        for field in self.fields[key].with_prefix(prefix):
+            version = _latest_visible(record[field], timestamp)
+            if version is not None and version[1] is not None:
+                result.append(f"{field}({version[1]})")
+        return result
 
-    def backup(self, timestamp: int) -> int:
-        count = 0
-        snapshot = {}
+    def _full_snapshot(self, timestamp: int) -> PersistentMap:
+        self.backup_heap = []
+        records = []
         # Only backup non-empty, non-expired records at timestamp
-        for key in self.db:
-            fields = {}
-            for field in self.db[key]:
-                # Find the latest version at or before timestamp that is not expired
-                for t, v, e in reversed(self.db[key][field]):
-                    if t <= timestamp and (e is None or e > timestamp):
-                        fields[field] = (t, v, e)
-                        break
+        for key, record in self.db.items():
+            fields = []
+            for field, versions in record.items():
+                version = _latest_visible(versions, timestamp)
+                if version is not None and version[1] is not None:
+                    fields.append((field, version))
+                until = _visible_until(versions, timestamp)
+                if until != float("inf"):
+                    self.backup_heap.append((until, key, field))
             if fields:
-                snapshot[key] = fields
-                count += 1
-        self.backups.append((timestamp, snapshot))
-        return count
+                records.append((key, PersistentMap.from_items(fields)))
+        heapq.heapify(self.backup_heap)
+        return PersistentMap.from_items(records)
+
+    def _update_snapshot(self, snapshot: PersistentMap, timestamp: int) -> PersistentMap:
+        stale = self.changed
+        heap = self.backup_heap
+        while heap and heap[0][0] <= timestamp:
+            _, key, field = heapq.heappop(heap)
+            stale.add((key, field))
+        by_key = {}
+        for key, field in stale:
+            by_key.setdefault(key, []).append(field)
+        for key, fields in by_key.items():
+            live = self.db.get(key, {})
+            record = snapshot.get(key, PersistentMap())
+            for field in fields:
+                versions = live.get(field)
+                version = _latest_visible(versions, timestamp) if versions else None
+                if version is None or version[1] is None:
+                    record = record.delete(field)
+                else:
+                    record = record.set(field, version)
+                until = _visible_until(versions, timestamp) if versions else float("inf")
+                if until != float("inf"):
+                    heapq.heappush(heap, (until, key, field))
+            snapshot = snapshot.set(key, record) if record else snapshot.delete(key)
+        return snapshot
+
+    def backup(self, timestamp: int) -> int:
+        self._advance(timestamp)
+        if self.last_backup is None or timestamp < self.last_backup[0]:
+            snapshot = self._full_snapshot(timestamp)
+        else:
+            snapshot = self._update_snapshot(self.last_backup[1], timestamp)
+        self.changed = set()
+        self.last_backup = (timestamp, snapshot)
+        # Backups taken out of order go after any with the same timestamp, so the later wins
+        if not self.backups or self.backups[-1][0] <= timestamp:
+            self.backups.append((timestamp, snapshot))
+        else:
+            insort(self.backups, (timestamp, snapshot), key=_timestamp)
+        # Thinning is a linear pass, so let the list double before running it again
+        if self.keep_backups is not None and len(self.backups) > 2 * self.keep_backups + 64:
+            self._retain_backups()
+        # Every record in the snapshot has at least one visible field
+        return len(snapshot)
+
+    def _retain_backups(self) -> None:
+        split = len(self.backups) - self.keep_backups
+        older, recent = self.backups[:split], self.backups[split:]
+        if not self.thin_backups:
+            self.backups = recent
+            return
+        newest = self.backups[-1][0]
+        kept = []
+        buckets = set()
+        for backup in older:
+            # Ages 1, 2-3, 4-7, ... each keep only their oldest backup, so a kept backup
+            # ages into ever wider buckets instead of being replaced by newer ones
+            bucket = (newest - backup[0]).bit_length()
+            if bucket not in buckets:
+                buckets.add(bucket)
+                kept.append(backup)
+        self.backups = kept + recent
 
     def restore(self, timestamp: int, timestamp_to_restore: int) -> None:
+        self._advance(timestamp)
+        # Replacing the whole database conflicts with every open transaction that writes; they
+        # keep reading the records they began on, so those are replaced, never changed
+        if self.transactions:
+            self.write_seq += 1
+            self.restore_seq = self.write_seq
+        self.marked = set()
         # Find the latest backup at or before timestamp_to_restore
-        backup_to_restore = None
-        for t, snapshot in reversed(self.backups):
-            if t <= timestamp_to_restore:
-                backup_to_restore = (t, snapshot)
-                break
+        i = bisect_right(self.backups, timestamp_to_restore, key=_timestamp)
+        backup_to_restore = self.backups[i - 1] if i else None
+        # The live state is replaced wholesale, so the next backup starts from scratch
+        self.last_backup = None
+        self.changed = set()
+        self.backup_heap = []
+        if self.values is not None:
+            self.values = ValueTable()
         if backup_to_restore is None:
             self.db = {}
+            self.fields = {}
+            self.expiry_heap = []
             return
         backup_at, snapshot = backup_to_restore
         new_db = {}
-        for key in snapshot:
+        for key, record in snapshot.items():
             new_db[key] = {}
-            for field in snapshot[key]:
-                t, v, e = snapshot[key][field]
+            for field, (t, v, e) in record.items():
                 if e is not None:
                     remaining_ttl = e - backup_at
                     new_expired_at = timestamp + remaining_ttl
                 else:
                     new_expired_at = None
-                new_db[key][field] = [(t, v, new_expired_at)]
+                versions = [(t, v, new_expired_at)]
+                new_db[key][field] = versions if self.values is None else CompactVersions(self.values, versions)
         self.db = new_db
+        self.fields = {key: SortedFields.from_fields(record) for key, record in new_db.items()}
+        if self.purge_expired:
+            self.expiry_heap = [
+                (versions[0][2], key, field)
+                for key, record in new_db.items()
+                for field, versions in record.items()
+                if versions[0][2] is not None
+            ]
+            heapq.heapify(self.expiry_heap)
+
+    def begin(self, timestamp: int) -> "Transaction":
+        """Starts a transaction reading the database as of timestamp."""
+        self._advance(timestamp)
+        transaction = Transaction(self, timestamp, self.write_seq)
+        self.transactions.add(transaction)
+        return transaction
+
+    def _finish(self, transaction: "Transaction") -> None:
+        self.transactions.discard(transaction)
+        if self.transactions:
+            return
+        self.field_writes.clear()
+        self.key_writes.clear()
+        self._release_snapshots()
+
+    def _release_snapshots(self) -> None:
+        """Catches up on the purging and compaction the open snapshots held back."""
+        self._purge()
+        horizon = self._horizon()
+        for key, field in self.marked:
+            if key in self.db and field in self.db[key]:
+                self._set_versions(key, field, _compact_versions(self.db[key][field], horizon))
+        self.marked = set()
+
+    def _commit(self, transaction: "Transaction", timestamp: int) -> bool:
+        if transaction not in self.transactions:
+            raise ValueError("transaction is already finished")
+        if timestamp < transaction.timestamp:
+            raise ValueError("a transaction cannot commit before its snapshot")
+        writes = [
+            (key, field, value, ttl)
+            for key, fields in transaction.writes.items()
+            for field, (value, ttl) in fields.items()
+        ]
+        seq = transaction.seq
+        # Writes dated at or before the snapshot can change what it reads, read-only or not;
+        # later ones only conflict with transactions that write
+        conflict = not transaction._reads_unchanged() or bool(writes) and (
+            self.restore_seq > seq
+            or any(self.field_writes.get((key, field), 0) > seq for key, field, _, _ in writes)
+            or any(self.field_writes.get(read, 0) > seq for read in transaction.read_fields)
+            or any(self.key_writes.get(key, 0) > seq for key, _ in transaction.read_prefixes)
+        )
+        self._finish(transaction)
+        if conflict:
+            return False
+        self._apply_writes(writes, timestamp)
+        return True
+
+    def _apply_writes(self, writes: list[tuple[str, str, str | None, int | None]], timestamp: int) -> None:
+        """Applies (key, field, value or None to delete, ttl or None) writes at timestamp."""
+        for key, field, value, ttl in writes:
+            if value is None:
+                MemoryDatabaseAdvancedImpl.delete_at(self, key, field, timestamp)
+            elif ttl is None:
+                MemoryDatabaseAdvancedImpl.set_at(self, key, field, value, timestamp)
+            else:
+                MemoryDatabaseAdvancedImpl.set_at_with_ttl(self, key, field, value, timestamp, ttl)
+
+
+class Transaction:
+    """
+    Snapshot of a MemoryDatabaseAdvancedImpl at the timestamp it began, with buffered writes.
 
+    Reads see the database as of the snapshot plus the transaction's own writes. Writes made
+    after begin() at later timestamps are never seen; versions do not record when they were
+    written, though, so one dated at or before the snapshot can be. Reading a field again
+    returns what it first read, and commit() returns False, even for a read-only
+    transaction, if any field or scan it read would now read differently.
+
+    Otherwise commit() applies the writes at its timestamp, all at once, unless a field the
+    transaction read or wrote, or a record it scanned, has been written since it began; then
+    nothing is applied and commit() returns False.
+
+    A restore() replaces the database's records rather than changing them, so a transaction
+    open across one keeps reading the records it began on (which stay in memory until it
+    finishes). It can still commit if it only read, but any write conflicts with the restore.
+    """
+
+    def __init__(self, db: MemoryDatabaseAdvancedImpl, timestamp: int, seq: int):
+        self.db = db
+        self.timestamp = timestamp
+        self.seq = seq
+        # The records and field indexes as of begin(), kept across a restore
+        self.records = db.db
+        self.fields = db.fields
+        # {key: {field: (value or None once deleted, ttl or None)}}
+        self.writes: dict[str, dict[str, tuple[str | None, int | None]]] = {}
+        # What each read saw, checked again on commit: {(key, field): value} and
+        # {(key, prefix): {field: value}}
+        self.read_fields: dict[tuple[str, str], str | None] = {}
+        self.read_prefixes: dict[tuple[str, str], dict[str, str]] = {}
+
+    def _read(self, key: str, field: str) -> str | None:
+        record = self.records.get(key)
+        if record is None or field not in record:
+            return None
+        version = _latest_visible(record[field], self.timestamp)
+        return None if version is None else version[1]
+
+    def _scan(self, key: str, prefix: str) -> dict[str, str]:
+        values = {}
+        record = self.records.get(key)
+        if record is not None:
+            for field in self.fields[key].with_prefix(prefix):
+                version = _latest_visible(record[field], self.timestamp)
+                if version is not None and version[1] is not None:
+                    values[field] = version[1]
+        return values
+
+    def _reads_unchanged(self) -> bool:
+        return all(self._read(key, field) == value for (key, field), value in self.read_fields.items()) and all(
+            self._scan(key, prefix) == values for (key, prefix), values in self.read_prefixes.items()
+        )
+
+    def get(self, key: str, field: str) -> str | None:
+        own = self.writes.get(key, {}).get(field)
+        if own is not None:
+            return own[0]
+        if (key, field) not in self.read_fields:
+            self.read_fields[key, field] = self._read(key, field)
+        return self.read_fields[key, field]
+
+    def scan(self, key: str) -> list[str]:
+        return self.scan_by_prefix(key, "")
+
+    def scan_by_prefix(self, key: str, prefix: str) -> list[str]:
+        values = self._scan(key, prefix)
+        self.read_prefixes.setdefault((key, prefix), dict(values))
+        own = self.writes.get(key)
+        if not own:
+            return [f"{field}({value})" for field, value in values.items()]
+        for field, (value, _) in own.items():
+            if not field.startswith(prefix):
+                continue
+            if value is None:
+                values.pop(field, None)
+            else:
+                values[field] = value
+        return [f"{field}({values[field]})" for field in sorted(values, key=lambda field: field + "(")]
+
+    def set(self, key: str, field: str, value: str) -> None:
+        self.writes.setdefault(key, {})[field] = (value, None)
+
+    def set_with_ttl(self, key: str, field: str, value: str, ttl: int) -> None:
+        """Writes a value that expires ttl after the commit timestamp."""
+        self.writes.setdefault(key, {})[field] = (value, ttl)
+
+    def delete(self, key: str, field: str) -> bool:
+        existed = self.get(key, field) is not None
+        self.writes.setdefault(key, {})[field] = (None, None)
+        return existed
 
+    def commit(self, timestamp: int) -> bool:
+        return self.db._commit(self, timestamp)
 
+    def abort(self) -> None:
+        self.db._finish(self)
@@ -0,0 +1,120 @@
+import argparse
+import asyncio
+from memory_database import MemoryDatabase
+from memory_database_impl import MemoryDatabaseAdvancedImpl
+from resp import OK, NULL, ProtocolError, encode_array, encode_bulk, encode_error, encode_integer, parse_command
+
+
+def _reply_ok(_) -> bytes:
+    return OK
+
+
+def _reply_bulk(value: str | None) -> bytes:
+    return NULL if value is None else encode_bulk(value)
+
+
+def _reply_bool(value: bool) -> bytes:
+    return encode_integer(int(value))
+
+
+# {command: (database method, argument types, reply encoder)}
+COMMANDS = {
+    "SET_AT": ("set_at", (str, str, str, int), _reply_ok),
+    "SET_AT_WITH_TTL": ("set_at_with_ttl", (str, str, str, int, int), _reply_ok),
+    "DELETE_AT": ("delete_at", (str, str, int), _reply_bool),
+    "GET_AT": ("get_at", (str, str, int), _reply_bulk),
+    "SCAN_AT": ("scan_at", (str, int), encode_array),
+    "SCAN_BY_PREFIX_AT": ("scan_by_prefix_at", (str, str, int), encode_array),
+    "BACKUP": ("backup", (int,), encode_integer),
+    "RESTORE": ("restore", (int, int), _reply_ok),
+}
+
+
+class MemoryDatabaseServer:
+    """
+    Serves a MemoryDatabase over TCP with a RESP-style protocol. Each command is the
+    upper-cased method name followed by its arguments, e.g. GET_AT key field timestamp.
+
+    Clients may pipeline: every command that has fully arrived in one read is executed, and
+    their replies go back in a single write, in order. Commands run on the event loop one at
+    a time, so the database needs no locking.
+    """
+
+    def __init__(self, db: MemoryDatabase, host: str = "127.0.0.1", port: int = 6380):
+        self.db = db
+        self.host = host
+        self.port = port
+        self.commands = {
+            command: (getattr(db, method), types, reply) for command, (method, types, reply) in COMMANDS.items()
+        }
+        self.server: asyncio.Server | None = None
+
+    async def start(self) -> None:
+        self.server = await asyncio.start_server(self._serve, self.host, self.port)
+        # Port 0 asks the OS for a free port; report the one picked
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    def execute(self, args: list[str]) -> bytes:
+        command = self.commands.get(args[0].upper()) if args else None
+        if command is None:
+            return encode_error(f"unknown command {args[0] if args else ''!r}")
+        method, types, reply = command
+        if len(args) - 1 != len(types):
+            return encode_error(f"wrong number of arguments for {args[0]!r}")
+        try:
+            return reply(method(*[convert(arg) for convert, arg in zip(types, args[1:])]))
+        except ValueError as error:
+            return encode_error(str(error))
+        except Exception as error:
+            # A failing command gets an error reply rather than taking the connection down
+            return encode_error(f"{type(error).__name__}: {error}")
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        buffer = bytearray()
+        try:
+            while data := await reader.read(1 << 16):
+                buffer += data
+                replies = bytearray()
+                pos = 0
+                try:
+                    while (parsed := parse_command(buffer, pos)) is not None:
+                        args, pos = parsed
+                        replies += self.execute(args)
+                except (ProtocolError, ValueError) as error:
+                    # The stream cannot be resynchronized after a malformed command
+                    writer.write(bytes(replies) + encode_error(f"protocol error: {error}"))
+                    break
+                del buffer[:pos]
+                if replies:
+                    writer.write(replies)
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host: str, port: int) -> None:
+    server = MemoryDatabaseServer(MemoryDatabaseAdvancedImpl(), host, port)
+    await server.start()
+    print(f"listening on {server.host}:{server.port}", flush=True)
+    await server.server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a MemoryDatabaseAdvancedImpl over TCP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6380, help="0 picks a free port")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
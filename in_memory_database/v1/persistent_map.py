@@ -0,0 +1,231 @@
+class _Node:
+    """Trie node holding one slot per set bit of bitmap; a slot is a (key, value) pair or a child."""
+
+    __slots__ = ("bitmap", "slots")
+
+    def __init__(self, bitmap: int, slots: list):
+        self.bitmap = bitmap
+        self.slots = slots
+
+
+class _Collision:
+    """Pairs whose keys share all 64 hash bits."""
+
+    __slots__ = ("pairs",)
+
+    def __init__(self, pairs: list[tuple]):
+        self.pairs = pairs
+
+
+_BITS = 5
+_MASK = (1 << _BITS) - 1
+_HASH_MASK = (1 << 64) - 1
+_EMPTY_NODE = _Node(0, [])
+_MISSING = object()
+
+
+def _hash(key) -> int:
+    return hash(key) & _HASH_MASK
+
+
+class PersistentMap:
+    """
+    Immutable hash array mapped trie. set() and delete() return a new map that shares every
+    node off the path to the changed key with the original, so keeping many versions of a
+    large map costs memory only for what changed between them.
+    """
+
+    __slots__ = ("root", "size")
+
+    def __init__(self, root: _Node = _EMPTY_NODE, size: int = 0):
+        self.root = root
+        self.size = size
+
+    @classmethod
+    def from_items(cls, items) -> "PersistentMap":
+        """Builds a map from (key, value) pairs by filling in fresh nodes instead of copying paths."""
+        root = _Node(0, [])
+        size = 0
+        for key, value in items:
+            size += _insert(root, 0, _hash(key), key, value)
+        return cls(root, size) if size else cls()
+
+    # The trie's layout follows str hashes, which are salted per process, so a map is pickled
+    # as its pairs and rebuilt with the loading process's hashes
+    def __reduce__(self):
+        return PersistentMap.from_items, (list(self.items()),)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __iter__(self):
+        for key, _ in self.items():
+            yield key
+
+    def get(self, key, default=None):
+        h = _hash(key)
+        node = self.root
+        shift = 0
+        while True:
+            bit = 1 << ((h >> shift) & _MASK)
+            if not node.bitmap & bit:
+                return default
+            slot = node.slots[(node.bitmap & (bit - 1)).bit_count()]
+            if type(slot) is _Node:
+                node = slot
+                shift += _BITS
+            elif type(slot) is _Collision:
+                for k, v in slot.pairs:
+                    if k == key:
+                        return v
+                return default
+            else:
+                return slot[1] if slot[0] == key else default
+
+    def set(self, key, value) -> "PersistentMap":
+        root, added = _assoc(self.root, 0, _hash(key), key, value)
+        if root is self.root:
+            return self
+        return PersistentMap(root, self.size + added)
+
+    def delete(self, key) -> "PersistentMap":
+        root = _dissoc(self.root, 0, _hash(key), key)
+        if root is self.root:
+            return self
+        if root is None:
+            return PersistentMap()
+        if type(root) is not _Node:
+            # The last pair left in a child trie comes back up to sit in the root
+            root = _Node(1 << (_hash(root[0]) & _MASK), [root])
+        return PersistentMap(root, self.size - 1)
+
+    def rebased(self, base: "PersistentMap") -> "PersistentMap":
+        """Returns a map equal to this one that shares every node it can with base."""
+        if not base:
+            return self
+        shared = base
+        for key, value in self.items():
+            if base.get(key, _MISSING) is not value:
+                shared = shared.set(key, value)
+        for key, _ in base.items():
+            if key not in self:
+                shared = shared.delete(key)
+        return shared
+
+    def items(self):
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if type(node) is _Collision:
+                yield from node.pairs
+                continue
+            for slot in node.slots:
+                if type(slot) is tuple:
+                    yield slot
+                else:
+                    stack.append(slot)
+
+
+def _merge(shift: int, pair: tuple, pair_hash: int, key, value, h: int):
+    """Builds the subtree holding two pairs whose hashes agree on every bit below shift."""
+    if shift >= 64:
+        return _Collision([pair, (key, value)])
+    bit1 = 1 << ((pair_hash >> shift) & _MASK)
+    bit2 = 1 << ((h >> shift) & _MASK)
+    if bit1 == bit2:
+        return _Node(bit1, [_merge(shift + _BITS, pair, pair_hash, key, value, h)])
+    slots = [pair, (key, value)] if bit1 < bit2 else [(key, value), pair]
+    return _Node(bit1 | bit2, slots)
+
+
+def _insert(node, shift: int, h: int, key, value) -> bool:
+    """Sets key in a node nothing else refers to yet, in place. Returns whether key is new."""
+    if type(node) is _Collision:
+        for i, pair in enumerate(node.pairs):
+            if pair[0] == key:
+                node.pairs[i] = (key, value)
+                return False
+        node.pairs.append((key, value))
+        return True
+    bit = 1 << ((h >> shift) & _MASK)
+    i = (node.bitmap & (bit - 1)).bit_count()
+    if not node.bitmap & bit:
+        node.slots.insert(i, (key, value))
+        node.bitmap |= bit
+        return True
+    slot = node.slots[i]
+    if type(slot) is tuple:
+        if slot[0] == key:
+            node.slots[i] = (key, value)
+            return False
+        node.slots[i] = _merge(shift + _BITS, slot, _hash(slot[0]), key, value, h)
+        return True
+    return _insert(slot, shift + _BITS, h, key, value)
+
+
+def _assoc(node, shift: int, h: int, key, value) -> tuple[object, bool]:
+    """Returns the node with key set to value (the same node if nothing changed) and whether key is new."""
+    if type(node) is _Collision:
+        pairs = [pair for pair in node.pairs if pair[0] != key]
+        added = len(pairs) == len(node.pairs)
+        return _Collision(pairs + [(key, value)]), added
+    bit = 1 << ((h >> shift) & _MASK)
+    i = (node.bitmap & (bit - 1)).bit_count()
+    if not node.bitmap & bit:
+        slots = node.slots[:i] + [(key, value)] + node.slots[i:]
+        return _Node(node.bitmap | bit, slots), True
+    slot = node.slots[i]
+    if type(slot) is tuple:
+        if slot[0] == key:
+            if slot[1] is value:
+                return node, False
+            replacement, added = (key, value), False
+        else:
+            replacement, added = _merge(shift + _BITS, slot, _hash(slot[0]), key, value, h), True
+    else:
+        replacement, added = _assoc(slot, shift + _BITS, h, key, value)
+        if replacement is slot:
+            return node, False
+    slots = list(node.slots)
+    slots[i] = replacement
+    return _Node(node.bitmap, slots), added
+
+
+def _dissoc(node, shift: int, h: int, key):
+    """
+    Returns the node without key: the same node if key is missing, None if nothing is left,
+    or the single remaining pair when a child trie shrinks to one so it can move up.
+    """
+    if type(node) is _Collision:
+        pairs = [pair for pair in node.pairs if pair[0] != key]
+        if len(pairs) == len(node.pairs):
+            return node
+        return pairs[0] if len(pairs) == 1 else _Collision(pairs)
+    bit = 1 << ((h >> shift) & _MASK)
+    if not node.bitmap & bit:
+        return node
+    i = (node.bitmap & (bit - 1)).bit_count()
+    slot = node.slots[i]
+    if type(slot) is tuple:
+        if slot[0] != key:
+            return node
+        replacement = None
+    else:
+        replacement = _dissoc(slot, shift + _BITS, h, key)
+        if replacement is slot:
+            return node
+    if replacement is None:
+        if len(node.slots) == 1:
+            return None
+        slots = node.slots[:i] + node.slots[i + 1 :]
+        if len(slots) == 1 and type(slots[0]) is tuple:
+            return slots[0]
+        return _Node(node.bitmap & ~bit, slots)
+    if type(replacement) is tuple and len(node.slots) == 1:
+        return replacement
+    slots = list(node.slots)
+    slots[i] = replacement
+    return _Node(node.bitmap, slots)
@@ -0,0 +1,131 @@
+"""
+The subset of the Redis serialization protocol (RESP) spoken between MemoryDatabaseServer and
+MemoryDatabaseClient. Commands are arrays of bulk strings; replies are simple strings,
+errors, integers, bulk strings (null for None) or arrays of bulk strings.
+
+Parsers take a buffer and an offset and return (value, offset after it), or None when the
+buffer does not hold a whole message yet, so a reader can parse every complete message in
+one read and keep the tail for the next.
+"""
+
+CRLF = b"\r\n"
+OK = b"+OK\r\n"
+NULL = b"$-1\r\n"
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class ReplyError(Exception):
+    """An error reply sent back by the server."""
+
+
+def encode_bulk(value: str) -> bytes:
+    data = value.encode()
+    return b"$%d\r\n%b\r\n" % (len(data), data)
+
+
+def encode_command(*args) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        data = str(arg).encode()
+        parts.append(b"$%d\r\n%b\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+def encode_integer(value: int) -> bytes:
+    return b":%d\r\n" % value
+
+
+def encode_array(values: list[str]) -> bytes:
+    return b"*%d\r\n" % len(values) + b"".join(encode_bulk(value) for value in values)
+
+
+def encode_error(message: str) -> bytes:
+    return b"-ERR %b\r\n" % message.replace("\r\n", " ").encode()
+
+
+def _parse_line(buffer: bytearray, pos: int) -> tuple[bytes, int] | None:
+    end = buffer.find(CRLF, pos)
+    if end < 0:
+        return None
+    return bytes(buffer[pos:end]), end + 2
+
+
+def _parse_bulk(buffer: bytearray, pos: int) -> tuple[str | None, int] | None:
+    line = _parse_line(buffer, pos)
+    if line is None:
+        return None
+    header, start = line
+    if header[:1] != b"$":
+        raise ProtocolError(f"expected a bulk string, got {header[:20]!r}")
+    length = int(header[1:])
+    if length < 0:
+        return None, start
+    end = start + length
+    if len(buffer) < end + 2:
+        return None
+    return buffer[start:end].decode(), end + 2
+
+
+def parse_command(buffer: bytearray, pos: int) -> tuple[list[str], int] | None:
+    # The hot path of the server, so bulk strings are parsed inline rather than with _parse_bulk
+    if pos >= len(buffer):
+        return None
+    if buffer[pos] != ord("*"):
+        raise ProtocolError(f"expected a command array, got {bytes(buffer[pos:pos + 20])!r}")
+    find = buffer.find
+    end = find(CRLF, pos)
+    if end < 0:
+        return None
+    count = int(buffer[pos + 1 : end])
+    if count < 0:
+        raise ProtocolError("null command array")
+    pos = end + 2
+    args = []
+    for _ in range(count):
+        end = find(CRLF, pos)
+        if end < 0:
+            return None
+        if buffer[pos] != ord("$"):
+            raise ProtocolError(f"expected a bulk string, got {bytes(buffer[pos:pos + 20])!r}")
+        length = int(buffer[pos + 1 : end])
+        if length < 0:
+            raise ProtocolError("null bulk string in a command")
+        start = end + 2
+        stop = start + length
+        if len(buffer) < stop + 2:
+            return None
+        args.append(buffer[start:stop].decode())
+        pos = stop + 2
+    return args, pos
+
+
+def parse_reply(buffer: bytearray, pos: int) -> tuple[object, int] | None:
+    """Parses one reply; an error reply is returned as a ReplyError instance, not raised."""
+    if pos >= len(buffer):
+        return None
+    kind = buffer[pos]
+    if kind == ord("$"):
+        return _parse_bulk(buffer, pos)
+    line = _parse_line(buffer, pos)
+    if line is None:
+        return None
+    header, pos = line
+    if kind == ord("+"):
+        return header[1:].decode(), pos
+    if kind == ord(":"):
+        return int(header[1:]), pos
+    if kind == ord("-"):
+        return ReplyError(header[1:].decode()), pos
+    if kind == ord("*"):
+        values = []
+        for _ in range(int(header[1:])):
+            parsed = parse_reply(buffer, pos)
+            if parsed is None:
+                return None
+            value, pos = parsed
+            values.append(value)
+        return values, pos
+    raise ProtocolError(f"unknown reply type {header[:20]!r}")
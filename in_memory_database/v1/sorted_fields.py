@@ -0,0 +1,94 @@
+from bisect import bisect_left, insort
+
+
+class SortedFields:
+    """
+    Field names of one record in scan order, kept as a run of bounded sorted buckets so an
+    insert or removal only shifts one bucket and a prefix scan starts with a bisect.
+
+    Names are stored with the "(" that follows them in a scan result, so iterating the index
+    yields fields in the same order as sorting the formatted "<field>(<value>)" strings.
+    """
+
+    __slots__ = ("buckets", "maxes", "size")
+
+    LOAD = 512
+
+    def __init__(self):
+        self.buckets: list[list[str]] = []
+        self.maxes: list[str] = []  # last (largest) entry of every bucket
+        self.size = 0
+
+    @classmethod
+    def from_fields(cls, fields) -> "SortedFields":
+        index = cls()
+        entries = sorted(field + "(" for field in fields)
+        index.buckets = [entries[i : i + cls.LOAD] for i in range(0, len(entries), cls.LOAD)]
+        index.maxes = [bucket[-1] for bucket in index.buckets]
+        index.size = len(entries)
+        return index
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self):
+        for bucket in self.buckets:
+            for entry in bucket:
+                yield entry[:-1]
+
+    def add(self, field: str) -> None:
+        """Adds a field that is not in the index yet."""
+        entry = field + "("
+        if not self.buckets:
+            self.buckets.append([entry])
+            self.maxes.append(entry)
+            self.size = 1
+            return
+        i = bisect_left(self.maxes, entry)
+        if i == len(self.maxes):
+            i -= 1
+            bucket = self.buckets[i]
+            bucket.append(entry)
+            self.maxes[i] = entry
+        else:
+            bucket = self.buckets[i]
+            insort(bucket, entry)
+        self.size += 1
+        if len(bucket) > 2 * self.LOAD:
+            tail = bucket[self.LOAD :]
+            del bucket[self.LOAD :]
+            self.buckets.insert(i + 1, tail)
+            self.maxes[i] = bucket[-1]
+            self.maxes.insert(i + 1, tail[-1])
+
+    def remove(self, field: str) -> None:
+        entry = field + "("
+        i = bisect_left(self.maxes, entry)
+        if i == len(self.maxes):
+            raise KeyError(field)
+        bucket = self.buckets[i]
+        j = bisect_left(bucket, entry)
+        if bucket[j] != entry:
+            raise KeyError(field)
+        del bucket[j]
+        self.size -= 1
+        if not bucket:
+            del self.buckets[i]
+            del self.maxes[i]
+        elif j == len(bucket):
+            self.maxes[i] = bucket[-1]
+
+    def with_prefix(self, prefix: str):
+        """Yields the fields starting with prefix, in scan order."""
+        i = bisect_left(self.maxes, prefix)
+        if i == len(self.maxes):
+            return
+        j = bisect_left(self.buckets[i], prefix)
+        for bucket in self.buckets[i:]:
+            for entry in bucket[j:] if j else bucket:
+                if not entry.startswith(prefix):
+                    return
+                # The entry "<prefix>(" is the field prefix[:-1], which does not match
+                if len(entry) > len(prefix):
+                    yield entry[:-1]
+            j = 0
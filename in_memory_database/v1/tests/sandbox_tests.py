@@ -1,5 +1,16 @@
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
 import unittest
 from memory_database_impl import MemoryDatabaseBasicImpl, MemoryDatabaseAdvancedImpl
+from memory_database_client import MemoryDatabaseClient
+from memory_database_durable_impl import MemoryDatabaseDurableImpl
+from memory_database_server import MemoryDatabaseServer
+from persistent_map import PersistentMap
+from resp import ProtocolError, ReplyError, parse_command
 
 class SandboxTests(unittest.TestCase):
     """
@@ -67,4 +78,487 @@ class SandboxTests(unittest.TestCase):
         db.restore(10, 7)
         self.assertEqual(db.backup(11), 1)
         self.assertEqual(db.scan_at("A", 15), ["B(C)", "D(E)"])
-        self.assertEqual(db.scan_at("A", 16), ["D(E)"])
\ No newline at end of file
+        self.assertEqual(db.scan_at("A", 16), ["D(E)"])
+
+    def test_version_chain_out_of_order(self):
+        # Reads go back in time, so keep the whole history around
+        db = MemoryDatabaseAdvancedImpl(purge_expired=False, compact_every=None)
+        for timestamp in range(0, 1000, 2):
+            db.set_at("A", "B", f"v{timestamp}", timestamp)
+        db.set_at("A", "B", "late", 501)
+        db.set_at_with_ttl("A", "B", "short", 503, 1)
+        self.assertEqual(db.get_at("A", "B", 500), "v500")
+        self.assertEqual(db.get_at("A", "B", 501), "late")
+        self.assertEqual(db.get_at("A", "B", 503), "short")
+        db.set_at_with_ttl("A", "B", "tail", 1001, 1)
+        # The expired version falls back to the one before it
+        self.assertEqual(db.get_at("A", "B", 1001), "tail")
+        self.assertEqual(db.get_at("A", "B", 1002), "v998")
+        self.assertIsNone(db.get_at("A", "B", -1))
+        self.assertEqual(db.scan_at("A", 501), ["B(late)"])
+        self.assertTrue(db.delete_at("A", "B", 502))
+        self.assertIsNone(db.get_at("A", "B", 502))
+        self.assertEqual(db.get_at("A", "B", 503), "short")
+        self.assertEqual(db.get_at("A", "B", 998), "v998")
+
+
+    def test_sorted_field_index(self):
+        rng = random.Random(7)
+        expected = {}
+        for timestamp in range(5000):
+            field = "".join(rng.choice("ab!~") for _ in range(rng.randint(1, 6)))
+            if rng.random() < 0.3 and field in expected:
+                self.assertTrue(self.basic.delete("A", field))
+                self.assertTrue(self.advanced.delete_at("A", field, timestamp))
+                del expected[field]
+            else:
+                self.basic.set("A", field, str(timestamp))
+                self.advanced.set_at("A", field, str(timestamp), timestamp)
+                expected[field] = str(timestamp)
+        formatted = sorted(f"{field}({value})" for field, value in expected.items())
+        self.assertEqual(self.basic.scan("A"), formatted)
+        self.assertEqual(self.advanced.scan_at("A", 5000), formatted)
+        for prefix in ["", "a", "ab", "!", "~~", "b!a", "zz"]:
+            matching = [item for item in formatted if item.startswith(prefix) and item.index("(") >= len(prefix)]
+            self.assertEqual(self.basic.scan_by_prefix("A", prefix), matching)
+            self.assertEqual(self.advanced.scan_by_prefix_at("A", prefix, 5000), matching)
+
+    def test_expiry_purge(self):
+        # By default expired versions stay readable at the timestamps they were live at
+        db = self.advanced
+        db.set_at_with_ttl("A", "B", "v", 1, 5)
+        db.set_at("C", "D", "later", 100)
+        self.assertEqual(db.get_at("A", "B", 3), "v")
+        self.assertIsNone(db.get_at("A", "B", 6))
+
+        db = MemoryDatabaseAdvancedImpl(purge_expired=True)
+        db.set_at("A", "keep", "1", 1)
+        for timestamp in range(2, 1000):
+            db.set_at_with_ttl("A", "hot", str(timestamp), timestamp, 5)
+            db.set_at_with_ttl(f"K{timestamp}", "F", "V", timestamp, 3)
+        # Only versions that have not expired by the clock are left
+        self.assertEqual(len(db.db["A"]["hot"]), 5)
+        self.assertEqual(len(db.db), 4)
+        self.assertEqual(db.get_at("A", "hot", 999), "999")
+        self.assertEqual(db.scan_at("A", 1003), ["hot(999)", "keep(1)"])
+        self.assertEqual(db.scan_at("A", 1004), ["keep(1)"])
+        self.assertEqual(list(db.db), ["A"])
+        self.assertEqual(db.scan_by_prefix_at("A", "h", 1005), [])
+        self.assertTrue(db.delete_at("A", "keep", 1006))
+        self.assertEqual(db.db, {})
+        self.assertEqual(db.fields, {})
+
+    def test_compaction(self):
+        # Nothing is compacted unless asked for, so old timestamps read as they always did
+        db = self.advanced
+        for timestamp in range(1, 70):
+            db.set_at("A", "B", f"v{timestamp}", timestamp)
+        self.assertEqual(db.get_at("A", "B", 10), "v10")
+        self.assertEqual(len(db.db["A"]["B"]), 69)
+
+        rng = random.Random(3)
+        full = MemoryDatabaseAdvancedImpl(purge_expired=False, compact_every=None)
+        compacted = MemoryDatabaseAdvancedImpl(purge_expired=False, retention=50, compact_every=16)
+        explicit = MemoryDatabaseAdvancedImpl(purge_expired=False, compact_every=None)
+        for timestamp in range(1, 2000):
+            field = f"F{rng.randrange(3)}"
+            ttl = rng.randrange(1, 200) if rng.random() < 0.5 else None
+            for db in (full, compacted, explicit):
+                if ttl is None:
+                    db.set_at("A", field, str(timestamp), timestamp)
+                else:
+                    db.set_at_with_ttl("A", field, str(timestamp), timestamp, ttl)
+            for at in (timestamp - 50, timestamp):
+                self.assertEqual(compacted.scan_at("A", at), full.scan_at("A", at))
+        self.assertLess(sum(map(len, compacted.db["A"].values())), 100)
+        self.assertGreater(explicit.compact(1900), 1800)
+        for at in range(1900, 2200):
+            self.assertEqual(explicit.scan_at("A", at), full.scan_at("A", at))
+
+    def test_persistent_map(self):
+        rng = random.Random(5)
+        versions = [(PersistentMap(), {})]
+        for i in range(5000):
+            current, expected = versions[-1]
+            key = rng.randrange(2000)
+            expected = dict(expected)
+            if rng.random() < 0.3:
+                current = current.delete(key)
+                expected.pop(key, None)
+            else:
+                current = current.set(key, i)
+                expected[key] = i
+            versions.append((current, expected))
+        # Every older version is left untouched by the updates after it
+        for current, expected in versions[::250]:
+            self.assertEqual(len(current), len(expected))
+            self.assertEqual(dict(current.items()), expected)
+        self.assertEqual(dict(PersistentMap.from_items(versions[-1][1].items()).items()), versions[-1][1])
+
+    def test_incremental_backups(self):
+        rng = random.Random(11)
+        db = self.advanced
+        db.set_at("cold", "F", "V", 0)
+        for timestamp in range(1, 3000):
+            key, field = f"K{rng.randrange(20)}", f"F{rng.randrange(5)}"
+            roll = rng.random()
+            if roll < 0.4:
+                db.set_at_with_ttl(key, field, str(timestamp), timestamp, rng.randrange(1, 100))
+            elif roll < 0.6:
+                # Written ahead of the clock, so it only becomes visible later
+                db.set_at(key, field, str(timestamp), timestamp + rng.randrange(1, 50))
+            elif roll < 0.8:
+                db.delete_at(key, field, timestamp)
+            elif roll < 0.95:
+                db.set_at(key, field, str(timestamp), timestamp)
+            else:
+                count = db.backup(timestamp)
+                expected = {}
+                for k, record in db.db.items():
+                    for f in record:
+                        value = db.get_at(k, f, timestamp)
+                        if value is not None:
+                            expected.setdefault(k, {})[f] = value
+                snapshot = db.backups[-1][1]
+                self.assertEqual(count, len(expected))
+                self.assertEqual({k: {f: v[1] for f, v in r.items()} for k, r in snapshot.items()}, expected)
+        # The record nobody touched is shared by every backup
+        self.assertTrue(all(snapshot.get("cold") is db.backups[0][1].get("cold") for _, snapshot in db.backups))
+
+    def test_backup_retention(self):
+        db = MemoryDatabaseAdvancedImpl(keep_backups=10)
+        for timestamp in range(1, 5001):
+            db.set_at("A", "B", str(timestamp), timestamp)
+            db.backup(timestamp)
+        self.assertLessEqual(len(db.backups), 2 * 10 + 64)
+        timestamps = [timestamp for timestamp, _ in db.backups]
+        self.assertEqual(timestamps, sorted(timestamps))
+        self.assertEqual(timestamps[-10:], list(range(4991, 5001)))
+        db.restore(5001, 4995)
+        self.assertEqual(db.get_at("A", "B", 5001), "4995")
+        # Older backups are thinned, so restoring falls back to the nearest one kept
+        db.restore(5002, 2000)
+        self.assertLessEqual(int(db.get_at("A", "B", 5002)), 2000)
+        self.assertEqual(timestamps[0], 1)
+        db.restore(5003, 0)
+        self.assertIsNone(db.get_at("A", "B", 5003))
+
+    def test_backups_out_of_order(self):
+        db = self.advanced
+        db.set_at("A", "B", "C", 1)
+        db.set_at("A", "D", "E", 5)
+        db.backup(6)
+        db.backup(2)
+        db.restore(10, 4)
+        self.assertEqual(db.scan_at("A", 10), ["B(C)"])
+        db.restore(11, 7)
+        self.assertEqual(db.scan_at("A", 11), ["B(C)", "D(E)"])
+
+    def test_server(self):
+        async def scenario():
+            server = MemoryDatabaseServer(self.advanced, port=0)
+            await server.start()
+            client = await MemoryDatabaseClient.connect(port=server.port)
+            try:
+                await client.set_at_with_ttl("A", "B", "C", 1, 10)
+                self.assertEqual(await client.backup(3), 1)
+                await client.set_at("A", "D", "E", 4)
+                self.assertEqual(await client.backup(5), 1)
+                self.assertTrue(await client.delete_at("A", "B", 8))
+                self.assertFalse(await client.delete_at("A", "B", 8))
+                await client.restore(10, 7)
+                self.assertEqual(await client.scan_at("A", 15), ["B(C)", "D(E)"])
+                self.assertEqual(await client.scan_by_prefix_at("A", "D", 16), ["D(E)"])
+                self.assertIsNone(await client.get_at("A", "B", 16))
+                # Pipelined calls are answered in order
+                await asyncio.gather(*[client.set_at("P", f"F{i}", f"V{i} \r\n", 20) for i in range(1000)])
+                values = await asyncio.gather(*[client.get_at("P", f"F{i}", 21) for i in range(1000)])
+                self.assertEqual(values, [f"V{i} \r\n" for i in range(1000)])
+                with self.assertRaises(ReplyError):
+                    await client._send("GET_AT", "P", "F1")
+                self.assertEqual(await client.get_at("P", "F1", 22), "V1 \r\n")
+                # Any exception a command raises is answered with an error reply
+                _, _, reply = server.commands["GET_AT"]
+                server.commands["GET_AT"] = ({}.__getitem__, (str,), reply)
+                with self.assertRaises(ReplyError):
+                    await client._send("GET_AT", "P")
+                await client.set_at("Q", "F", "V", 23)
+                self.assertEqual(await client.scan_at("Q", 23), ["F(V)"])
+                # A cancelled call's reply is dropped without disturbing the calls after it
+                with self.assertRaises(asyncio.TimeoutError):
+                    await asyncio.wait_for(client.scan_at("Q", 24), 0)
+                self.assertEqual(await client.scan_at("Q", 25), ["F(V)"])
+            finally:
+                await client.close()
+                await server.close()
+
+        async def unexpected_reply():
+            async def reply_unasked(reader, writer):
+                writer.write(b"+OK\r\n")
+                await reader.read()
+                writer.close()
+
+            rogue = await asyncio.start_server(reply_unasked, "127.0.0.1", 0)
+            client = await MemoryDatabaseClient.connect(port=rogue.sockets[0].getsockname()[1])
+            await client.receiver
+            with self.assertRaises(ConnectionError):
+                client.get_at("A", "B", 1)
+            await client.close()
+            rogue.close()
+            await rogue.wait_closed()
+
+        asyncio.run(scenario())
+        asyncio.run(unexpected_reply())
+        # Null arrays and bulk strings are replies only, never part of a command
+        for data in (b"*1\r\n$-1\r\n", b"*-1\r\n"):
+            with self.assertRaises(ProtocolError):
+                parse_command(bytearray(data), 0)
+
+    def test_durable_database(self):
+        rng = random.Random(13)
+        reference = self.advanced
+
+        def workload(db, start, stop):
+            for timestamp in range(start, stop):
+                key, field = f"K{rng.randrange(10)}", f"F{rng.randrange(10)}"
+                roll = rng.random()
+                if roll < 0.4:
+                    db.set_at(key, field, str(timestamp), timestamp)
+                elif roll < 0.7:
+                    db.set_at_with_ttl(key, field, str(timestamp), timestamp, rng.randrange(1, 50))
+                elif roll < 0.85:
+                    db.delete_at(key, field, timestamp)
+                elif roll < 0.95:
+                    db.get_at(key, field, timestamp)
+                elif roll < 0.98:
+                    db.backup(timestamp)
+                else:
+                    db.restore(timestamp, rng.randrange(timestamp))
+
+        def check(db, timestamp):
+            for key in (f"K{i}" for i in range(10)):
+                self.assertEqual(db.scan_at(key, timestamp), reference.scan_at(key, timestamp))
+
+        with tempfile.TemporaryDirectory() as directory:
+            db = MemoryDatabaseDurableImpl(directory, sync_every=7, snapshot_every=None)
+            for target in (db, reference):
+                rng.seed(1)
+                workload(target, 1, 500)
+            db.close()
+
+            # Recover from the log alone, then snapshot in the background while writing on
+            db = MemoryDatabaseDurableImpl(directory, snapshot_every=150)
+            check(db, 500)
+            for target in (db, reference):
+                rng.seed(2)
+                workload(target, 500, 1000)
+            db.close()
+            self.assertEqual(db.snapshot_child, None)
+            self.assertLess(len(db._log_generations()), 3)
+            with open(db._log_path(db.generation), "a") as f:
+                f.write('["set_at",1000,"K1","torn')
+
+            db = MemoryDatabaseDurableImpl(directory, snapshot_every=None, background=False)
+            check(db, 1000)
+            self.assertEqual([t for t, _ in db.backups], [t for t, _ in reference.backups])
+            db.set_at("K1", "F1", "after torn", 1001)
+            db.snapshot()
+            db.close()
+            self.assertEqual(os.listdir(directory).count("snapshot"), 1)
+
+            db = MemoryDatabaseDurableImpl(directory)
+            self.assertEqual(db.get_at("K1", "F1", 1001), "after torn")
+            db.close()
+
+    def test_transactions(self):
+        db = MemoryDatabaseAdvancedImpl(purge_expired=True)
+        db.set_at("A", "x", "1", 1)
+        db.set_at("A", "y", "2", 1)
+        db.set_at_with_ttl("A", "z", "3", 1, 10)
+        reader = db.begin(5)
+        writer = db.begin(5)
+        self.assertTrue(writer.delete("A", "y"))
+        writer.set("A", "w", "4")
+        self.assertEqual(writer.scan("A"), ["w(4)", "x(1)", "z(3)"])
+        self.assertTrue(writer.commit(6))
+
+        # Later writes, deletes and expiry leave the reader's snapshot alone
+        db.set_at("A", "x", "changed", 7)
+        self.assertTrue(db.delete_at("A", "x", 8))
+        self.assertEqual(db.scan_at("A", 20), ["w(4)"])
+        self.assertEqual(reader.scan("A"), ["x(1)", "y(2)", "z(3)"])
+        self.assertEqual(reader.get("A", "x"), "1")
+        self.assertTrue(reader.commit(20))
+
+        # Once no snapshot needs them, deletion markers and expired versions are reclaimed
+        self.assertEqual(sorted(db.db["A"]), ["w"])
+
+        first, second = db.begin(21), db.begin(21)
+        first.set("A", "w", "first")
+        second.set("A", "w", "second")
+        self.assertTrue(first.commit(22))
+        self.assertFalse(second.commit(22))
+        self.assertEqual(db.get_at("A", "w", 23), "first")
+
+        # Reading a field another transaction then writes is a conflict too
+        reading, writing = db.begin(24), db.begin(24)
+        self.assertEqual(reading.get("A", "w"), "first")
+        reading.set("B", "copy", "first")
+        writing.set("A", "w", "third")
+        self.assertTrue(writing.commit(25))
+        self.assertFalse(reading.commit(25))
+        self.assertIsNone(db.get_at("B", "copy", 26))
+        with self.assertRaises(ValueError):
+            reading.commit(26)
+
+        scanning = db.begin(27)
+        self.assertEqual(scanning.scan_by_prefix("A", "w"), ["w(third)"])
+        scanning.set_with_ttl("C", "n", "1", 5)
+        db.set_at("A", "v", "new", 28)
+        self.assertFalse(scanning.commit(28))
+        self.assertEqual(db.transactions, set())
+
+        # Writes dated at or before a snapshot cannot be hidden from it, so they fail its commit
+        db.set_at("S", "f", "1", 28)
+        reader = db.begin(29)
+        self.assertEqual(reader.get("S", "f"), "1")
+        self.assertEqual(reader.scan("S"), ["f(1)"])
+        db.set_at("S", "f", "2", 29)
+        self.assertEqual(reader.get("S", "f"), "1")
+        self.assertFalse(reader.commit(30))
+        reader = db.begin(30)
+        self.assertEqual(reader.get("S", "f"), "2")
+        self.assertTrue(db.delete_at("S", "f", 30))
+        # A delete at the snapshot's own timestamp is a marker while the snapshot is open
+        self.assertEqual(db.get_at("S", "f", 29), "2")
+        self.assertFalse(reader.commit(31))
+        self.assertEqual(db.scan_at("S", 31), [])
+
+        # Transactions open across a restore keep reading the records they began on
+        db.backup(29)
+        db.set_at("A", "w", "fourth", 30)
+        reader, writer = db.begin(31), db.begin(31)
+        writer.set("A", "u", "1")
+        db.restore(32, 29)
+        self.assertEqual(db.get_at("A", "w", 33), "third")
+        self.assertEqual(reader.get("A", "w"), "fourth")
+        self.assertEqual(reader.scan_by_prefix("A", "w"), ["w(fourth)"])
+        self.assertTrue(reader.commit(33))
+        self.assertFalse(writer.commit(33))
+        self.assertIsNone(db.get_at("A", "u", 34))
+
+        with tempfile.TemporaryDirectory() as directory:
+            durable = MemoryDatabaseDurableImpl(directory)
+            transaction = durable.begin(1)
+            transaction.set_with_ttl("K", "a", "1", 10)
+            transaction.set("K", "b", "2")
+            self.assertTrue(transaction.commit(2))
+            durable.close()
+            durable = MemoryDatabaseDurableImpl(directory)
+            self.assertEqual(durable.scan_at("K", 3), ["a(1)", "b(2)"])
+            self.assertEqual(durable.scan_at("K", 12), ["b(2)"])
+            durable.close()
+
+        # Recovery replays commits and the compaction after the last transaction ends exactly,
+        # so past timestamps read the same as before the restart
+        def history(db):
+            return [db.get_at("H", field, timestamp) for field in ("f", "g") for timestamp in range(1, 8)]
+
+        for finish_first in (False, True):
+            with tempfile.TemporaryDirectory() as directory:
+                durable = MemoryDatabaseDurableImpl(directory, background=False)
+                durable.set_at("H", "f", "1", 1)
+                durable.set_at("H", "g", "x", 1)
+                older = durable.begin(2)
+                transaction = durable.begin(3)
+                transaction.delete("H", "f")
+                self.assertTrue(transaction.commit(4))
+                self.assertTrue(durable.delete_at("H", "g", 5))
+                durable.set_at("H", "f", "2", 6)
+                if finish_first:
+                    older.abort()
+                expected = history(durable)
+                durable.close()
+                durable = MemoryDatabaseDurableImpl(directory)
+                self.assertEqual(history(durable), expected)
+                durable.close()
+
+    def test_snapshot_across_hash_seeds(self):
+        """Test recovering a snapshot in a process whose str hashes differ from the writer's"""
+        write = """
+import sys
+from memory_database_durable_impl import MemoryDatabaseDurableImpl
+db = MemoryDatabaseDurableImpl(sys.argv[1], snapshot_every=None, background=False)
+for i in range(50):
+    db.set_at(f"K{i}", "F", str(i), 1)
+db.backup(2)
+db.set_at("K0", "F", "changed", 3)
+db.backup(4)
+db.snapshot()
+db.close()
+"""
+        read = """
+import sys
+from memory_database_durable_impl import MemoryDatabaseDurableImpl
+db = MemoryDatabaseDurableImpl(sys.argv[1], snapshot_every=None, background=False)
+print(db.last_backup[1].get("K0").get("F")[1], db.backups[0][1].get("K0").get("F")[1])
+db.set_at("K1", "F", "changed", 5)
+print(db.backup(6))
+db.restore(7, 2)
+print(db.get_at("K0", "F", 7), db.scan_at("K49", 7))
+db.close()
+"""
+        project = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        with tempfile.TemporaryDirectory() as directory:
+            for code, seed in ((write, "1"), (read, "2")):
+                result = subprocess.run(
+                    [sys.executable, "-c", code, directory],
+                    cwd=project,
+                    env={**os.environ, "PYTHONHASHSEED": seed},
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                )
+        self.assertEqual(result.stdout.split("\n"), ["changed 0", "50", "0 ['F(49)']", ""])
+
+    def test_compact_storage(self):
+        rng = random.Random(3)
+        operations = []
+        for timestamp in range(1, 400):
+            key, field, value = f"k{rng.randrange(5)}", f"f{rng.randrange(20)}", f"v{rng.randrange(10)}"
+            operations.append((rng.random(), key, field, value, timestamp, rng.randrange(1, 50)))
+
+        def run(db):
+            results = []
+            for action, key, field, value, timestamp, ttl in operations:
+                if action < 0.5:
+                    db.set_at(key, field, value, timestamp)
+                elif action < 0.8:
+                    db.set_at_with_ttl(key, field, value, timestamp, ttl)
+                elif action < 0.95:
+                    results.append(db.delete_at(key, field, timestamp))
+                else:
+                    results.append(db.backup(timestamp))
+                results.append(db.scan_at(key, timestamp))
+            db.restore(400, 300)
+            results.append([db.scan_at(f"k{i}", 400) for i in range(5)])
+            return results
+
+        compact = MemoryDatabaseAdvancedImpl(compact_every=8, compact_storage=True)
+        self.assertEqual(run(compact), run(MemoryDatabaseAdvancedImpl(compact_every=8)))
+        # Values are stored once however many versions hold them, and dropped with the last one
+        stored = {value for record in compact.db.values() for versions in record.values() for _, value, _ in versions}
+        self.assertEqual(set(compact.values.ids), stored - {None})
+
+        with tempfile.TemporaryDirectory() as directory:
+            durable = MemoryDatabaseDurableImpl(directory, background=False, compact_storage=True)
+            durable.set_at("A", "x", "1", 1)
+            durable.set_at_with_ttl("A", "y", "1", 2, 10)
+            durable.snapshot()
+            durable.set_at("A", "x", "2", 3)
+            durable.close()
+            durable = MemoryDatabaseDurableImpl(directory, compact_storage=True)
+            self.assertEqual(durable.scan_at("A", 3), ["x(2)", "y(1)"])
+            self.assertEqual(durable.get_at("A", "x", 2), "1")
+            self.assertEqual(durable.values.refs[durable.values.ids["1"]], 2)
+            durable.close()
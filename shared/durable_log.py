@@ -0,0 +1,204 @@
+import gc
+import json
+import os
+import pickle
+import time
+
+
+class DurableLog:
+    """
+    Mixin that makes an in-memory system survive restarts by logging every change it makes
+    and snapshotting its state now and then. Each v1 project links this file in as
+    durable_log.py.
+
+    Records are appended to log generation files <LOG_PREFIX>.<n>, one JSON array per line
+    unless a subclass brings its own encoding. fsync is group-committed: the log is synced
+    once sync_every records have been written or sync_interval seconds have passed,
+    whichever comes first, and on sync()/close(). The interval is checked as each record is
+    written, not by a timer, so records written just before the system goes idle stay
+    unsynced until the next record or a sync().
+
+    Every snapshot_every records a new log generation is started and the state is pickled to
+    a snapshot, in a forked child when background is set (and the platform can fork) so
+    operations carry on meanwhile. Once the snapshot is in place the generations it covers
+    are deleted, so recovery loads the snapshot and replays only the records logged after
+    it. A record torn by a crash mid-write ends the replay and is cut off the log.
+
+    Subclasses call _open_log() once their state is initialised, log through _append(), and
+    provide _record_applier(), _dump_state() and _load_state().
+
+    Files in directory:
+        snapshot            state as of the end of some log generation
+        <LOG_PREFIX>.<n>    log generation n
+    """
+
+    SNAPSHOT = "snapshot"
+    LOG_PREFIX = "log"
+
+    def _open_log(
+        self,
+        directory: str,
+        sync_every: int,
+        sync_interval: float,
+        snapshot_every: int | None,
+        background: bool,
+    ) -> None:
+        self.directory = directory
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.snapshot_every = snapshot_every
+        self.background = background and hasattr(os, "fork")
+        self.generation = 0
+        self.unsynced = 0
+        self.logged_since_snapshot = 0
+        self.last_sync = time.monotonic()
+        # (pid, last generation covered) of the child writing a snapshot, if any
+        self.snapshot_child: tuple[int, int] | None = None
+        os.makedirs(directory, exist_ok=True)
+        self._recover()
+        self.log = open(self._log_path(self.generation), "ab")
+
+    def _encode_record(self, record) -> bytes:
+        return json.dumps(record, separators=(",", ":")).encode() + b"\n"
+
+    def _decode_record(self, data: bytes, pos: int) -> tuple[object, int] | None:
+        """Returns the record at pos and the offset after it, or None if no whole one is there."""
+        end = data.find(b"\n", pos)
+        if end < 0:
+            return None
+        try:
+            return json.loads(data[pos:end]), end + 1
+        except ValueError:
+            return None
+
+    def _record_applier(self):
+        """Returns a function that applies one decoded record to the state."""
+        raise NotImplementedError
+
+    def _dump_state(self) -> dict:
+        raise NotImplementedError
+
+    def _load_state(self, state: dict) -> None:
+        raise NotImplementedError
+
+    def _log_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"{self.LOG_PREFIX}.{generation}")
+
+    def _log_generations(self) -> list[int]:
+        start = len(self.LOG_PREFIX) + 1
+        return sorted(
+            int(name[start:])
+            for name in os.listdir(self.directory)
+            if name.startswith(self.LOG_PREFIX + ".") and name[start:].isdigit()
+        )
+
+    def _drop_logs(self, covered: int) -> None:
+        for generation in self._log_generations():
+            if generation <= covered:
+                os.remove(self._log_path(generation))
+
+    def _recover(self) -> None:
+        snapshot_generation = -1
+        # Recovery allocates millions of long-lived objects; collecting while they pile up
+        # only rescans them over and over
+        gc.disable()
+        try:
+            snapshot_path = os.path.join(self.directory, self.SNAPSHOT)
+            if os.path.exists(snapshot_path):
+                with open(snapshot_path, "rb") as f:
+                    state = pickle.load(f)
+                snapshot_generation = state.pop("generation")
+                self._load_state(state)
+            for generation in self._log_generations():
+                if generation <= snapshot_generation:
+                    os.remove(self._log_path(generation))
+                    continue
+                self._replay(generation)
+                self.generation = generation
+        finally:
+            gc.enable()
+        self.generation = max(self.generation, snapshot_generation + 1)
+
+    def _replay(self, generation: int) -> None:
+        path = self._log_path(generation)
+        apply = self._record_applier()
+        with open(path, "rb") as f:
+            data = f.read()
+        pos = 0
+        while (decoded := self._decode_record(data, pos)) is not None:
+            record, pos = decoded
+            apply(record)
+            self.logged_since_snapshot += 1
+        # Drop a record torn by a crash mid-write so new records start on a record boundary
+        if pos < len(data):
+            with open(path, "r+b") as f:
+                f.truncate(pos)
+
+    def _append(self, *record) -> None:
+        self.log.write(self._encode_record(record))
+        self.unsynced += 1
+        self.logged_since_snapshot += 1
+        if self.unsynced >= self.sync_every or time.monotonic() - self.last_sync >= self.sync_interval:
+            self.sync()
+            self._reap_snapshot(block=False)
+        if self.snapshot_every is not None and self.logged_since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def sync(self) -> None:
+        """Makes every logged record durable."""
+        self.log.flush()
+        os.fsync(self.log.fileno())
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def _write_snapshot(self, covered: int) -> None:
+        snapshot_path = os.path.join(self.directory, self.SNAPSHOT)
+        with open(snapshot_path + ".tmp", "wb") as f:
+            pickle.dump({"generation": covered, **self._dump_state()}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(snapshot_path + ".tmp", snapshot_path)
+
+    def _reap_snapshot(self, block: bool) -> None:
+        """Deletes the logs covered by a background snapshot once its child has finished."""
+        if self.snapshot_child is None:
+            return
+        pid, covered = self.snapshot_child
+        done, status = os.waitpid(pid, 0 if block else os.WNOHANG)
+        if done == 0:
+            return
+        self.snapshot_child = None
+        # If the child failed, the old snapshot and logs still recover everything
+        if os.waitstatus_to_exitcode(status) == 0:
+            self._drop_logs(covered)
+
+    def snapshot(self) -> None:
+        """Starts a new, empty log generation and writes the state up to it to a snapshot."""
+        # One snapshot at a time, so a slow one cannot pile up children
+        self._reap_snapshot(block=True)
+        self.sync()
+        self.log.close()
+        covered = self.generation
+        self.generation += 1
+        self.log = open(self._log_path(self.generation), "ab")
+        self.logged_since_snapshot = 0
+        if not self.background:
+            self._write_snapshot(covered)
+            self._drop_logs(covered)
+            return
+        pid = os.fork()
+        if pid == 0:
+            # The child sees the state frozen at the fork and exits without running any
+            # cleanup that belongs to the parent
+            code = 1
+            try:
+                self._write_snapshot(covered)
+                code = 0
+            finally:
+                os._exit(code)
+        self.snapshot_child = (pid, covered)
+
+    def close(self) -> None:
+        self.sync()
+        self.log.close()
+        self._reap_snapshot(block=True)
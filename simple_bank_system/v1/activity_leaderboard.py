@@ -0,0 +1,85 @@
+from bisect import insort
+from balance_ledger import BalanceLedger
+from ids import TransactionId
+from sorted_list import SortedList
+
+
+class ActivityLeaderboard:
+    """
+    Running total of transaction value per account, kept ranked in a bucketed SortedList so
+    the top n accounts are a slice away and re-ranking one is a bisect and a bucket shift.
+
+    Each account also keeps its activity in a BalanceLedger, so the total of the
+    transactions strictly before any timestamp is a bisect plus a prefix sum. Queries for
+    a timestamp after every recorded transaction use the ranking as is. Earlier ones walk
+    the ranking from the top, totalling each account before the timestamp from its ledger,
+    and stop once an account's current total cannot beat the n-th best past total found:
+    values are never negative, so no past total exceeds the current one. That costs
+    O(log T) per account visited, n of them when the leaders then are the leaders now, up
+    to every account when the past ranking is unrelated to the current one
+    (benchmarks/top_activity.py measures both).
+    """
+
+    def __init__(self):
+        self.totals: dict[str, int] = {}
+        # (-total, account_id) of every account, sorted, so the most active come first and
+        # ties go to the smaller account id
+        self.ranking = SortedList()
+        self.ledgers: dict[str, BalanceLedger] = {}
+        self.latest: int | None = None
+
+    def add_account(self, account_id: str) -> None:
+        self.totals[account_id] = 0
+        self.ledgers[account_id] = BalanceLedger()
+        self.ranking.add((0, account_id))
+
+    def _set_total(self, account_id: str, total: int) -> None:
+        self.ranking.remove((-self.totals[account_id], account_id))
+        self.ranking.add((-total, account_id))
+        self.totals[account_id] = total
+
+    def record(
+        self, account_id: str, timestamp: int, value: int, transaction_id: TransactionId | None = None
+    ) -> None:
+        """
+        Adds a transaction of value (its absolute amount) made at timestamp. One recorded
+        with its id can be given its value later with update().
+        """
+        if value:
+            self._set_total(account_id, self.totals[account_id] + value)
+        self.ledgers[account_id].add(transaction_id, timestamp, value)
+        if self.latest is None or timestamp > self.latest:
+            self.latest = timestamp
+
+    def update(self, account_id: str, transaction_id: TransactionId, value: int) -> None:
+        """Sets the value of a transaction recorded earlier, from the time it was made."""
+        delta = self.ledgers[account_id].update(transaction_id, value)
+        if delta:
+            self._set_total(account_id, self.totals[account_id] + delta)
+
+    def merge(self, source_id: str, target_id: str) -> None:
+        """Moves the activity of source_id to target_id and drops source_id."""
+        source_total = self.totals.pop(source_id)
+        self.ranking.remove((-source_total, source_id))
+        self._set_total(target_id, self.totals[target_id] + source_total)
+        self.ledgers[target_id].merge(self.ledgers.pop(source_id))
+
+    def top(self, timestamp: int, n: int) -> list[tuple[str, int]]:
+        """Returns (account_id, total) of the n most active accounts before timestamp."""
+        if n <= 0:
+            return []
+        if self.latest is None or timestamp > self.latest:
+            return [(account_id, -total) for total, account_id in self.ranking.head(n)]
+        ranked = []  # the n best (-total before timestamp, account_id) so far, sorted
+        for current in self.ranking:
+            # Past keys sort no earlier than current ones, and the ranking only grows from here
+            if len(ranked) == n and current > ranked[-1]:
+                break
+            account_id = current[1]
+            key = (-self.ledgers[account_id].balance(before=timestamp), account_id)
+            if len(ranked) < n:
+                insort(ranked, key)
+            elif key < ranked[-1]:
+                ranked.pop()
+                insort(ranked, key)
+        return [(account_id, -total) for total, account_id in ranked]
@@ -0,0 +1,103 @@
+import heapq
+from bisect import bisect_left, bisect_right
+from ids import TransactionId
+
+
+class BalanceLedger:
+    """
+    Amounts of an account's transactions in timestamp order, with a Fenwick tree over them
+    so the sum as of any timestamp is a bisect plus an O(log n) prefix sum.
+
+    Changing the amount of a transaction already recorded (zeroing a cancelled one) is a
+    point update rather than shifting every running total after it. Only transactions
+    recorded with an id can be changed.
+    """
+
+    __slots__ = ("times", "amounts", "tree", "positions")
+
+    def __init__(self):
+        self.times: list[int] = []
+        self.amounts: list[int] = []
+        # 1-based Fenwick tree: tree[i] sums amounts[i - (i & -i) : i]
+        self.tree: list[int] = [0]
+        self.positions: dict[TransactionId, int] = {}  # {transaction_id: index in times}, for those with one
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def _prefix(self, count: int) -> int:
+        """Sums the first count amounts."""
+        tree = self.tree
+        total = 0
+        while count:
+            total += tree[count]
+            count &= count - 1
+        return total
+
+    def _rebuild(self) -> None:
+        tree = [0, *self.amounts]
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self.tree = tree
+
+    def add(self, transaction_id: TransactionId | None, timestamp: int, amount: int) -> None:
+        if self.times and timestamp < self.times[-1]:
+            # Operations arrive in timestamp order, so this only happens for replays out of order
+            entries = list(self._entries())
+            entries.insert(bisect_right(self.times, timestamp), (timestamp, transaction_id, amount))
+            self._load(entries)
+            return
+        if transaction_id is not None:
+            self.positions[transaction_id] = len(self.times)
+        self.times.append(timestamp)
+        self.amounts.append(amount)
+        # The new node covers amounts (i - (i & -i), i]: its own plus the nodes that tile the rest
+        tree = self.tree
+        i = len(tree)
+        stop = i - (i & -i)
+        j = i - 1
+        while j > stop:
+            amount += tree[j]
+            j &= j - 1
+        tree.append(amount)
+
+    def update(self, transaction_id: TransactionId, amount: int) -> int:
+        """Sets the amount of a transaction, if the ledger holds it. Returns the change."""
+        position = self.positions.get(transaction_id)
+        if position is None:
+            return 0
+        delta = amount - self.amounts[position]
+        self.amounts[position] = amount
+        i = position + 1
+        tree = self.tree
+        while delta and i < len(tree):
+            tree[i] += delta
+            i += i & -i
+        return delta
+
+    def balance(self, timestamp_at: int | None = None, before: int | None = None) -> int:
+        """Sums the amounts made at or before timestamp_at and strictly before before, if given."""
+        count = len(self.times) if timestamp_at is None else bisect_right(self.times, timestamp_at)
+        if before is not None:
+            count = min(count, bisect_left(self.times, before))
+        return self._prefix(count)
+
+    def _entries(self):
+        transaction_ids = [None] * len(self.times)
+        for transaction_id, position in self.positions.items():
+            transaction_ids[position] = transaction_id
+        return zip(self.times, transaction_ids, self.amounts)
+
+    def _load(self, entries: list[tuple[int, TransactionId | None, int]]) -> None:
+        self.times = [timestamp for timestamp, _, _ in entries]
+        self.amounts = [amount for _, _, amount in entries]
+        self.positions = {
+            transaction_id: i for i, (_, transaction_id, _) in enumerate(entries) if transaction_id is not None
+        }
+        self._rebuild()
+
+    def merge(self, other: "BalanceLedger") -> None:
+        """Adds every transaction of other, keeping timestamp order."""
+        self._load(list(heapq.merge(self._entries(), other._entries(), key=lambda entry: entry[0])))
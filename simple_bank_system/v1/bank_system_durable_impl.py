@@ -0,0 +1,164 @@
+import struct
+import zlib
+from bank_system_impl import BankSystemAdvancedImpl
+from durable_log import DurableLog
+
+# Every event is (opcode, field types): q for an int64, s for a UTF-8 string. The timestamp
+# always comes first.
+EVENTS = {
+    "create_account": (1, "qs"),
+    "deposit": (2, "qsq"),
+    "pay": (3, "qsq"),
+    "transfer": (4, "qssq"),
+    "accept_transfer": (5, "qss"),
+    "merge_accounts": (6, "qss"),
+}
+_BY_OPCODE = {opcode: (name, fields) for name, (opcode, fields) in EVENTS.items()}
+
+# Record: body length, CRC-32 of the body, then the body: opcode followed by its fields
+_HEADER = struct.Struct("<II")
+_OPCODE = struct.Struct("<B")
+_INT = struct.Struct("<q")
+_LENGTH = struct.Struct("<I")
+
+
+def encode_event(name: str, *args) -> bytes:
+    opcode, fields = EVENTS[name]
+    parts = [_OPCODE.pack(opcode)]
+    for kind, arg in zip(fields, args):
+        if kind == "q":
+            parts.append(_INT.pack(arg))
+        else:
+            data = arg.encode()
+            parts.append(_LENGTH.pack(len(data)))
+            parts.append(data)
+    body = b"".join(parts)
+    return _HEADER.pack(len(body), zlib.crc32(body)) + body
+
+
+def decode_event(body: bytes) -> tuple[str, list]:
+    name, fields = _BY_OPCODE[body[0]]
+    args = []
+    pos = 1
+    for kind in fields:
+        if kind == "q":
+            args.append(_INT.unpack_from(body, pos)[0])
+            pos += 8
+        else:
+            (length,) = _LENGTH.unpack_from(body, pos)
+            pos += 4
+            args.append(body[pos : pos + length].decode())
+            pos += length
+    return name, args
+
+
+class BankSystemDurableImpl(DurableLog, BankSystemAdvancedImpl):
+    """
+    Event-sourced BankSystemAdvancedImpl that survives restarts, logged and snapshotted by
+    DurableLog.
+
+    Every create_account, deposit, pay, transfer and merge_accounts that changes the state,
+    and every accept_transfer, is appended to a binary log as a length-prefixed, checksummed
+    record. Replaying the events in order rebuilds the state, expired transfers included,
+    since every operation expires transfers by its own timestamp. Snapshots pickle the
+    transaction id generator, so it must be picklable.
+
+    Files in directory:
+        snapshot        state as of the end of some log generation
+        events.<n>      log generation n
+    """
+
+    LOG_PREFIX = "events"
+
+    def __init__(
+        self,
+        directory: str,
+        sync_every: int = 1000,
+        sync_interval: float = 1.0,
+        snapshot_every: int | None = 1_000_000,
+        background: bool = True,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self._open_log(directory, sync_every, sync_interval, snapshot_every, background)
+
+    def _encode_record(self, record: tuple) -> bytes:
+        return encode_event(*record)
+
+    def _decode_record(self, data: bytes, pos: int) -> tuple[tuple[str, list], int] | None:
+        if pos + _HEADER.size > len(data):
+            return None
+        length, checksum = _HEADER.unpack_from(data, pos)
+        start = pos + _HEADER.size
+        body = data[start : start + length]
+        if len(body) < length or zlib.crc32(body) != checksum:
+            return None
+        return decode_event(body), start + length
+
+    def _record_applier(self):
+        parent = super()
+        replay = {name: getattr(parent, name) for name in EVENTS}
+
+        def apply(event: tuple[str, list]) -> None:
+            name, args = event
+            replay[name](*args)
+
+        return apply
+
+    def _dump_state(self) -> dict:
+        return {
+            "accounts": self.accounts,
+            "transfers": self.transfers,
+            "transaction_ids": self.transaction_ids,
+            "transfer_ids": self.transfer_ids,
+            "activity": self.activity,
+            "outgoing": self.outgoing,
+            "incoming": self.incoming,
+            "expiry_heap": self.expiry_heap,
+        }
+
+    def _load_state(self, state: dict) -> None:
+        self.accounts = state["accounts"]
+        self.transfers = state["transfers"]
+        self.transaction_ids = state["transaction_ids"]
+        self.transfer_ids = state["transfer_ids"]
+        self.activity = state["activity"]
+        self.outgoing = state["outgoing"]
+        self.incoming = state["incoming"]
+        self.expiry_heap = state["expiry_heap"]
+
+    def create_account(self, timestamp: int, account_id: str) -> bool:
+        created = super().create_account(timestamp, account_id)
+        if created:
+            self._append("create_account", timestamp, account_id)
+        return created
+
+    def deposit(self, timestamp: int, account_id: str, amount: int) -> int | None:
+        balance = super().deposit(timestamp, account_id, amount)
+        if balance is not None:
+            self._append("deposit", timestamp, account_id, amount)
+        return balance
+
+    def pay(self, timestamp: int, account_id: str, amount: int) -> int | None:
+        balance = super().pay(timestamp, account_id, amount)
+        if balance is not None:
+            self._append("pay", timestamp, account_id, amount)
+        return balance
+
+    def transfer(self, timestamp: int, source_account_id: str, target_account_id: str, amount: int) -> str:
+        transfer_id = super().transfer(timestamp, source_account_id, target_account_id, amount)
+        if transfer_id:
+            self._append("transfer", timestamp, source_account_id, target_account_id, amount)
+        return transfer_id
+
+    # A rejected accept can still cancel the transfer, so every accept is logged
+    def accept_transfer(self, timestamp: int, account_id: str, transfer_id: str) -> bool:
+        accepted = super().accept_transfer(timestamp, account_id, transfer_id)
+        self._append("accept_transfer", timestamp, account_id, transfer_id)
+        return accepted
+
+    def merge_accounts(self, timestamp: int, account_id_1: str, account_id_2: str) -> bool:
+        merged = super().merge_accounts(timestamp, account_id_1, account_id_2)
+        if merged:
+            self._append("merge_accounts", timestamp, account_id_1, account_id_2)
+        return merged
@@ -1,17 +1,22 @@
-import uuid
+import heapq
+from activity_leaderboard import ActivityLeaderboard
+from balance_ledger import BalanceLedger
 from bank_system import BankSystem
 from dataclasses import dataclass, field
 from enum import Enum
+from ids import IdGenerator, SequentialIds, TransactionId, default_ids
 
 
 class BankSystemBasicImpl(BankSystem):
     def __init__(self):
         self.accounts = {}  # {account_id: {balance: int, transactions: list[dict]}}
+        self.activity = ActivityLeaderboard()
 
     def create_account(self, timestamp: int, account_id: str) -> bool:
         if account_id in self.accounts:
             return False
         self.accounts[account_id] = {"balance": 0, "transactions": []}
+        self.activity.add_account(account_id)
         return True
 
     def deposit(self, timestamp: int, account_id: str, amount: int) -> int | None:
@@ -25,6 +30,7 @@ class BankSystemBasicImpl(BankSystem):
                 "amount": amount,
             }
         )
+        self.activity.record(account_id, timestamp, abs(amount))
         return account["balance"]
 
     def pay(self, timestamp: int, account_id: str, amount: int) -> int | None:
@@ -40,25 +46,11 @@ class BankSystemBasicImpl(BankSystem):
                 "amount": -amount,
             }
         )
+        self.activity.record(account_id, timestamp, abs(amount))
         return account["balance"]
 
     def top_activity(self, timestamp: int, n: int) -> str:
-        activities = []
-        for account_id, account in self.accounts.items():
-            total_value = sum(
-                abs(tx["amount"])
-                for tx in account["transactions"]
-                if tx["timestamp"] < timestamp
-            )
-            activities.append((account_id, total_value))
-
-        activities.sort(key=lambda x: (-x[1], x[0]))
-
-        result_parts = []
-        for account_id, value in activities[:n]:
-            result_parts.append(f"{account_id}({value})")
-
-        return ", ".join(result_parts)
+        return ", ".join(f"{account_id}({value})" for account_id, value in self.activity.top(timestamp, n))
 
 
 class TransactionStatus(Enum):
@@ -70,7 +62,7 @@ class TransactionStatus(Enum):
 
 @dataclass
 class Transaction:
-    transaction_id: str
+    transaction_id: TransactionId
     timestamp: int
     amount: int
     account_id: str
@@ -82,15 +74,21 @@ class Account:
     account_id: str
     created_at: int
     balance: int = 0
-    transactions: dict[str, Transaction] = field(default_factory=dict)
+    transactions: dict[TransactionId, Transaction] = field(default_factory=dict)
     is_deactivated: bool = False
     deactivated_at: int | None = None
+    # PENDING and SUCCESS transactions by time, including those of merged accounts
+    ledger: BalanceLedger = field(default_factory=BalanceLedger)
+    # Accounts merged into this one, whose ledgers still answer for their own past
+    absorbed: list["Account"] = field(default_factory=list)
+    # Shared by every account of a bank system so transaction ids stay unique across merges
+    new_id: IdGenerator = field(default=default_ids, repr=False, compare=False)
 
     def can_deposit(self, amount: int = 0) -> bool:
         return not self.is_deactivated and not amount <= 0
 
-    def deposit(self, timestamp: int, amount: int) -> str:
-        transaction_id = str(uuid.uuid4())
+    def deposit(self, timestamp: int, amount: int) -> TransactionId:
+        transaction_id = self.new_id()
         if self.can_deposit(amount):
             self.balance += amount
             self.transactions[transaction_id] = Transaction(
@@ -100,6 +98,7 @@ class Account:
                 self.account_id,
                 TransactionStatus.SUCCESS,
             )
+            self.ledger.add(transaction_id, timestamp, amount)
         else:
             self.transactions[transaction_id] = Transaction(
                 transaction_id,
@@ -113,8 +112,8 @@ class Account:
     def can_withdraw(self, amount: int) -> bool:
         return not self.is_deactivated and self.balance >= amount
 
-    def start_withdraw(self, timestamp: int, amount: int) -> str:
-        transaction_id = str(uuid.uuid4())
+    def start_withdraw(self, timestamp: int, amount: int) -> TransactionId:
+        transaction_id = self.new_id()
         if self.can_withdraw(amount):
             self.balance -= amount
             self.transactions[transaction_id] = Transaction(
@@ -124,6 +123,7 @@ class Account:
                 self.account_id,
                 TransactionStatus.PENDING,
             )
+            self.ledger.add(transaction_id, timestamp, -amount)
         else:
             self.transactions[transaction_id] = Transaction(
                 transaction_id,
@@ -134,7 +134,7 @@ class Account:
             )
         return transaction_id
 
-    def finalize_withdraw(self, transaction_id: str) -> bool:
+    def finalize_withdraw(self, transaction_id: TransactionId) -> bool:
         if transaction_id not in self.transactions:
             return False
         transaction = self.transactions[transaction_id]
@@ -143,7 +143,7 @@ class Account:
         transaction.status = TransactionStatus.SUCCESS
         return True
 
-    def cancel_withdraw(self, transaction_id: str) -> bool:
+    def cancel_withdraw(self, transaction_id: TransactionId) -> bool:
         if transaction_id not in self.transactions:
             return False
         transaction = self.transactions[transaction_id]
@@ -151,8 +151,15 @@ class Account:
             return False
         self.balance += abs(transaction.amount)
         transaction.status = TransactionStatus.CANCELLED
+        self._cancel_in_ledgers(transaction_id)
         return True
 
+    def _cancel_in_ledgers(self, transaction_id: TransactionId) -> None:
+        # The transaction may have come from a merged account, whose history counted it too
+        self.ledger.update(transaction_id, 0)
+        for account in self.absorbed:
+            account._cancel_in_ledgers(transaction_id)
+
     def deactivate(self, timestamp: int) -> bool:
         if self.is_deactivated:
             return False
@@ -165,19 +172,23 @@ class Account:
 class Transfer:
     transfer_id: str
     source_account_id: str
-    source_transaction_id: str
+    source_transaction_id: TransactionId
     target_account_id: str
-    target_transaction_id: str
+    target_transaction_id: TransactionId | None
     amount: int
     timestamp: int
     time_to_live: int =  24 * 60 * 60 * 1000
     is_accepted: bool = False
     accepted_at: int | None = None
 
+    @property
+    def expires_at(self) -> int:
+        return self.timestamp + self.time_to_live
+
     def is_expired(self, timestamp: int) -> bool:
-        return timestamp > self.timestamp + self.time_to_live
+        return timestamp > self.expires_at
 
-    def accept(self, timestamp: int, transaction_id: str) -> bool:
+    def accept(self, timestamp: int, transaction_id: TransactionId) -> bool:
         if self.is_expired(timestamp) or self.is_accepted:
             return False
         self.is_accepted = True
@@ -187,27 +198,62 @@ class Transfer:
 
 
 class BankSystemAdvancedImpl(BankSystem):
-    def __init__(self):
+    def __init__(self, transaction_ids: IdGenerator | None = None):
         self.accounts: dict[str, Account] = {}
         self.transfers: dict[str, Transfer] = {}
-        self.transfer_counter = 0
+        # Transaction ids are ints 1, 2, 3, ... unless another generator is given
+        self.transaction_ids = transaction_ids or SequentialIds()
+        self.transfer_ids = SequentialIds("transfer")
+        # Value of SUCCESS transactions per account
+        self.activity = ActivityLeaderboard()
+        # Ids of the transfers neither accepted nor cancelled yet, by source and by target
+        # account, and a min-heap of (expires_at, transfer_id) to cancel them by
+        self.outgoing: dict[str, set[str]] = {}
+        self.incoming: dict[str, set[str]] = {}
+        self.expiry_heap: list[tuple[int, str]] = []
+
+    def _is_open(self, transfer: Transfer) -> bool:
+        return transfer.transfer_id in self.outgoing.get(transfer.source_account_id, ())
+
+    def _close_transfer(self, transfer: Transfer) -> None:
+        self.outgoing[transfer.source_account_id].discard(transfer.transfer_id)
+        self.incoming[transfer.target_account_id].discard(transfer.transfer_id)
+
+    def _cancel_transfer(self, transfer: Transfer) -> None:
+        """Releases the funds held for a transfer back to its source account."""
+        self.accounts[transfer.source_account_id].cancel_withdraw(transfer.source_transaction_id)
+        self._close_transfer(transfer)
+
+    def _expire_transfers(self, timestamp: int) -> None:
+        """Cancels the open transfers that have expired by timestamp."""
+        heap = self.expiry_heap
+        while heap and heap[0][0] < timestamp:
+            _, transfer_id = heapq.heappop(heap)
+            transfer = self.transfers[transfer_id]
+            if self._is_open(transfer):
+                self._cancel_transfer(transfer)
 
     def create_account(self, timestamp: int, account_id: str) -> bool:
+        self._expire_transfers(timestamp)
         if account_id in self.accounts:
             return False
-        self.accounts[account_id] = Account(account_id, timestamp)
+        self.accounts[account_id] = Account(account_id, timestamp, new_id=self.transaction_ids)
+        self.activity.add_account(account_id)
         return True
 
     def deposit(self, timestamp: int, account_id: str, amount: int) -> int | None:
+        self._expire_transfers(timestamp)
         if account_id not in self.accounts:
             return None
         account = self.accounts[account_id]
         if not account.can_deposit(amount):
             return None
         account.deposit(timestamp, amount)
+        self.activity.record(account_id, timestamp, amount)
         return account.balance
 
     def pay(self, timestamp: int, account_id: str, amount: int) -> int | None:
+        self._expire_transfers(timestamp)
         if account_id not in self.accounts:
             return None
         account = self.accounts[account_id]
@@ -215,23 +261,12 @@ class BankSystemAdvancedImpl(BankSystem):
             return None
         transaction_id = account.start_withdraw(timestamp, amount)
         account.finalize_withdraw(transaction_id)
+        self.activity.record(account_id, timestamp, amount)
         return account.balance
 
     def top_activity(self, timestamp: int, n: int) -> str:
-        activities = [
-            (
-                account_id,
-                sum(
-                    abs(tx.amount)
-                    for tx in account.transactions
-                    if tx.timestamp < timestamp
-                    and tx.status == TransactionStatus.SUCCESS
-                ),
-            )
-            for account_id, account in self.accounts.items()
-        ]
-        activities.sort(key=lambda x: (-x[1], x[0]))
-        return ", ".join(f"{acc}({val})" for acc, val in activities[:n])
+        self._expire_transfers(timestamp)
+        return ", ".join(f"{account_id}({value})" for account_id, value in self.activity.top(timestamp, n))
 
     def transfer(
         self,
@@ -240,6 +275,7 @@ class BankSystemAdvancedImpl(BankSystem):
         target_account_id: str,
         amount: int,
     ) -> str:
+        self._expire_transfers(timestamp)
         if (
             source_account_id == target_account_id
             or source_account_id not in self.accounts
@@ -250,45 +286,56 @@ class BankSystemAdvancedImpl(BankSystem):
         if not source_account.can_withdraw(amount):
             return ""
         source_transaction_id = source_account.start_withdraw(timestamp, amount)
-        self.transfer_counter += 1
-        transfer_id = f"transfer{self.transfer_counter}"
-        self.transfers[transfer_id] = Transfer(
+        # Held at zero until accepted, so accepting it is an update in place
+        self.activity.record(source_account_id, timestamp, 0, source_transaction_id)
+        transfer_id = self.transfer_ids()
+        transfer = Transfer(
             transfer_id,
             source_account_id,
             source_transaction_id,
             target_account_id,
-            "",
+            None,
             amount,
             timestamp,
         )
+        self.transfers[transfer_id] = transfer
+        self.outgoing.setdefault(source_account_id, set()).add(transfer_id)
+        self.incoming.setdefault(target_account_id, set()).add(transfer_id)
+        heapq.heappush(self.expiry_heap, (transfer.expires_at, transfer_id))
         return transfer_id
 
     def accept_transfer(
         self, timestamp: int, account_id: str, transfer_id: str
     ) -> bool:
+        self._expire_transfers(timestamp)
         if transfer_id not in self.transfers:
             return False
         transfer = self.transfers[transfer_id]
-        if transfer.is_accepted or transfer.target_account_id != account_id:
+        # Accepted, cancelled and expired transfers are all closed
+        if not self._is_open(transfer) or transfer.target_account_id != account_id:
             return False
         source_account = self.accounts[transfer.source_account_id]
         target_account = self.accounts[transfer.target_account_id]
         if (
-            transfer.is_expired(timestamp)
-            or not source_account.can_withdraw(transfer.amount)
+            not source_account.can_withdraw(transfer.amount)
             or not target_account.can_deposit(transfer.amount)
         ):
-            source_account.cancel_withdraw(transfer.source_transaction_id)
+            self._cancel_transfer(transfer)
             return False
 
         source_account.finalize_withdraw(transfer.source_transaction_id)
         target_transaction_id = target_account.deposit(timestamp, transfer.amount)
         transfer.accept(timestamp, target_transaction_id)
+        self._close_transfer(transfer)
+        # The withdrawal counts from when the transfer was made, the deposit from now
+        self.activity.update(transfer.source_account_id, transfer.source_transaction_id, transfer.amount)
+        self.activity.record(transfer.target_account_id, timestamp, transfer.amount)
         return True
 
     def merge_accounts(
         self, timestamp: int, account_id_1: str, account_id_2: str
     ) -> bool:
+        self._expire_transfers(timestamp)
         if (
             account_id_1 not in self.accounts
             or account_id_2 not in self.accounts
@@ -300,22 +347,26 @@ class BankSystemAdvancedImpl(BankSystem):
         if account_1.is_deactivated or account_2.is_deactivated:
             return False
         account_2.balance += account_1.balance
-        for transaction in account_1.transactions:
+        for transaction in account_1.transactions.values():
             transaction.account_id = account_id_2
-            account_2.transactions.append(transaction)
-        account_2.transactions.sort(key=lambda tx: tx.timestamp)
-        for transfer in self.transfers.values():
-            if not transfer.is_accepted:
-                if transfer.source_account_id == account_id_1:
-                    transfer.source_account_id = account_id_2
-                if transfer.target_account_id == account_id_1:
-                    transfer.target_account_id = account_id_2
+            account_2.transactions[transaction.transaction_id] = transaction
+        account_2.ledger.merge(account_1.ledger)
+        account_2.absorbed.append(account_1)
+        self.activity.merge(account_id_1, account_id_2)
+        # Only open transfers move; closed ones keep the accounts they were made between
+        for transfer_id in self.outgoing.pop(account_id_1, ()):
+            self.transfers[transfer_id].source_account_id = account_id_2
+            self.outgoing.setdefault(account_id_2, set()).add(transfer_id)
+        for transfer_id in self.incoming.pop(account_id_1, ()):
+            self.transfers[transfer_id].target_account_id = account_id_2
+            self.incoming.setdefault(account_id_2, set()).add(transfer_id)
         account_1.deactivate(timestamp)
         return True
 
     def get_balance(
         self, timestamp: int, account_id: str, timestamp_at: int
     ) -> int | None:
+        self._expire_transfers(timestamp)
         if account_id not in self.accounts:
             return None
         account = self.accounts[account_id]
@@ -323,14 +374,4 @@ class BankSystemAdvancedImpl(BankSystem):
             return None
         if account.is_deactivated and account.deactivated_at <= timestamp_at:
             return None
-        amounts = [
-            tx.amount
-            for tx in account.transactions
-            if tx.timestamp <= timestamp_at
-            and tx.timestamp < timestamp
-            and (
-                tx.status == TransactionStatus.PENDING
-                or tx.status == TransactionStatus.SUCCESS
-            )
-        ]
-        return sum(amounts)
+        return account.ledger.balance(timestamp_at, before=timestamp)
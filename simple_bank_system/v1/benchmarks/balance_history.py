@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Point-in-time get_balance on BankSystemAdvancedImpl for accounts holding many transactions,
+against summing the account's transactions on every call as get_balance used to.
+
+Each account gets deposits, payments and transfers to the next account, most accepted a
+few hundred operations later. Every --expire-every rounds the clock jumps past the one-day
+transfer expiry, so the transfers still pending are cancelled (and accepting them fails),
+zeroing their entries in the ledgers. Then balances are queried at random past timestamps.
+
+Run from simple_bank_system/v1: python -m benchmarks.balance_history [--transactions 1000000]
+"""
+
+import argparse
+import random
+import time
+
+from bank_system_impl import BankSystemAdvancedImpl, TransactionStatus
+
+DAY = 24 * 60 * 60 * 1000
+
+
+def scan_balance(account, timestamp: int, timestamp_at: int) -> int:
+    return sum(
+        tx.amount
+        for tx in account.transactions.values()
+        if tx.timestamp <= timestamp_at
+        and tx.timestamp < timestamp
+        and tx.status in (TransactionStatus.PENDING, TransactionStatus.SUCCESS)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=1_000_000, help="transactions per account")
+    parser.add_argument("--accounts", type=int, default=2)
+    parser.add_argument("--expire-every", type=int, default=10_000, help="rounds between clock jumps past expiry")
+    parser.add_argument("--queries", type=int, default=100_000)
+    parser.add_argument("--scan-queries", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    db = BankSystemAdvancedImpl()
+    accounts = [f"account{i}" for i in range(args.accounts)]
+    for account_id in accounts:
+        db.create_account(0, account_id)
+    timestamp = 0
+    pending = []
+    start = time.perf_counter()
+    for step in range(1, args.transactions + 1):
+        for i, account_id in enumerate(accounts):
+            timestamp += 1000
+            action = rng.random()
+            if action < 0.5:
+                db.deposit(timestamp, account_id, rng.randrange(1, 1000))
+            elif action < 0.8:
+                db.pay(timestamp, account_id, rng.randrange(1, 100))
+            else:
+                target_id = accounts[(i + 1) % len(accounts)]
+                pending.append((target_id, db.transfer(timestamp, account_id, target_id, rng.randrange(1, 100))))
+            if len(pending) > 200:
+                target_id, transfer_id = pending.pop(rng.randrange(len(pending)))
+                db.accept_transfer(timestamp, target_id, transfer_id)
+        if step % args.expire_every == 0:
+            # Every transfer still pending expires, and is cancelled, once the clock passes a day
+            timestamp += DAY + 1
+            for target_id, transfer_id in pending:
+                assert not db.accept_transfer(timestamp, target_id, transfer_id)
+            pending = []
+    elapsed = time.perf_counter() - start
+    transactions = [tx for account_id in accounts for tx in db.accounts[account_id].transactions.values()]
+    cancelled = sum(tx.status == TransactionStatus.CANCELLED for tx in transactions)
+    print(f"build:  {len(transactions):,} transactions ({cancelled:,} cancelled) in {elapsed:.1f} s")
+
+    now = timestamp + 1
+    queries = [(rng.choice(accounts), rng.randrange(0, now)) for _ in range(args.queries)]
+    start = time.perf_counter()
+    for account_id, timestamp_at in queries:
+        db.get_balance(now, account_id, timestamp_at)
+    elapsed = time.perf_counter() - start
+    print(f"ledger: {args.queries / elapsed:>12,.0f} get_balance/s")
+
+    start = time.perf_counter()
+    for account_id, timestamp_at in queries[: args.scan_queries]:
+        expected = scan_balance(db.accounts[account_id], now, timestamp_at)
+        assert db.get_balance(now, account_id, timestamp_at) == expected
+    elapsed = time.perf_counter() - start
+    print(f"scan:   {args.scan_queries / elapsed:>12,.1f} get_balance/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Throughput of BankSystemDurableImpl at several fsync batch sizes (group commit), and
+cold-start recovery time replaying the event log alone and loading a snapshot plus the
+events after it.
+
+The workload deposits, pays and transfers between random accounts and accepts most
+transfers a few operations later.
+
+Run from simple_bank_system/v1: python -m benchmarks.recovery [--events 1000000]
+"""
+
+import argparse
+import random
+import tempfile
+import time
+
+from bank_system_durable_impl import BankSystemDurableImpl
+
+
+def timed(action):
+    start = time.perf_counter()
+    result = action()
+    return result, time.perf_counter() - start
+
+
+def run_workload(db: BankSystemDurableImpl, events: int, accounts: int, seed: int) -> None:
+    rng = random.Random(seed)
+    account_ids = [f"account{i}" for i in range(accounts)]
+    for timestamp, account_id in enumerate(account_ids, 1):
+        db.create_account(timestamp, account_id)
+        db.deposit(timestamp, account_id, 1_000_000)
+    pending = []
+    for timestamp in range(accounts + 1, accounts + 1 + events):
+        action = rng.random()
+        account_id = rng.choice(account_ids)
+        if action < 0.4:
+            db.deposit(timestamp, account_id, rng.randrange(1, 1000))
+        elif action < 0.7:
+            db.pay(timestamp, account_id, rng.randrange(1, 100))
+        elif action < 0.85 or not pending:
+            target_id = rng.choice(account_ids)
+            transfer_id = db.transfer(timestamp, account_id, target_id, rng.randrange(1, 100))
+            if transfer_id:
+                pending.append((target_id, transfer_id))
+        else:
+            target_id, transfer_id = pending.pop(rng.randrange(len(pending)))
+            db.accept_transfer(timestamp, target_id, transfer_id)
+    db.sync()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--accounts", type=int, default=10_000)
+    parser.add_argument("--sync-every", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # fsync per event is slow enough that a slice of the workload shows its rate
+    print(f"{'sync every':>10} {'ops/s':>10}")
+    for sync_every in args.sync_every:
+        events = min(args.events, 2000 * sync_every)
+        with tempfile.TemporaryDirectory() as directory:
+            db = BankSystemDurableImpl(directory, sync_every=sync_every, sync_interval=float("inf"), snapshot_every=None)
+            _, elapsed = timed(lambda: run_workload(db, events, args.accounts, args.seed))
+            db.close()
+        print(f"{sync_every:>10} {events / elapsed:>10,.0f}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = BankSystemDurableImpl(directory, snapshot_every=None)
+        run_workload(db, args.events, args.accounts, args.seed)
+        db.close()
+        del db
+
+        recovered, elapsed = timed(lambda: BankSystemDurableImpl(directory, snapshot_every=None))
+        print(f"recover from log:      {args.events:,} events in {elapsed:.1f} s")
+
+        _, elapsed = timed(recovered.snapshot)
+        print(f"background snapshot:   {elapsed:.2f} s blocking operations")
+        _, elapsed = timed(lambda: recovered._reap_snapshot(block=True))
+        print(f"                       {elapsed:.1f} s more until written")
+        recovered.close()
+        del recovered
+
+        recovered, elapsed = timed(lambda: BankSystemDurableImpl(directory, snapshot_every=None))
+        print(f"recover from snapshot: {len(recovered.accounts):,} accounts in {elapsed:.1f} s")
+        recovered.close()
+
+
+if __name__ == "__main__":
+    main()
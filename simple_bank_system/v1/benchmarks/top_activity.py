@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Historical top_activity on BankSystemAdvancedImpl, against ranking every account by its
+ledger as top_activity used to.
+
+Accounts get a Zipf-like share of the deposits and payments, so a few stay ahead. Early on
+the leaders swap places often while totals are small, so queries at past timestamps are
+timed near the end, where the current leaders were already ahead, and near the start, where
+the walk down the ranking visits many more accounts.
+
+Run from simple_bank_system/v1: python -m benchmarks.top_activity [--accounts 10000]
+"""
+
+import argparse
+import heapq
+import random
+import time
+
+from bank_system_impl import BankSystemAdvancedImpl
+
+
+def scan_top(db: BankSystemAdvancedImpl, timestamp: int, n: int) -> list[tuple[str, int]]:
+    ranked = heapq.nsmallest(
+        n,
+        ((-ledger.balance(before=timestamp), account_id) for account_id, ledger in db.activity.ledgers.items()),
+    )
+    return [(account_id, -total) for total, account_id in ranked]
+
+
+def rate(queries: list[int], top) -> float:
+    start = time.perf_counter()
+    for timestamp in queries:
+        top(timestamp)
+    return len(queries) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, default=10_000)
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--n", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    db = BankSystemAdvancedImpl()
+    accounts = [f"account{i}" for i in range(args.accounts)]
+    weights = [1 / (i + 1) for i in range(args.accounts)]
+    for account_id in accounts:
+        db.create_account(0, account_id)
+    for timestamp, account_id in enumerate(rng.choices(accounts, weights, k=args.transactions), 1):
+        if rng.random() < 0.7 or not db.pay(timestamp, account_id, rng.randrange(1, 100)):
+            db.deposit(timestamp, account_id, rng.randrange(1, 1000))
+    now = args.transactions + 1
+
+    print(f"{'queries at':>14} {'ranking walk/s':>15} {'scan/s':>10}")
+    for label, low, high in (("last 10%", now * 9 // 10, now), ("first 1%", 1, max(2, now // 100))):
+        queries = [rng.randrange(low, high) for _ in range(args.queries)]
+        for timestamp in queries[:10]:
+            assert db.activity.top(timestamp, args.n) == scan_top(db, timestamp, args.n)
+        walk = rate(queries, lambda timestamp: db.top_activity(timestamp, args.n))
+        scan = rate(queries, lambda timestamp: scan_top(db, timestamp, args.n))
+        print(f"{label:>14} {walk:>15,.0f} {scan:>10,.0f}")
+
+
+if __name__ == "__main__":
+    main()
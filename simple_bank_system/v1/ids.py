@@ -0,0 +1,30 @@
+from typing import Callable
+
+TransactionId = int | str
+# Any callable returning a new id on every call can generate ids, e.g. lambda: str(uuid.uuid4())
+IdGenerator = Callable[[], TransactionId]
+
+
+class SequentialIds:
+    """
+    Monotonic id generator: 1, 2, 3, ... as ints, which are cheap to hash and store, or as
+    prefix + the number when a prefix is given.
+
+    Ids are unique per generator, so a bank system shares one across all its accounts and
+    transaction ids stay unique when accounts are merged.
+    """
+
+    __slots__ = ("next", "prefix")
+
+    def __init__(self, prefix: str | None = None, start: int = 1):
+        self.next = start
+        self.prefix = prefix
+
+    def __call__(self) -> TransactionId:
+        n = self.next
+        self.next = n + 1
+        return n if self.prefix is None else f"{self.prefix}{n}"
+
+
+# For accounts created outside a bank system
+default_ids = SequentialIds()
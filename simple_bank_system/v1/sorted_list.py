@@ -0,0 +1,72 @@
+from bisect import bisect_left, bisect_right, insort
+from itertools import chain
+
+
+class SortedList:
+    """
+    Sorted list kept as a run of bounded buckets, so an insert or removal only shifts one
+    bucket instead of the whole list.
+    """
+
+    __slots__ = ("buckets", "maxes", "size")
+
+    LOAD = 256
+
+    def __init__(self):
+        self.buckets: list[list] = []
+        self.maxes: list = []  # last (largest) value of every bucket
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self):
+        return chain.from_iterable(self.buckets)
+
+    def add(self, value) -> None:
+        if not self.buckets:
+            self.buckets.append([value])
+            self.maxes.append(value)
+            self.size = 1
+            return
+        i = bisect_right(self.maxes, value)
+        if i == len(self.maxes):
+            i -= 1
+            bucket = self.buckets[i]
+            bucket.append(value)
+            self.maxes[i] = value
+        else:
+            bucket = self.buckets[i]
+            insort(bucket, value)
+        self.size += 1
+        if len(bucket) > 2 * self.LOAD:
+            tail = bucket[self.LOAD :]
+            del bucket[self.LOAD :]
+            self.buckets.insert(i + 1, tail)
+            self.maxes[i] = bucket[-1]
+            self.maxes.insert(i + 1, tail[-1])
+
+    def remove(self, value) -> None:
+        i = bisect_left(self.maxes, value)
+        if i == len(self.maxes):
+            raise ValueError(f"{value!r} not in list")
+        bucket = self.buckets[i]
+        j = bisect_left(bucket, value)
+        if bucket[j] != value:
+            raise ValueError(f"{value!r} not in list")
+        del bucket[j]
+        self.size -= 1
+        if not bucket:
+            del self.buckets[i]
+            del self.maxes[i]
+        elif j == len(bucket):
+            self.maxes[i] = bucket[-1]
+
+    def head(self, n: int) -> list:
+        """Returns the first n values."""
+        result = []
+        for bucket in self.buckets:
+            if len(result) >= n:
+                break
+            result.extend(bucket[: n - len(result)])
+        return result
@@ -1,5 +1,12 @@
+import os
+import random
+import tempfile
 import unittest
-from bank_system_impl import BankSystemAdvancedImpl, BankSystemBasicImpl
+import uuid
+from bank_system_durable_impl import BankSystemDurableImpl
+from bank_system_impl import BankSystemAdvancedImpl, BankSystemBasicImpl, TransactionStatus
+from ids import SequentialIds
+from sorted_list import SortedList
 
 class SandboxTests(unittest.TestCase):
     """
@@ -71,4 +78,210 @@ class SandboxTests(unittest.TestCase):
         self.assertEqual(db.deposit(4, "account2", 3000), 3000)
         self.assertEqual(db.merge_accounts(5, "account1", "account2"), True)
         self.assertEqual(db.get_balance("account2"), "5000")
-        self.assertEqual(db.get_transaction_history("account2"), "[2000, 3000]")
\ No newline at end of file
+        self.assertEqual(db.get_transaction_history("account2"), "[2000, 3000]")
+
+    def test_top_activity(self):
+        db = self.basic
+        rng = random.Random(1)
+        accounts = [f"account{i}" for i in range(8)]
+        for account_id in accounts:
+            db.create_account(0, account_id)
+        for timestamp in range(1, 300):
+            account_id = rng.choice(accounts)
+            if rng.random() < 0.6:
+                db.deposit(timestamp, account_id, rng.randrange(1, 100))
+            else:
+                db.pay(timestamp, account_id, rng.randrange(1, 100))
+            # Compare with re-summing every transaction, both now and strictly before an earlier time
+            for at in (timestamp + 1, rng.randrange(1, timestamp + 1)):
+                totals = sorted(
+                    (
+                        -sum(abs(tx["amount"]) for tx in account["transactions"] if tx["timestamp"] < at),
+                        account_id,
+                    )
+                    for account_id, account in db.accounts.items()
+                )
+                expected = ", ".join(f"{account_id}({-total})" for total, account_id in totals[:3])
+                self.assertEqual(db.top_activity(at, 3), expected)
+
+        db = self.advanced
+        db.create_account(1, "account1")
+        db.create_account(2, "account2")
+        db.create_account(3, "account3")
+        db.deposit(4, "account1", 2000)
+        db.deposit(5, "account2", 3000)
+        self.assertEqual(db.transfer(6, "account1", "account3", 500), "transfer1")
+        db.deposit(7, "account3", 100)
+        self.assertEqual(db.transfer(8, "account2", "account3", 700), "transfer2")
+        # Pending transfers are not activity until accepted
+        self.assertEqual(db.top_activity(9, 3), "account2(3000), account1(2000), account3(100)")
+        self.assertTrue(db.accept_transfer(10, "account3", "transfer1"))
+        self.assertEqual(db.top_activity(11, 3), "account2(3000), account1(2500), account3(600)")
+        # The withdrawal counts from when the transfer was made, before the deposit at 7
+        self.assertEqual(db.top_activity(7, 3), "account2(3000), account1(2500), account3(0)")
+        self.assertEqual(db.top_activity(8, 2), "account2(3000), account1(2500)")
+        self.assertTrue(db.merge_accounts(12, "account2", "account1"))
+        self.assertTrue(db.accept_transfer(13, "account3", "transfer2"))
+        self.assertEqual(db.top_activity(14, 5), "account1(6200), account3(1300)")
+        self.assertEqual(db.top_activity(6, 5), "account1(5000), account3(0)")
+        self.assertEqual(db.top_activity(14, 0), "")
+
+    def test_sorted_list(self):
+        """Test the bucketed sorted list behind the activity ranking across bucket splits"""
+        rng = random.Random(5)
+        values = SortedList()
+        expected = []
+        for _ in range(3000):
+            if expected and rng.random() < 0.4:
+                value = rng.choice(expected)
+                expected.remove(value)
+                values.remove(value)
+            else:
+                value = (-rng.randrange(500), f"account{rng.randrange(50)}")
+                expected.append(value)
+                values.add(value)
+        self.assertEqual(list(values), sorted(expected))
+        self.assertEqual(values.head(5), sorted(expected)[:5])
+        self.assertGreater(len(values.buckets), 1)
+        with self.assertRaises(ValueError):
+            values.remove((1, "account0"))
+
+    def test_balance_history(self):
+        db = self.advanced
+        rng = random.Random(2)
+        day = 24 * 60 * 60 * 1000
+        accounts = [f"account{i}" for i in range(6)]
+        for account_id in accounts:
+            db.create_account(0, account_id)
+        transfers = []
+        for timestamp in range(1, 1500):
+            timestamp *= day // 200
+            action = rng.random()
+            account_id, other_id = rng.sample(accounts, 2)
+            if action < 0.4:
+                db.deposit(timestamp, account_id, rng.randrange(1, 1000))
+            elif action < 0.6:
+                db.pay(timestamp, account_id, rng.randrange(1, 500))
+            elif action < 0.8:
+                transfer_id = db.transfer(timestamp, account_id, other_id, rng.randrange(1, 500))
+                if transfer_id:
+                    transfers.append(transfer_id)
+            elif action < 0.997:
+                # Some are accepted late enough to expire and be cancelled
+                if transfers:
+                    transfer_id = transfers.pop(rng.randrange(len(transfers)))
+                    db.accept_transfer(timestamp, db.transfers[transfer_id].target_account_id, transfer_id)
+            else:
+                db.merge_accounts(timestamp, account_id, other_id)
+            account_id = rng.choice(accounts)
+            account = db.accounts[account_id]
+            at = rng.randrange(0, timestamp + 1)
+            expected = None
+            if not (account.is_deactivated and account.deactivated_at <= at):
+                expected = sum(
+                    tx.amount
+                    for tx in account.transactions.values()
+                    if tx.timestamp <= at
+                    and tx.timestamp < timestamp
+                    and tx.status in (TransactionStatus.PENDING, TransactionStatus.SUCCESS)
+                )
+            self.assertEqual(db.get_balance(timestamp, account_id, at), expected)
+        self.assertIsNone(db.get_balance(1, "missing", 0))
+
+    def test_transaction_ids(self):
+        db = self.advanced
+        db.create_account(1, "account1")
+        db.create_account(2, "account2")
+        db.deposit(3, "account1", 100)
+        db.deposit(4, "account2", 200)
+        self.assertEqual(db.transfer(5, "account1", "account2", 50), "transfer1")
+        self.assertEqual(list(db.accounts["account1"].transactions), [1, 3])
+        self.assertEqual(list(db.accounts["account2"].transactions), [2])
+        # Ids come from one counter per system, so merged transactions never collide
+        self.assertTrue(db.merge_accounts(6, "account1", "account2"))
+        self.assertEqual(sorted(db.accounts["account2"].transactions), [1, 2, 3])
+        self.assertEqual(db.get_balance(7, "account2", 6), 250)
+
+        other = BankSystemAdvancedImpl()
+        other.create_account(1, "account1")
+        other.deposit(2, "account1", 100)
+        self.assertEqual(list(other.accounts["account1"].transactions), [1])
+
+        prefixed = BankSystemAdvancedImpl(SequentialIds("tx"))
+        prefixed.create_account(1, "account1")
+        prefixed.deposit(2, "account1", 100)
+        prefixed.pay(3, "account1", 40)
+        self.assertEqual(list(prefixed.accounts["account1"].transactions), ["tx1", "tx2"])
+
+        random_ids = BankSystemAdvancedImpl(lambda: str(uuid.uuid4()))
+        random_ids.create_account(1, "account1")
+        random_ids.deposit(2, "account1", 100)
+        self.assertEqual(len(next(iter(random_ids.accounts["account1"].transactions))), 36)
+
+    def test_transfer_expiry(self):
+        db = self.advanced
+        day = 24 * 60 * 60 * 1000
+        db.create_account(1, "account1")
+        db.create_account(2, "account2")
+        db.create_account(3, "account3")
+        db.deposit(4, "account1", 1000)
+        db.deposit(4, "account3", 200)
+        self.assertEqual(db.transfer(5, "account1", "account2", 300), "transfer1")
+        self.assertEqual(db.transfer(6, "account1", "account3", 200), "transfer2")
+        self.assertEqual(db.transfer(7, "account3", "account1", 100), "transfer3")
+        self.assertEqual(db.pay(5 + day, "account1", 0), 500)
+        # Held funds come back as soon as time passes the expiry, without anyone accepting
+        self.assertEqual(db.pay(6 + day, "account1", 0), 800)
+        self.assertFalse(db.accept_transfer(6 + day, "account2", "transfer1"))
+        self.assertEqual(db.outgoing["account1"], {"transfer2"})
+
+        # Merging moves only the open transfers of the merged account
+        self.assertTrue(db.merge_accounts(6 + day, "account1", "account2"))
+        self.assertEqual(db.transfers["transfer1"].source_account_id, "account1")
+        self.assertEqual(db.transfers["transfer2"].source_account_id, "account2")
+        self.assertEqual(db.transfers["transfer3"].target_account_id, "account2")
+        self.assertTrue(db.accept_transfer(6 + day, "account2", "transfer3"))
+        self.assertTrue(db.accept_transfer(6 + day, "account3", "transfer2"))
+        self.assertEqual(db.pay(8 + day, "account2", 0), 900)
+        self.assertEqual(db.incoming, {"account2": set(), "account3": set()})
+        self.assertEqual(db.outgoing, {"account2": set(), "account3": set()})
+
+    def test_durable_bank_system(self):
+        day = 24 * 60 * 60 * 1000
+        with tempfile.TemporaryDirectory() as directory:
+            db = BankSystemDurableImpl(directory, snapshot_every=5, background=False)
+            for i in range(1, 4):
+                db.create_account(i, f"account{i}")
+                db.deposit(10 + i, f"account{i}", 1000 * i)
+            self.assertEqual(db.pay(20, "account3", 500), 2500)
+            self.assertEqual(db.transfer(21, "account1", "account2", 300), "transfer1")
+            self.assertEqual(db.transfer(22, "account2", "account3", 400), "transfer2")
+            self.assertTrue(db.accept_transfer(23, "account3", "transfer2"))
+            self.assertEqual(db.transfer(24, "account3", "account1", 100), "transfer3")
+            self.assertTrue(db.merge_accounts(25, "account3", "account2"))
+            self.assertIsNone(db.deposit(26, "missing", 1))
+            db.close()
+            self.assertEqual(sorted(os.listdir(directory)), ["events.2", "snapshot"])
+
+            # A torn event at the end of the log is dropped
+            with open(os.path.join(directory, "events.2"), "ab") as f:
+                f.write(b"\x10\x00\x00\x00partial")
+            recovered = BankSystemDurableImpl(directory)
+            self.assertEqual(recovered.top_activity(30, 3), db.top_activity(30, 3))
+            for account_id in ("account1", "account2", "account3"):
+                for at in (15, 22, 26):
+                    self.assertEqual(recovered.get_balance(30, account_id, at), db.get_balance(30, account_id, at))
+            self.assertEqual(recovered.transfers["transfer3"].target_account_id, "account1")
+            self.assertEqual(recovered.transfers["transfer1"].source_account_id, "account1")
+            # Expiry after recovery refunds the held transfers
+            self.assertEqual(recovered.deposit(30 + day, "account1", 1), 1001)
+            # Id generators carry on from where they were
+            self.assertEqual(recovered.transfer(31 + day, "account2", "account1", 50), "transfer4")
+            ids = [tx.transaction_id for account in recovered.accounts.values() for tx in account.transactions.values()]
+            self.assertEqual(max(ids), recovered.transaction_ids.next - 1)
+            balance = recovered.get_balance(32 + day, "account2", 31 + day)
+            recovered.close()
+
+            again = BankSystemDurableImpl(directory)
+            self.assertEqual(again.get_balance(32 + day, "account2", 31 + day), balance)
+            again.close()